@@ -6,9 +6,12 @@ PostgreSQL知识库智能助手 - 2025增强版
 """
 
 import os
+import sys
 import json
 import re
+import shutil
 import numpy as np
+import scipy.sparse as sp
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
@@ -16,12 +19,20 @@ import logging
 from pathlib import Path
 import yaml
 import requests
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
 from sklearn.cluster import KMeans
+import sklearn
 import jieba
 import jieba.analyse
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / 'tools'))
+from parse_cache import REPO_ROOT, content_hash, decode_text, fingerprint, source_version
+
+# 知识库索引快照目录（每个知识库根目录一个子目录）
+SNAPSHOT_ROOT = REPO_ROOT / '.reports' / 'knowledge_base'
+SNAPSHOT_FORMAT = 3
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -31,7 +42,7 @@ class KnowledgeItem:
     """知识项数据类"""
     id: str
     title: str
-    content: str
+    content: Optional[str]  # 正文；从快照恢复的知识项为 None，经 KnowledgeBase.get_content 按需读取
     category: str
     tags: List[str]
     difficulty: str  # beginner, intermediate, advanced
@@ -76,51 +87,328 @@ class Answer:
     generated_at: datetime
 
 class KnowledgeBase:
-    """知识库管理器"""
+    """知识库管理器
+    
+    向量索引按段落建立：正文按 chunk_size 个字符切分，相邻段落重叠 chunk_overlap 个字符，每段
+    前附标题与标签，各占词频矩阵的一行。矩阵基于特征哈希（HashingVectorizer），不需要拟合词表：
+    新增或修改文档只需向量化该文档的段落并追加为连续的若干行（旧行标记删除），文档频率（按段落
+    计）同步增减，IDF 与归一化后的段落向量在下次搜索时才重新计算。标记删除的行超过四分之一时
+    压缩矩阵。
     
-    def __init__(self, base_path: str = "Analysis"):
+    矩阵以 float32 CSR 存储，memory_usage() 报告索引各部分的内存占用。索引的预计内存超过
+    max_index_bytes 时，新加入的文档只保留放得下的前若干段（至少一段），并记入 truncated。
+    搜索时段落相似度按 aggregation（'max' 取最相关段落，'sum' 累加各段落）汇总到文档。
+    """
+    
+    # 哈希特征维数；冲突概率可忽略，词频矩阵为稀疏存储，不随维数增加内存
+    N_FEATURES = 2 ** 20
+    # 段落相似度汇总到文档的方式
+    AGGREGATIONS = {'max': np.maximum, 'sum': np.add}
+    
+    def __init__(self, base_path: str = "Analysis", snapshot_dir: Optional[str] = None, use_snapshot: bool = True,
+                 chunk_size: int = 1000, chunk_overlap: int = 200, aggregation: str = 'max',
+                 max_index_bytes: Optional[int] = 256 * 2 ** 20):
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError(f"段落重叠须小于段落长度: chunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
+        if aggregation not in self.AGGREGATIONS:
+            raise ValueError(f"未知的汇总方式: {aggregation}")
         self.base_path = Path(base_path)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.aggregation = aggregation
+        self.max_index_bytes = max_index_bytes
         self.knowledge_items = {}
-        self.vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-        self.content_vectors = None
+        self.vectorizer = HashingVectorizer(n_features=self.N_FEATURES, stop_words='english',
+                                            alternate_sign=False, norm=None, dtype=np.float32)
+        # 词频矩阵：已合并的行 + 尚未合并的新行；row_ids[i] 为第 i 行（段落）的知识项ID（None 表示已删除）
+        self._counts = sp.csr_matrix((0, self.N_FEATURES), dtype=np.float32)
+        self._pending_rows: List[sp.csr_matrix] = []
+        self.row_ids: List[Optional[str]] = []
+        self.row_of: Dict[str, Tuple[int, int]] = {}  # 知识项ID -> 其段落所在的行区间 [start, stop)
+        self._live_rows = 0
+        self._live_nnz = 0
+        self.truncated = set()  # 因 max_index_bytes 只索引了部分段落的知识项ID
+        self.doc_freq = np.zeros(self.N_FEATURES, dtype=np.int32)
+        self.idf = None
+        self.content_vectors = None  # 惰性计算的 TF-IDF 段落向量，None 表示需要重新计算
+        self.postings = None  # content_vectors 的转置（CSR）：第 t 行为词项 t 的倒排表 (段落行, 权重)
+        self.doc_ids: List[str] = []  # 文档编号 -> 知识项ID
+        self.row_doc = None  # 段落行 -> 文档编号（已删除的行为 -1）
+        # 文件（相对 base_path）-> (mtime_ns, 大小, 内容哈希, 知识项ID)
+        self.file_states: Dict[str, Tuple[int, int, str, str]] = {}
+        self.snapshot = None
+        if use_snapshot:
+            directory = Path(snapshot_dir) if snapshot_dir else \
+                SNAPSHOT_ROOT / fingerprint([str(self.base_path.resolve())])
+            self.snapshot = KnowledgeBaseSnapshot(directory)
         self.load_knowledge_base()
     
     def load_knowledge_base(self):
-        """加载知识库"""
+        """加载知识库
+        
+        有可用快照时先恢复快照中的知识项与词频矩阵，再只处理变化的文件：mtime 与大小未变的
+        文件直接跳过；变化的文件先比对内容哈希，内容确有变化才经 upsert_document 重新处理；
+        已删除的文件经 remove_document 移除。有变化时写回快照。
+        """
         
         logger.info("加载知识库...")
         
+        version = self.index_version()
+        previous = self.snapshot.load(version) if self.snapshot is not None else None
+        self.knowledge_items = {}
+        self.file_states = {}
+        self.truncated = set()
+        self._set_rows(sp.csr_matrix((0, self.N_FEATURES), dtype=np.float32), [])
+        if previous:
+            for metadata in previous['items']:
+                self._restore_item(metadata)
+            self.file_states = previous['files']
+            self.truncated = set(previous['truncated'])
+            self._set_rows(previous['counts'], previous['order'])
+        changed = previous is None
+        seen = set()
+        
         # 扫描所有Markdown文件
         for md_file in self.base_path.rglob("*.md"):
+            key = md_file.relative_to(self.base_path).as_posix()
+            seen.add(key)
             try:
-                with open(md_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # 提取元数据
-                metadata = self.extract_metadata(content, md_file)
-                
-                # 创建知识项
-                knowledge_item = KnowledgeItem(
-                    id=metadata['id'],
-                    title=metadata['title'],
-                    content=content,
-                    category=metadata['category'],
-                    tags=metadata['tags'],
-                    difficulty=metadata['difficulty'],
-                    language=metadata['language'],
-                    file_path=str(md_file),
-                    last_updated=datetime.fromtimestamp(md_file.stat().st_mtime)
-                )
+                stat = md_file.stat()
+                old = self.file_states.get(key)
+                if old and old[0] == stat.st_mtime_ns and old[1] == stat.st_size and old[3] in self.knowledge_items:
+                    continue
                 
-                self.knowledge_items[knowledge_item.id] = knowledge_item
+                with open(md_file, 'rb') as f:
+                    data = f.read()
+                digest = content_hash(data)
+                if old and old[2] == digest and old[3] in self.knowledge_items:
+                    # 只是 mtime 变化（如 checkout、touch）：内容相同，沿用快照结果
+                    self.knowledge_items[old[3]].last_updated = datetime.fromtimestamp(stat.st_mtime)
+                    self.file_states[key] = (stat.st_mtime_ns, stat.st_size, digest, old[3])
+                else:
+                    self.upsert_document(md_file, data)
+                changed = True
                 
             except Exception as e:
                 logger.error(f"加载文件失败 {md_file}: {e}")
         
+        # 已删除（或本次读取失败）的文件
+        for key in set(self.file_states) - seen:
+            item_id = self.file_states.pop(key)[3]
+            item = self.knowledge_items.get(item_id)
+            if item is not None and Path(item.file_path) == self.base_path / key:
+                self.remove_document(item_id)
+            changed = True
+        
         logger.info(f"知识库加载完成，共 {len(self.knowledge_items)} 个知识项")
         
-        # 构建向量索引
-        self.build_vector_index()
+        if self.snapshot is not None and changed:
+            self.save_snapshot(version)
+    
+    def upsert_document(self, path, data: Optional[bytes] = None) -> Optional[KnowledgeItem]:
+        """新增或更新单个文档，无需重建索引，返回更新后的知识项
+        
+        path 为 base_path 下的 Markdown 文件（相对或绝对路径均可，不在 base_path 下时抛出
+        ValueError）；data 为已读取的文件内容（可省略）。
+        """
+        
+        md_file = self._local_path(path)
+        stat = md_file.stat()
+        if data is None:
+            with open(md_file, 'rb') as f:
+                data = f.read()
+        content = decode_text(data)
+        
+        # 提取元数据
+        metadata = self.extract_metadata(content, md_file)
+        
+        # 创建知识项
+        knowledge_item = KnowledgeItem(
+            id=metadata['id'],
+            title=metadata['title'],
+            content=content,
+            category=metadata['category'],
+            tags=metadata['tags'],
+            difficulty=metadata['difficulty'],
+            language=metadata['language'],
+            file_path=str(md_file),
+            last_updated=datetime.fromtimestamp(stat.st_mtime)
+        )
+        
+        self._drop_rows(knowledge_item.id)
+        rows = self.vectorizer.transform(self.index_passages(knowledge_item)).tocsr()
+        rows.sum_duplicates()
+        rows = self._fit_budget(knowledge_item.id, rows)
+        np.add.at(self.doc_freq, rows.indices, 1)
+        start = len(self.row_ids)
+        self.row_of[knowledge_item.id] = (start, start + rows.shape[0])
+        self.row_ids.extend([knowledge_item.id] * rows.shape[0])
+        self._pending_rows.append(rows)
+        self._live_rows += rows.shape[0]
+        self._live_nnz += rows.nnz
+        self.content_vectors = None
+        
+        self.knowledge_items[knowledge_item.id] = knowledge_item
+        key = md_file.relative_to(self.base_path).as_posix()
+        self.file_states[key] = (stat.st_mtime_ns, stat.st_size, content_hash(data), knowledge_item.id)
+        return knowledge_item
+    
+    def _local_path(self, path) -> Path:
+        """把 path 换成 base_path 下的同一文件（与扫描得到的路径形式一致）"""
+        
+        path = Path(path)
+        try:
+            relative = path.resolve().relative_to(self.base_path.resolve())
+        except ValueError:
+            raise ValueError(f"{path} 不在知识库目录 {self.base_path} 下") from None
+        return self.base_path / relative
+    
+    def remove_document(self, item_id: str) -> bool:
+        """移除知识项，返回是否存在"""
+        
+        item = self.knowledge_items.pop(item_id, None)
+        if item is None:
+            return False
+        self._drop_rows(item_id)
+        for key, state in list(self.file_states.items()):
+            if state[3] == item_id:
+                del self.file_states[key]
+        return True
+    
+    def save_snapshot(self, version: Optional[str] = None):
+        """把当前索引写入快照（upsert/remove 之后按需调用）"""
+        
+        if self.snapshot is not None:
+            self._compact(force=True)
+            self.snapshot.save(version or self.index_version(), self)
+    
+    def index_version(self) -> str:
+        """快照版本：元数据提取与向量化的代码、向量器参数及依赖库版本，任一变化则快照整体失效"""
+        
+        params = json.dumps(dict(self.vectorizer.get_params(), chunk_size=self.chunk_size,
+                                 chunk_overlap=self.chunk_overlap, max_index_bytes=self.max_index_bytes),
+                            sort_keys=True, default=str)
+        return fingerprint([
+            str(SNAPSHOT_FORMAT), params, sklearn.__version__, jieba.__version__,
+            source_version(KnowledgeBase.extract_metadata, KnowledgeBase.infer_category, KnowledgeBase.extract_tags,
+                           KnowledgeBase.infer_difficulty, KnowledgeBase.detect_language, KnowledgeBase.generate_id,
+                           KnowledgeBase.index_passages, KnowledgeBase._fit_budget),
+        ])
+    
+    def _restore_item(self, metadata: Dict[str, Any]) -> KnowledgeItem:
+        """由快照中的元数据恢复知识项（不含正文）"""
+        
+        item = KnowledgeItem(**dict(metadata, content=None,
+                                    file_path=str(self.base_path / metadata['file_path']),
+                                    last_updated=datetime.fromisoformat(metadata['last_updated'])))
+        self.knowledge_items[item.id] = item
+        return item
+    
+    def get_content(self, item: KnowledgeItem) -> str:
+        """知识项正文；从快照恢复的知识项在首次使用时读取文件"""
+        
+        if item.content is None:
+            with open(item.file_path, 'r', encoding='utf-8') as f:
+                item.content = f.read()
+        return item.content
+    
+    def _set_rows(self, counts: sp.csr_matrix, row_ids: List[str]):
+        """以给定的（已压缩的）词频矩阵重置索引"""
+        
+        self._counts = counts
+        self._pending_rows = []
+        self.row_ids = list(row_ids)
+        self._index_rows()
+        self._live_rows = counts.shape[0]
+        self._live_nnz = counts.nnz
+        self.doc_freq = np.bincount(counts.indices, minlength=self.N_FEATURES).astype(np.int32)
+        self.content_vectors = None
+    
+    def _index_rows(self):
+        """由 row_ids 重建 row_of（同一知识项的段落总是连续的若干行）"""
+        
+        self.row_of = {}
+        for row, item_id in enumerate(self.row_ids):
+            if item_id is not None:
+                self.row_of[item_id] = (self.row_of.get(item_id, (row,))[0], row + 1)
+    
+    def _drop_rows(self, item_id: str):
+        """标记删除知识项的所有段落行，并扣除其文档频率"""
+        
+        self.truncated.discard(item_id)
+        span = self.row_of.pop(item_id, None)
+        if span is None:
+            return
+        start, stop = span
+        if stop > self._counts.shape[0]:
+            self._merge_pending()
+        rows = self._counts[start:stop]
+        np.subtract.at(self.doc_freq, rows.indices, 1)
+        self._live_rows -= stop - start
+        self._live_nnz -= rows.nnz
+        self.row_ids[start:stop] = [None] * (stop - start)
+        self.content_vectors = None
+    
+    def _merge_pending(self):
+        if self._pending_rows:
+            self._counts = sp.vstack([self._counts] + self._pending_rows, format='csr')
+            self._pending_rows = []
+    
+    def _compact(self, force: bool = False):
+        """合并新行；标记删除的行较多（或 force）时去掉它们"""
+        
+        self._merge_pending()
+        dead = len(self.row_ids) - self._live_rows
+        if dead and (force or dead * 4 > len(self.row_ids)):
+            live = [row for row, item_id in enumerate(self.row_ids) if item_id is not None]
+            self._counts = self._counts[live]
+            self.row_ids = [self.row_ids[row] for row in live]
+            self._index_rows()
+            self.content_vectors = None
+    
+    def _fit_budget(self, item_id: str, rows: sp.csr_matrix) -> sp.csr_matrix:
+        """索引的预计内存超过 max_index_bytes 时只保留放得下的前若干段（至少一段）"""
+        
+        if self.max_index_bytes is None:
+            return rows
+        used = self.estimate_index_bytes(self._live_nnz, self._live_rows)
+        # 每个段落：三个矩阵中各 nnz 个 (float32 值, int32 列号)，词频矩阵与段落向量中各一个行指针
+        needed = np.cumsum(np.diff(rows.indptr) * 24 + 8)
+        keep = max(1, int(np.searchsorted(needed, self.max_index_bytes - used, side='right')))
+        if keep >= rows.shape[0]:
+            return rows
+        logger.warning(f"索引内存达到上限，{item_id} 只索引前 {keep}/{rows.shape[0]} 个段落")
+        self.truncated.add(item_id)
+        return rows[:keep]
+    
+    @classmethod
+    def estimate_index_bytes(cls, nnz: int, passages: int) -> int:
+        """nnz 个非零词频、passages 个段落时，完整索引（词频矩阵、段落向量、倒排表、文档频率与 IDF）的字节数"""
+        
+        return 3 * nnz * 8 + 2 * (passages + 1) * 4 + (cls.N_FEATURES + 1) * 4 + 2 * cls.N_FEATURES * 4
+    
+    def memory_usage(self) -> Dict[str, int]:
+        """索引各部分当前占用的字节数（numpy 数组，不含 Python 对象开销）
+        
+        projected 为当前段落全部建好索引后的预计总量，即与 max_index_bytes（limit）比较的值。
+        """
+        
+        def nbytes(matrix) -> int:
+            return 0 if matrix is None else matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        
+        usage = {
+            'counts': nbytes(self._counts) + sum(nbytes(rows) for rows in self._pending_rows),
+            'vectors': nbytes(self.content_vectors),
+            'postings': nbytes(self.postings),
+            'doc_freq': self.doc_freq.nbytes,
+            'idf': 0 if self.idf is None else self.idf.nbytes,
+            'row_doc': 0 if self.row_doc is None else self.row_doc.nbytes,
+        }
+        usage['total'] = sum(usage.values())
+        usage['projected'] = self.estimate_index_bytes(self._live_nnz, self._live_rows)
+        usage['limit'] = self.max_index_bytes
+        usage['passages'] = self._live_rows
+        return usage
     
     def extract_metadata(self, content: str, file_path: Path) -> Dict[str, Any]:
         """提取文档元数据"""
@@ -244,40 +532,157 @@ class KnowledgeBase:
         return str(relative_path).replace('/', '_').replace('.md', '')
     
     def build_vector_index(self):
-        """构建向量索引"""
-        
-        logger.info("构建向量索引...")
-        
-        # 准备文本内容
-        texts = []
-        for item in self.knowledge_items.values():
-            # 组合标题、内容和标签
-            combined_text = f"{item.title} {' '.join(item.tags)} {item.content[:1000]}"
-            texts.append(combined_text)
-        
-        # 构建TF-IDF向量
-        self.content_vectors = self.vectorizer.fit_transform(texts)
-        
-        logger.info("向量索引构建完成")
+        """构建向量索引：由词频矩阵与当前文档频率计算 L2 归一化的 TF-IDF 段落向量"""
+        
+        self._compact()
+        # 与 TfidfVectorizer(smooth_idf=True) 相同的 IDF 公式，以段落为文档
+        self.idf = (np.log((1 + self._live_rows) / (1 + self.doc_freq)) + 1.0).astype(np.float32)
+        live = np.array([item_id is not None for item_id in self.row_ids], dtype=np.float32)
+        vectors = self._counts.copy()
+        vectors.data *= self.idf[vectors.indices] * np.repeat(live, np.diff(vectors.indptr))
+        self.content_vectors = normalize(vectors, norm='l2', copy=False)
+        self.content_vectors.eliminate_zeros()
+        self.postings = self.content_vectors.T.tocsr()
+        
+        # 段落行 -> 文档编号，文档按首个段落的行号编号
+        self.doc_ids = []
+        self.row_doc = np.full(len(self.row_ids), -1, dtype=np.int32)
+        for item_id, (start, stop) in sorted(self.row_of.items(), key=lambda entry: entry[1]):
+            self.row_doc[start:stop] = len(self.doc_ids)
+            self.doc_ids.append(item_id)
+    
+    def index_passages(self, item: KnowledgeItem) -> List[str]:
+        """参与向量化的段落：正文按 chunk_size 切分（相邻段落重叠 chunk_overlap），每段前附标题和标签"""
+        
+        content = self.get_content(item)
+        header = f"{item.title} {' '.join(item.tags)}"
+        step = self.chunk_size - self.chunk_overlap
+        return [f"{header} {content[start:start + self.chunk_size]}"
+                for start in range(0, max(len(content) - self.chunk_overlap, 1), step)]
     
     def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
-        """搜索知识库"""
+        """搜索知识库，返回余弦相似度最高的 top_k 个 (知识项ID, 相似度)"""
         
-        if self.content_vectors is None:
+        return self.search_many([query], top_k)[0]
+    
+    def search_many(self, queries: List[str], top_k: int = 10,
+                    aggregation: Optional[str] = None) -> List[List[Tuple[str, float]]]:
+        """批量搜索：每个查询各返回 top_k 个 (知识项ID, 相似度)，顺序与 queries 一致
+        
+        全部查询向量化为一个稀疏矩阵，与倒排表（段落向量的转置）做一次稀疏矩阵乘法，只有与
+        查询有共同词项的段落会出现在结果行中；逐行把段落相似度按 aggregation（默认为构造时的
+        设置）汇总到文档，再用 argpartition 选出前 top_k 个。耗时取决于查询词项的倒排表长度而非
+        段落总数。没有共同词项（相似度为 0）的文档不返回。
+        """
+        
+        reduce = self.AGGREGATIONS[aggregation or self.aggregation]
+        if not queries:
             return []
+        if not self.row_of or top_k <= 0:
+            return [[] for _ in queries]
+        if self.content_vectors is None:
+            self.build_vector_index()
+        
+        # 将查询转换为向量（与文档向量同样做 IDF 加权和 L2 归一化，点积即余弦相似度）
+        query_vectors = self.vectorizer.transform(queries).tocsr()
+        query_vectors.data *= self.idf[query_vectors.indices]
+        query_vectors = normalize(query_vectors, norm='l2', copy=False)
+        
+        # 计算相似度：第 i 行为第 i 个查询与各候选段落的相似度
+        similarities = (query_vectors @ self.postings).tocsr()
+        
+        results = []
+        for i in range(len(queries)):
+            start, end = similarities.indptr[i], similarities.indptr[i + 1]
+            if start == end:
+                results.append([])
+                continue
+            # 按文档编号排序后分组汇总各文档的段落相似度
+            docs = self.row_doc[similarities.indices[start:end]]
+            order = np.argsort(docs, kind='stable')
+            docs, scores = docs[order], similarities.data[start:end][order]
+            first = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+            results.append(self._top_k(docs[first], reduce.reduceat(scores, first), top_k))
+        return results
+    
+    def _top_k(self, docs: np.ndarray, scores: np.ndarray, top_k: int) -> List[Tuple[str, float]]:
+        """从候选文档中选出分数最高的 top_k 个；同分按文档编号排序，结果稳定"""
+        
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            docs, scores = docs[best], scores[best]
+        order = np.lexsort((docs, -scores))
+        return [(self.doc_ids[doc], score) for doc, score in zip(docs[order].tolist(), scores[order].tolist())]
+
+class KnowledgeBaseSnapshot:
+    """知识库索引快照
+    
+    目录中的文件：
+    - manifest.json: 快照格式、版本、各文件的 (mtime_ns, 大小, 内容哈希, 知识项ID)、各行（段落）
+      所属的知识项ID，以及因内存上限只索引了部分段落的知识项
+    - items.json: 知识项元数据（不含正文）
+    - counts.npz: 哈希词频矩阵（float32 CSR，每个段落一行）；文档频率与 IDF 由它直接算出
+    
+    保存时先写入临时目录再整体替换，读取方不会看到新旧混杂的快照。
+    """
+    
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+    
+    def load(self, version: str) -> Optional[Dict[str, Any]]:
+        """读取快照；不存在、损坏或版本不符时返回 None"""
+        
+        try:
+            with open(self.directory / 'manifest.json', 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('format') != SNAPSHOT_FORMAT or manifest.get('version') != version:
+                logger.info("知识库快照版本不符，将完整重建")
+                return None
+            with open(self.directory / 'items.json', 'r', encoding='utf-8') as f:
+                items = json.load(f)
+            counts = sp.load_npz(self.directory / 'counts.npz').tocsr()
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"知识库快照无法读取，将完整重建: {e}")
+            return None
         
-        # 将查询转换为向量
-        query_vector = self.vectorizer.transform([query])
-        
-        # 计算相似度
-        similarities = cosine_similarity(query_vector, self.content_vectors).flatten()
-        
-        # 获取最相似的结果
-        item_ids = list(self.knowledge_items.keys())
-        results = list(zip(item_ids, similarities))
-        results.sort(key=lambda x: x[1], reverse=True)
-        
-        return results[:top_k]
+        return {
+            'files': {path: tuple(state) for path, state in manifest['files'].items()},
+            'order': manifest['order'],
+            'truncated': manifest['truncated'],
+            'items': items,
+            'counts': counts,
+        }
+    
+    def save(self, version: str, kb: 'KnowledgeBase'):
+        """保存知识库当前的索引状态（调用方需先合并并压缩词频矩阵）"""
+        
+        items = []
+        for item in kb.knowledge_items.values():
+            metadata = asdict(item)
+            del metadata['content']
+            metadata['file_path'] = Path(item.file_path).relative_to(kb.base_path).as_posix()
+            metadata['last_updated'] = item.last_updated.isoformat()
+            items.append(metadata)
+        
+        tmp = self.directory.with_name(self.directory.name + '.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        with open(tmp / 'items.json', 'w', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False)
+        sp.save_npz(tmp / 'counts.npz', kb._counts, compressed=False)
+        with open(tmp / 'manifest.json', 'w', encoding='utf-8') as f:
+            json.dump({'format': SNAPSHOT_FORMAT, 'version': version, 'base_path': str(kb.base_path),
+                       'created': datetime.now().isoformat(), 'files': kb.file_states,
+                       'order': kb.row_ids, 'truncated': sorted(kb.truncated)}, f, ensure_ascii=False)
+        
+        old = self.directory.with_name(self.directory.name + '.old')
+        shutil.rmtree(old, ignore_errors=True)
+        if self.directory.exists():
+            os.replace(self.directory, old)
+        os.replace(tmp, self.directory)
+        shutil.rmtree(old, ignore_errors=True)
+        logger.info(f"知识库快照已保存到: {self.directory}")
 
 class AIKnowledgeAssistant:
     """AI知识助手"""
@@ -342,7 +747,7 @@ class AIKnowledgeAssistant:
         for item_id, similarity in search_results:
             if similarity > 0.1:  # 相似度阈值
                 item = self.knowledge_base.knowledge_items[item_id]
-                context_parts.append(f"## {item.title}\n{item.content[:500]}...")
+                context_parts.append(f"## {item.title}\n{self.knowledge_base.get_content(item)[:500]}...")
         
         return "\n\n".join(context_parts)
     
@@ -432,11 +837,15 @@ class AIKnowledgeAssistant:
         # 基于用户画像推荐内容
         recommendations = []
         
+        # 兴趣（各取前3）与学习目标（各取前2）一次批量搜索
+        interests = user_profile.interests
+        goals = user_profile.learning_goals
+        batch = self.knowledge_base.search_many(interests + goals, top_k=3)
+        interest_results, goal_results = batch[:len(interests)], batch[len(interests):]
+        
         # 基于兴趣推荐
-        if user_profile.interests:
-            for interest in user_profile.interests:
-                search_results = self.knowledge_base.search(interest, top_k=3)
-                recommendations.extend([item_id for item_id, _ in search_results])
+        for search_results in interest_results:
+            recommendations.extend([item_id for item_id, _ in search_results])
         
         # 基于技能水平推荐
         skill_based_items = [
@@ -446,10 +855,8 @@ class AIKnowledgeAssistant:
         recommendations.extend(skill_based_items[:5])
         
         # 基于学习目标推荐
-        if user_profile.learning_goals:
-            for goal in user_profile.learning_goals:
-                search_results = self.knowledge_base.search(goal, top_k=2)
-                recommendations.extend([item_id for item_id, _ in search_results])
+        for search_results in goal_results:
+            recommendations.extend([item_id for item_id, _ in search_results[:2]])
         
         # 去重并限制数量
         unique_recommendations = list(dict.fromkeys(recommendations))
@@ -459,16 +866,23 @@ class AIKnowledgeAssistant:
     def plan_learning_path(self, user_id: str, goal: str) -> List[str]:
         """规划学习路径"""
         
-        # 分析目标
-        goal_analysis = self.analyze_learning_goal(goal)
+        return self.plan_learning_paths(user_id, [goal])[0]
+    
+    def plan_learning_paths(self, user_id: str, goals: List[str]) -> List[List[str]]:
+        """为多个目标规划学习路径，相关知识点一次批量搜索"""
         
         # 搜索相关知识点
-        related_items = self.knowledge_base.search(goal, top_k=20)
+        related = self.knowledge_base.search_many(goals, top_k=20)
         
-        # 按难度和依赖关系排序
-        learning_path = self.organize_learning_path(related_items, goal_analysis)
+        learning_paths = []
+        for goal, related_items in zip(goals, related):
+            # 分析目标
+            goal_analysis = self.analyze_learning_goal(goal)
+            
+            # 按难度和依赖关系排序
+            learning_paths.append(self.organize_learning_path(related_items, goal_analysis))
         
-        return learning_path
+        return learning_paths
     
     def analyze_learning_goal(self, goal: str) -> Dict[str, Any]:
         """分析学习目标"""
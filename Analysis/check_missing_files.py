@@ -7,10 +7,13 @@
 
 import os
 import re
-import glob
+import sys
 from pathlib import Path
 from typing import List, Dict, Set, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+from file_index import shared_index
+
 class LinkChecker:
     def __init__(self, root_dir: str = "Analysis"):
         self.root_dir = Path(root_dir)
@@ -18,12 +21,15 @@ class LinkChecker:
         self.referenced_files = set()
         self.missing_files = set()
         self.broken_links = []
+        self.index = shared_index()
         
     def scan_all_files(self):
-        """扫描所有Markdown文件"""
-        pattern = str(self.root_dir / "**/*.md")
-        for file_path in glob.glob(pattern, recursive=True):
-            self.all_files.add(Path(file_path).relative_to(self.root_dir))
+        """扫描所有Markdown文件（取自语料库索引，与 glob 一样跳过隐藏目录）"""
+        root = self.root_dir.resolve()
+        for file_path in self.index.files_under(root):
+            rel = Path(file_path).relative_to(root)
+            if not any(part.startswith('.') for part in rel.parts):
+                self.all_files.add(rel)
         print(f"找到 {len(self.all_files)} 个Markdown文件")
     
     def extract_links_from_file(self, file_path: Path) -> List[str]:
@@ -67,7 +73,7 @@ class LinkChecker:
                 resolved_path = self.resolve_relative_path(full_path, link)
                 
                 # 检查文件是否存在
-                if not resolved_path.exists():
+                if not self.index.exists(resolved_path):
                     self.missing_files.add(link)
                     self.broken_links.append({
                         'source_file': str(file_path),
@@ -10,10 +10,14 @@
 
 import os
 import re
+import sys
 from pathlib import Path
 from collections import defaultdict
 from typing import List, Dict, Tuple, Optional
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+from md_tokens import tokenize
+
 class StructureChecker:
     def __init__(self, root_dir: str):
         self.root_dir = Path(root_dir)
@@ -37,16 +41,8 @@ class StructureChecker:
     
     def extract_headings(self, content: str) -> List[Tuple[int, str, int]]:
         """提取所有标题，返回 (级别, 标题文本, 行号)"""
-        headings = []
-        lines = content.split('\n')
-        for i, line in enumerate(lines, 1):
-            # 匹配 Markdown 标题
-            match = re.match(r'^(#{1,6})\s+(.+)$', line.strip())
-            if match:
-                level = len(match.group(1))
-                text = match.group(2).strip()
-                headings.append((level, text, i))
-        return headings
+        # md_tokens 一次扫描得到标题，代码块中的 # 行不算标题
+        return [(h.level, h.text, h.line) for h in tokenize(content).headings]
     
     def check_toc(self, content: str) -> Optional[Dict]:
         """检查是否有目录（TOC）"""
@@ -301,14 +297,21 @@ class StructureChecker:
         }
 
 def main():
-    # 获取脚本所在目录
+    import argparse
+    import json
+    
+    # 默认检查脚本所在目录
     script_dir = Path(__file__).parent
-    checker = StructureChecker(script_dir)
+    parser = argparse.ArgumentParser(description='检查 Markdown 文件的结构一致性')
+    parser.add_argument('--root', default=str(script_dir), help='检查目录（默认: 脚本所在目录）')
+    parser.add_argument('--output', default=str(script_dir / 'structure_check_report.json'), help='报告文件')
+    args = parser.parse_args()
+    
+    checker = StructureChecker(args.root)
     results = checker.check_all_files()
     
     # 保存结果到文件
-    import json
-    output_file = script_dir / 'structure_check_report.json'
+    output_file = Path(args.output)
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(results, f, ensure_ascii=False, indent=2)
     print(f"\n详细报告已保存到: {output_file}")
@@ -14,22 +14,51 @@
 
 import os
 import re
+import sys
 import ast
 import json
 import yaml
 import argparse
+import signal
 import subprocess
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple, Any, Optional
+from typing import Dict, Iterator, List, Tuple, Any, Optional
 import markdown
 from dataclasses import dataclass, asdict
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import hashlib
-import requests
+from html import escape
 from urllib.parse import urlparse
 import sqlite3
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+from parse_cache import CACHE_PATH, ParseCache, content_hash, decode_text, fingerprint, source_version
+from incremental import LinkGraph, ResultStore, norm_path, select_since
+from file_index import shared_index
+from line_index import line_index
+from external_links import ExternalLinkChecker
+from report_writers import JsonlWriter, ReportStats, ShardedHtmlWriter, TextSummaryWriter
+from results_db import RESULTS_DB_PATH, RunRecorder
+from check_timing import CheckTimer
+
+REPORT_TITLE = '数据科学知识库质量检查报告'
+REPORT_STYLE = """
+                body { font-family: Arial, sans-serif; margin: 20px; }
+                .header { background-color: #f0f0f0; padding: 20px; border-radius: 5px; }
+                .summary { margin: 20px 0; }
+                .document { border: 1px solid #ddd; margin: 10px 0; padding: 15px; border-radius: 5px; }
+                .score { font-weight: bold; }
+                .error { color: red; }
+                .warning { color: orange; }
+                .info { color: blue; }
+                .issue { margin: 5px 0; padding: 5px; background-color: #f9f9f9; }
+"""
+# 边检查边写出的报告格式
+STREAM_FORMATS = ['jsonl', 'html-pages', 'summary']
+
 
 @dataclass
 class QualityIssue:
@@ -234,6 +263,7 @@ class FormatChecker:
         issues = []
         score = 100.0
         
+        lines = line_index(content)
         for match in re.finditer(self.code_pattern, content, re.DOTALL):
             language = match.group(1)
             code = match.group(2)
@@ -241,7 +271,7 @@ class FormatChecker:
             if not language:
                 issues.append(QualityIssue(
                     file_path="",
-                    line_number=content[:match.start()].count('\n') + 1,
+                    line_number=lines.line_of(match.start()),
                     issue_type="code_language",
                     description="代码块缺少语言标识",
                     severity="info",
@@ -252,7 +282,7 @@ class FormatChecker:
             if not code.strip():
                 issues.append(QualityIssue(
                     file_path="",
-                    line_number=content[:match.start()].count('\n') + 1,
+                    line_number=lines.line_of(match.start()),
                     issue_type="empty_code_block",
                     description="代码块为空",
                     severity="warning",
@@ -267,13 +297,15 @@ class FormatChecker:
         issues = []
         score = 100.0
         
+        lines = line_index(content)
+        
         # 检查行内公式
-        inline_formulas = re.findall(self.math_pattern, content)
-        for formula in inline_formulas:
+        for match in re.finditer(self.math_pattern, content):
+            formula = match.group(1)
             if not self._is_valid_latex(formula):
                 issues.append(QualityIssue(
                     file_path="",
-                    line_number=1,
+                    line_number=lines.line_of(match.start()),
                     issue_type="invalid_math",
                     description=f"数学公式格式错误: {formula}",
                     severity="error",
@@ -282,12 +314,12 @@ class FormatChecker:
                 score -= 10
         
         # 检查块级公式
-        block_formulas = re.findall(self.block_math_pattern, content)
-        for formula in block_formulas:
+        for match in re.finditer(self.block_math_pattern, content):
+            formula = match.group(1)
             if not self._is_valid_latex(formula):
                 issues.append(QualityIssue(
                     file_path="",
-                    line_number=1,
+                    line_number=lines.line_of(match.start()),
                     issue_type="invalid_math",
                     description=f"块级数学公式格式错误: {formula}",
                     severity="error",
@@ -302,6 +334,7 @@ class FormatChecker:
         issues = []
         score = 100.0
         
+        lines = line_index(content)
         for match in re.finditer(self.link_pattern, content):
             text = match.group(1)
             url = match.group(2)
@@ -309,7 +342,7 @@ class FormatChecker:
             if not text.strip():
                 issues.append(QualityIssue(
                     file_path="",
-                    line_number=content[:match.start()].count('\n') + 1,
+                    line_number=lines.line_of(match.start()),
                     issue_type="empty_link_text",
                     description="链接文本为空",
                     severity="warning",
@@ -344,26 +377,30 @@ class FormatChecker:
 class LinkChecker:
     """链接有效性检查器"""
     
-    def __init__(self):
+    def __init__(self, external: Optional[ExternalLinkChecker] = None):
         self.internal_link_pattern = r'\[([^\]]+)\]\(([^)]+)\)'
         self.external_link_pattern = r'https?://[^\s\)]+'
         self.checked_links = {}
+        self.external = external
     
     def check(self, file_path: str, content: str, base_path: str) -> Tuple[float, List[QualityIssue]]:
         """检查链接有效性"""
-        issues = []
-        score = 100.0
-        
         # 检查内部链接
-        internal_score, internal_issues = self._check_internal_links(content, file_path, base_path)
-        score += internal_score - 100
-        issues.extend(internal_issues)
-        
+        internal = self._check_internal_links(content, file_path, base_path)
+
         # 检查外部链接
-        external_score, external_issues = self._check_external_links(content)
-        score += external_score - 100
-        issues.extend(external_issues)
-        
+        external = self._check_external_links(content)
+
+        return self.combine(internal, external)
+
+    def combine(self, internal: Tuple[float, List[QualityIssue]],
+                external: Tuple[float, List[QualityIssue]]) -> Tuple[float, List[QualityIssue]]:
+        """合并内部与外部链接的检查结果"""
+        issues = []
+        score = 100.0
+        for part_score, part_issues in (internal, external):
+            score += part_score - 100
+            issues.extend(part_issues)
         return max(0, score), issues
     
     def _check_internal_links(self, content: str, file_path: str, base_path: str) -> Tuple[float, List[QualityIssue]]:
@@ -371,6 +408,7 @@ class LinkChecker:
         issues = []
         score = 100.0
         
+        lines = line_index(content)
         for match in re.finditer(self.internal_link_pattern, content):
             text = match.group(1)
             url = match.group(2)
@@ -383,7 +421,7 @@ class LinkChecker:
             if not self._is_valid_internal_link(url, file_path, base_path):
                 issues.append(QualityIssue(
                     file_path=file_path,
-                    line_number=content[:match.start()].count('\n') + 1,
+                    line_number=lines.line_of(match.start()),
                     issue_type="invalid_internal_link",
                     description=f"内部链接无效: {url}",
                     severity="error",
@@ -395,15 +433,29 @@ class LinkChecker:
     
     def _check_external_links(self, content: str) -> Tuple[float, List[QualityIssue]]:
         """检查外部链接"""
+        return self._check_external_urls(self.extract_external_links(content))
+
+    def extract_internal_links(self, content: str) -> List[str]:
+        """提取内部链接目标（去重，按首次出现顺序），缓存命中时据此判断结果是否仍然有效"""
+        urls = (match.group(2) for match in re.finditer(self.internal_link_pattern, content))
+        return list(dict.fromkeys(url for url in urls if not url.startswith('http')))
+
+    def extract_external_links(self, content: str) -> List[Tuple[str, int]]:
+        """提取外部链接及其行号（按出现顺序，可缓存）"""
+        lines = line_index(content)
+        return [(match.group(0), lines.line_of(match.start()))
+                for match in re.finditer(self.external_link_pattern, content)]
+
+    def _check_external_urls(self, external_links: List[Tuple[str, int]]) -> Tuple[float, List[QualityIssue]]:
+        """检查已提取的外部链接列表"""
         issues = []
         score = 100.0
-        
-        external_links = re.findall(self.external_link_pattern, content)
-        for link in external_links:
+
+        for link, line_number in external_links:
             if not self._is_valid_external_link(link):
                 issues.append(QualityIssue(
                     file_path="",
-                    line_number=1,
+                    line_number=line_number,
                     issue_type="invalid_external_link",
                     description=f"外部链接无效: {link}",
                     severity="warning",
@@ -426,30 +478,50 @@ class LinkChecker:
             else:
                 url = str(Path(base_path) / url)
             
-            # 检查文件是否存在
-            return Path(url).exists()
+            # 检查文件是否存在（查语料库索引，不逐条访问文件系统）
+            return shared_index().exists(url)
         except:
             return False
     
     def _is_valid_external_link(self, url: str) -> bool:
         """检查外部链接是否有效"""
-        if url in self.checked_links:
-            return self.checked_links[url]
-        
-        try:
-            response = requests.head(url, timeout=5, allow_redirects=True)
-            self.checked_links[url] = response.status_code < 400
-            return self.checked_links[url]
-        except:
-            self.checked_links[url] = False
-            return False
+        if url not in self.checked_links:
+            self.checked_links[url] = self._external_checker().check(url)
+        return self.checked_links[url]
+
+    def prefetch_external_links(self, urls: List[str]) -> None:
+        """并发检查一批外部链接（结果写入内存与磁盘缓存），之后的逐条检查直接命中"""
+        urls = [url for url in dict.fromkeys(urls) if url not in self.checked_links]
+        if urls:
+            self.checked_links.update(self._external_checker().check_many(urls))
+
+    def _external_checker(self) -> ExternalLinkChecker:
+        if self.external is None:
+            self.external = ExternalLinkChecker()
+        return self.external
+
+    def close(self) -> None:
+        if self.external is not None:
+            self.external.close()
 
 
 class CodeQualityChecker:
-    """代码质量检查器"""
+    """代码质量检查器
+
+    代码块的检查结果只取决于代码内容和检查方式，按 (检查方式, 代码内容哈希, 检查器版本)
+    缓存：同一段代码在多篇文档中出现（如 Sqlite/ 下复制的示例）只检查一次，
+    启用解析缓存时结果跨运行保留。prefetch 把尚无结果的代码块去重后放进进程池并行检查。
+    """
     
-    def __init__(self):
+    BLOCK_PATTERN = re.compile(r'```(\w+)?\n(.*?)```', re.DOTALL)
+    # 键为代码块而非整个文件的哈希，见 parse_cache 中的 fragment 命名空间
+    NAMESPACE = 'fragment.enhanced.code_block'
+    
+    def __init__(self, cache: Optional[ParseCache] = None):
         self.supported_languages = ['python', 'rust', 'javascript', 'sql', 'haskell', 'go']
+        self.cache = cache
+        self.version = source_version(CodeQualityChecker)
+        self._blocks: Dict[Tuple[str, str], Dict[str, Any]] = {}
     
     def check(self, file_path: str, content: str) -> Tuple[float, List[QualityIssue]]:
         """检查代码质量"""
@@ -457,18 +529,72 @@ class CodeQualityChecker:
         score = 100.0
         
         # 提取代码块
-        code_blocks = re.findall(r'```(\w+)?\n(.*?)```', content, re.DOTALL)
-        
-        for language, code in code_blocks:
+        lines = line_index(content)
+        for match in self.BLOCK_PATTERN.finditer(content):
+            language, code = match.group(1), match.group(2)
             if not language or language not in self.supported_languages:
                 continue
             
-            code_score, code_issues = self._check_code_block(language, code)
+            code_score, code_issues = self._check_code_block_cached(language, code)
             score += code_score - 100
+            # 代码块内的行号换算为文档行号
+            first_line = lines.line_of(match.start(2))
+            for issue in code_issues:
+                issue.line_number += first_line - 1
             issues.extend(code_issues)
         
         return max(0, score), issues
     
+    def extract_blocks(self, content: str) -> List[Tuple[str, str]]:
+        """受支持语言的代码块 (语言, 代码)"""
+        return [(m.group(1), m.group(2)) for m in self.BLOCK_PATTERN.finditer(content)
+                if m.group(1) in self.supported_languages]
+    
+    @staticmethod
+    def _block_key(language: str, code: str) -> Tuple[str, str]:
+        """缓存键：python/rust/sql 各有检查方式，其余语言同为通用检查，结果可共用"""
+        kind = language if language in ('python', 'rust', 'sql') else 'generic'
+        return kind, content_hash(code.encode('utf-8', 'surrogatepass'))
+    
+    def _lookup(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        result = self._blocks.get(key)
+        if result is None and self.cache is not None:
+            result = self.cache.get(key[1], self.NAMESPACE, self.version, key[0])
+            if result is not None:
+                self._blocks[key] = result
+        return result
+    
+    def _store(self, key: Tuple[str, str], result: Dict[str, Any]) -> None:
+        self._blocks[key] = result
+        if self.cache is not None:
+            self.cache.put(key[1], self.NAMESPACE, self.version, result, key[0])
+    
+    def _check_code_block_cached(self, language: str, code: str) -> Tuple[float, List[QualityIssue]]:
+        """检查单个代码块，同一内容的结果直接复用（问题对象每次新建，调用方会改写行号）"""
+        key = self._block_key(language, code)
+        result = self._lookup(key)
+        if result is None:
+            result = _code_block_result((language, code))
+            self._store(key, result)
+        return result['score'], [QualityIssue(**issue) for issue in result['issues']]
+    
+    def prefetch(self, blocks: Iterator[Tuple[str, str]], jobs: int = 1) -> int:
+        """按内容去重后检查尚无结果的代码块（jobs > 1 时在进程池中进行），返回新检查的数量"""
+        pending: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        for language, code in blocks:
+            key = self._block_key(language, code)
+            if key not in pending and self._lookup(key) is None:
+                pending[key] = (language, code)
+        if jobs > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = list(executor.map(_code_block_result, pending.values(),
+                                            chunksize=max(1, len(pending) // (jobs * 8))))
+        else:
+            results = [_code_block_result(block) for block in pending.values()]
+        for key, result in zip(pending, results):
+            self._store(key, result)
+        return len(pending)
+    
     def _check_code_block(self, language: str, code: str) -> Tuple[float, List[QualityIssue]]:
         """检查单个代码块"""
         issues = []
@@ -495,7 +621,7 @@ class CodeQualityChecker:
         except SyntaxError as e:
             issues.append(QualityIssue(
                 file_path="",
-                line_number=1,
+                line_number=e.lineno or 1,
                 issue_type="python_syntax_error",
                 description=f"Python语法错误: {str(e)}",
                 severity="error",
@@ -580,27 +706,71 @@ class CodeQualityChecker:
         return score, issues
 
 
+def _code_block_result(block: Tuple[str, str]) -> Dict[str, Any]:
+    """检查一个代码块，结果为可缓存的字典（可在工作进程中执行）"""
+    score, issues = CodeQualityChecker()._check_code_block(*block)
+    return {'score': score, 'issues': [asdict(issue) for issue in issues]}
+
+
+class PathNgramIndex:
+    """文件路径的 n-gram 倒排索引，用于"某字符串是否为任一路径的子串"查询
+
+    长度不足 n 的查询直接查短子串集合；其余查询取各 n-gram 倒排表的交集得到候选路径，
+    再逐个做真正的子串校验，因此结果与线性扫描完全一致。
+    """
+
+    def __init__(self, paths: List[str], n: int = 3):
+        self.n = n
+        self.paths = paths
+        self.short_grams = set()
+        self.postings: Dict[str, set] = defaultdict(set)
+        for i, path in enumerate(paths):
+            for size in range(1, n):
+                self.short_grams.update(path[j:j + size] for j in range(len(path) - size + 1))
+            for j in range(len(path) - n + 1):
+                self.postings[path[j:j + n]].add(i)
+
+    def contains(self, query: str) -> bool:
+        if not query:
+            return bool(self.paths)
+        if len(query) < self.n:
+            return query in self.short_grams
+        grams = {query[j:j + self.n] for j in range(len(query) - self.n + 1)}
+        postings = sorted((self.postings.get(g, set()) for g in grams), key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates = candidates & posting
+        return any(query in self.paths[i] for i in candidates)
+
+
 class CrossReferenceChecker:
     """交叉引用检查器"""
     
     def __init__(self):
         self.reference_pattern = r'\[([^\]]+)\]\(([^)]+)\)'
         self.concept_pattern = r'\*\*([^*]+)\*\*'  # 加粗的概念
+        self._files_ref: Optional[List[str]] = None
+        self._files_blob = ''
+        self._concept_index: Optional[PathNgramIndex] = None
+        self._reference_results: Dict[str, bool] = {}
+        self._concept_results: Dict[str, bool] = {}
     
     def check(self, file_path: str, content: str, all_files: List[str]) -> Tuple[float, List[QualityIssue]]:
         """检查交叉引用"""
         issues = []
         score = 100.0
         
-        # 提取文档中的概念
-        concepts = re.findall(self.concept_pattern, content)
+        lines = line_index(content)
         
         # 检查概念是否有对应的文档
-        for concept in concepts:
+        for match in re.finditer(self.concept_pattern, content):
+            concept = match.group(1)
             if not self._has_concept_document(concept, all_files):
                 issues.append(QualityIssue(
                     file_path=file_path,
-                    line_number=1,
+                    line_number=lines.line_of(match.start()),
                     issue_type="missing_concept_document",
                     description=f"概念'{concept}'缺少对应的文档",
                     severity="info",
@@ -609,12 +779,12 @@ class CrossReferenceChecker:
                 score -= 2
         
         # 检查引用完整性
-        references = re.findall(self.reference_pattern, content)
-        for text, url in references:
+        for match in re.finditer(self.reference_pattern, content):
+            url = match.group(2)
             if not self._is_valid_reference(url, all_files):
                 issues.append(QualityIssue(
                     file_path=file_path,
-                    line_number=1,
+                    line_number=lines.line_of(match.start()),
                     issue_type="invalid_reference",
                     description=f"引用无效: {url}",
                     severity="warning",
@@ -625,38 +795,71 @@ class CrossReferenceChecker:
         return max(0, score), issues
     
     def _has_concept_document(self, concept: str, all_files: List[str]) -> bool:
-        """检查概念是否有对应的文档"""
+        """检查概念是否有对应的文档（概念小写后是否为某个小写文件路径的子串）"""
+        self._sync_files(all_files)
         concept_lower = concept.lower()
-        for file_path in all_files:
-            if concept_lower in file_path.lower():
-                return True
-        return False
+        if concept_lower not in self._concept_results:
+            self._concept_results[concept_lower] = self._concept_index.contains(concept_lower)
+        return self._concept_results[concept_lower]
     
     def _is_valid_reference(self, url: str, all_files: List[str]) -> bool:
         """检查引用是否有效"""
         if url.startswith('http'):
             return True
         
-        # 检查内部引用
-        for file_path in all_files:
-            if url in file_path:
-                return True
-        return False
+        # 检查内部引用：url 是否为任一文件路径的子串。所有路径以 \0 拼接成一个字符串，
+        # 一次 in 运算即可完成判断，同一 url 的结果在同一文件集合内复用
+        self._sync_files(all_files)
+        if url not in self._reference_results:
+            self._reference_results[url] = '\0' not in url and url in self._files_blob
+        return self._reference_results[url]
+
+    def _sync_files(self, all_files: List[str]) -> None:
+        """文件集合变化时重建路径索引并清空查询结果"""
+        if all_files is self._files_ref:
+            return
+        self._files_ref = all_files
+        self._files_blob = '\0'.join(all_files)
+        self._concept_index = PathNgramIndex([file_path.lower() for file_path in all_files])
+        self._reference_results = {}
+        self._concept_results = {}
 
 
 class EnhancedQualityChecker:
     """增强版质量检查器"""
+
+    # 参与结果缓存的检查项: 检查器名 -> QualityScore 中的分数字段（顺序即问题的输出顺序）
+    CHECK_ORDER = [
+        ('content', 'content_depth'),
+        ('format', 'format'),
+        ('links', 'links'),
+        ('code', 'code_quality'),
+        ('cross_ref', 'cross_references'),
+    ]
     
-    def __init__(self, base_path: str):
+    def __init__(self, base_path: str, cache: Optional[ParseCache] = None,
+                 all_files: Optional[List[str]] = None,
+                 external: Optional[ExternalLinkChecker] = None, profile: bool = False):
         self.base_path = base_path
+        # 每个检查器在每个文件上的耗时（墙钟与CPU），profile 时另做 cProfile 与栈采样
+        self.timer = CheckTimer(profile=profile)
         self.checkers = {
             'content': ContentQualityChecker(),
             'format': FormatChecker(),
-            'links': LinkChecker(),
-            'code': CodeQualityChecker(),
+            'links': LinkChecker(external),
+            'code': CodeQualityChecker(cache),
             'cross_ref': CrossReferenceChecker()
         }
-        self.all_files = self._get_all_markdown_files()
+        self.all_files = all_files if all_files is not None else self._get_all_markdown_files()
+        self.cache = cache
+        if cache is not None:
+            # 规则版本取自检查器源码，修改规则后旧缓存自动失效
+            self.versions = {name: source_version(type(checker)) for name, checker in self.checkers.items()}
+            self.versions['metrics'] = source_version(EnhancedQualityChecker._document_metrics,
+                                                      LinkChecker.extract_external_links,
+                                                      LinkChecker.extract_internal_links)
+            # 交叉引用的结果还依赖语料库中的 Markdown 文件集合（内部链接见 _cache_context）
+            self.corpus_fingerprint = fingerprint([self.base_path] + self.all_files)
     
     def _get_all_markdown_files(self) -> List[str]:
         """获取所有Markdown文件"""
@@ -669,62 +872,113 @@ class EnhancedQualityChecker:
     
     def check_document(self, file_path: str) -> QualityScore:
         """检查单个文档"""
+        if self.cache is not None:
+            return self._check_document_cached(file_path)
+
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
         except Exception as e:
-            return QualityScore(
-                file_path=file_path,
-                title_hierarchy=0,
-                content_depth=0,
-                code_quality=0,
-                math_formulas=0,
-                links=0,
-                format=0,
-                cross_references=0,
-                overall=0,
-                issues=[QualityIssue(
-                    file_path=file_path,
-                    line_number=1,
-                    issue_type="file_error",
-                    description=f"文件读取错误: {str(e)}",
-                    severity="error"
-                )],
-                word_count=0,
-                code_block_count=0,
-                math_formula_count=0,
-                link_count=0
-            )
-        
-        # 计算基础指标
-        word_count = len(content.split())
-        code_block_count = len(re.findall(r'```\w+', content))
-        math_formula_count = len(re.findall(r'\$[^$]+\$', content))
-        link_count = len(re.findall(r'\[([^\]]+)\]\(([^)]+)\)', content))
-        
-        # 执行各项检查
+            return self._error_score(file_path, e)
+
+        metrics = self._document_metrics(content)
+        results = {name: self._run_check(name, file_path, content) for name, _ in self.CHECK_ORDER}
+        return self._build_score(file_path, metrics, results)
+
+    def _check_document_cached(self, file_path: str) -> QualityScore:
+        """检查单个文档，内容未变化时直接复用缓存的解析结构与各检查器结果"""
+        try:
+            digest, data = self.cache.file_digest(file_path)
+        except Exception as e:
+            return self._error_score(file_path, e)
+
+        content = None
+        metrics = self.cache.get(digest, 'enhanced.metrics', self.versions['metrics'])
+        if metrics is None:
+            try:
+                content = self._decode(file_path, data)
+            except Exception as e:
+                return self._error_score(file_path, e)
+            metrics = self._document_metrics(content)
+            self.cache.put(digest, 'enhanced.metrics', self.versions['metrics'], metrics)
+
+        results = {}
+        for name, _ in self.CHECK_ORDER:
+            context = self._cache_context(name, file_path, metrics)
+            cached = self.cache.get(digest, f'enhanced.{name}', self.versions[name], context)
+            if cached is not None:
+                results[name] = (cached['score'], [QualityIssue(**issue) for issue in cached['issues']])
+
+        if len(results) < len(self.CHECK_ORDER):
+            if content is None:
+                try:
+                    content = self._decode(file_path, data)
+                except Exception as e:
+                    return self._error_score(file_path, e)
+
+            for name, _ in self.CHECK_ORDER:
+                if name not in results:
+                    score, issues = self._run_check(name, file_path, content)
+                    results[name] = (score, issues)
+                    self.cache.put(digest, f'enhanced.{name}', self.versions[name],
+                                   {'score': score, 'issues': [asdict(issue) for issue in issues]},
+                                   self._cache_context(name, file_path, metrics))
+
+        return self._build_score(file_path, metrics, results)
+
+    @staticmethod
+    def _decode(file_path: str, data: Optional[bytes]) -> str:
+        if data is None:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        return decode_text(data)
+
+    def _cache_context(self, name: str, file_path: str, metrics: Dict[str, Any]) -> str:
+        """缓存上下文：问题中带有文件路径；交叉引用还依赖 Markdown 文件集合，
+        内部链接还依赖各链接目标（任意类型的文件或目录）当前是否存在"""
+        if name == 'cross_ref':
+            return f"{file_path}\0{self.corpus_fingerprint}"
+        if name == 'links':
+            link_checker = self.checkers['links']
+            exists = ''.join('1' if link_checker._is_valid_internal_link(url, file_path, self.base_path) else '0'
+                             for url in metrics['internal_links'])
+            return f"{file_path}\0{exists}"
+        return file_path
+
+    def _document_metrics(self, content: str) -> Dict[str, Any]:
+        """计算基础指标（外部链接列表单独保存，以便缓存命中时仍可重新检查外部链接）"""
+        return {
+            'word_count': len(content.split()),
+            'code_block_count': len(re.findall(r'```\w+', content)),
+            'math_formula_count': len(re.findall(r'\$[^$]+\$', content)),
+            'link_count': len(re.findall(r'\[([^\]]+)\]\(([^)]+)\)', content)),
+            'external_links': self.checkers['links'].extract_external_links(content),
+            'internal_links': self.checkers['links'].extract_internal_links(content),
+        }
+
+    def _run_check(self, name: str, file_path: str, content: str) -> Tuple[float, List[QualityIssue]]:
+        """执行单项检查并计时；链接检查在此只做内部链接部分，外部链接见 _build_score"""
+        if name == 'links':
+            return self.timer.call(name, file_path, self.checkers['links']._check_internal_links,
+                                   content, file_path, self.base_path)
+        if name == 'cross_ref':
+            return self.timer.call(name, file_path, self.checkers['cross_ref'].check,
+                                   file_path, content, self.all_files)
+        return self.timer.call(name, file_path, self.checkers[name].check, file_path, content)
+
+    def _build_score(self, file_path: str, metrics: Dict[str, Any],
+                     results: Dict[str, Tuple[float, List[QualityIssue]]]) -> QualityScore:
+        """汇总各检查项结果"""
+        link_checker = self.checkers['links']
+        internal = results['links']
+        external = link_checker._check_external_urls(metrics['external_links'])
+        results = dict(results, links=link_checker.combine(internal, external))
+
         scores = {}
         all_issues = []
-        
-        # 内容质量检查
-        scores['content_depth'], content_issues = self.checkers['content'].check(file_path, content)
-        all_issues.extend(content_issues)
-        
-        # 格式检查
-        scores['format'], format_issues = self.checkers['format'].check(file_path, content)
-        all_issues.extend(format_issues)
-        
-        # 链接检查
-        scores['links'], link_issues = self.checkers['links'].check(file_path, content, self.base_path)
-        all_issues.extend(link_issues)
-        
-        # 代码质量检查
-        scores['code_quality'], code_issues = self.checkers['code'].check(file_path, content)
-        all_issues.extend(code_issues)
-        
-        # 交叉引用检查
-        scores['cross_references'], cross_ref_issues = self.checkers['cross_ref'].check(file_path, content, self.all_files)
-        all_issues.extend(cross_ref_issues)
+        for name, score_key in self.CHECK_ORDER:
+            scores[score_key], issues = results[name]
+            all_issues.extend(issues)
         
         # 计算总体分数
         overall = sum(scores.values()) / len(scores)
@@ -740,18 +994,271 @@ class EnhancedQualityChecker:
             cross_references=scores.get('cross_references', 0),
             overall=overall,
             issues=all_issues,
-            word_count=word_count,
-            code_block_count=code_block_count,
-            math_formula_count=math_formula_count,
-            link_count=link_count
+            word_count=metrics['word_count'],
+            code_block_count=metrics['code_block_count'],
+            math_formula_count=metrics['math_formula_count'],
+            link_count=metrics['link_count']
+        )
+
+    def _error_score(self, file_path: str, error: Exception) -> QualityScore:
+        """文件无法读取时的结果"""
+        return QualityScore(
+            file_path=file_path,
+            title_hierarchy=0,
+            content_depth=0,
+            code_quality=0,
+            math_formulas=0,
+            links=0,
+            format=0,
+            cross_references=0,
+            overall=0,
+            issues=[QualityIssue(
+                file_path=file_path,
+                line_number=1,
+                issue_type="file_error",
+                description=f"文件读取错误: {str(error)}",
+                severity="error"
+            )],
+            word_count=0,
+            code_block_count=0,
+            math_formula_count=0,
+            link_count=0
         )
     
-    def check_all_documents(self) -> List[QualityScore]:
-        """检查所有文档"""
-        results = []
+    def check_all_documents(self, jobs: int = 1, files: Optional[List[str]] = None) -> List[QualityScore]:
+        """检查所有文档（或 files 指定的子集），结果顺序与输入文件顺序一致"""
+        files = self.all_files if files is None else files
+        results: List[Optional[QualityScore]] = [None] * len(files)
+        for index, result in self.iter_documents(jobs=jobs, files=files):
+            results[index] = result
+        return results
+
+    def iter_documents(self, jobs: int = 1, files: Optional[List[str]] = None) -> Iterator[Tuple[int, QualityScore]]:
+        """逐个产出 (文件序号, 结果)，供流式报告边检查边输出
+
+        jobs > 1 时按文件大小分块，分发到进程池并行检查（各检查器均为CPU密集的
+        正则/AST处理，线程池受GIL限制无法加速）。无论 jobs 取值，都按 files 的顺序产出。
+        """
+        files = self.all_files if files is None else files
+        # 先并发检查全部外部链接，整轮耗时取决于最慢的站点而非所有站点之和
+        self.checkers['links'].prefetch_external_links(self._collect_external_links(files))
+        if self.cache is not None:
+            # 代码块结果经缓存传给工作进程和之后的运行；不启用缓存时各进程在检查中自行去重
+            self.checkers['code'].prefetch(self._iter_uncached_code_blocks(files), jobs)
+        if jobs > 1 and len(files) > 1:
+            yield from self._iter_parallel(jobs, files)
+        else:
+            for index, file_path in enumerate(files):
+                yield index, self.check_document(file_path)
+        if self.cache is not None:
+            self.cache.prune()
+            self.cache.prune_versions(CodeQualityChecker.NAMESPACE, self.checkers['code'].version)
+
+    def _collect_external_links(self, files: List[str]) -> List[str]:
+        """收集文件中的外部链接；启用缓存时顺带写入基础指标，检查阶段可直接复用"""
+        urls = []
+        for file_path in files:
+            try:
+                if self.cache is None:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        links = self.checkers['links'].extract_external_links(f.read())
+                else:
+                    digest, data = self.cache.file_digest(file_path)
+                    metrics = self.cache.get(digest, 'enhanced.metrics', self.versions['metrics'])
+                    if metrics is None:
+                        if data is None:
+                            with open(file_path, 'rb') as f:
+                                data = f.read()
+                        metrics = self._document_metrics(decode_text(data))
+                        self.cache.put(digest, 'enhanced.metrics', self.versions['metrics'], metrics)
+                    links = metrics['external_links']
+            except Exception:
+                # 读取失败的文件在检查阶段会报告 file_error
+                continue
+            urls.extend(url for url, _ in links)
+        return urls
+
+    def _iter_uncached_code_blocks(self, files: List[str]) -> Iterator[Tuple[str, str]]:
+        """代码检查结果尚未按文档缓存的文件中的代码块"""
+        for file_path in files:
+            try:
+                digest, data = self.cache.file_digest(file_path)
+                if self.cache.get(digest, 'enhanced.code', self.versions['code'], file_path) is not None:
+                    continue
+                if data is None:
+                    with open(file_path, 'rb') as f:
+                        data = f.read()
+                content = decode_text(data)
+            except Exception:
+                continue
+            yield from self.checkers['code'].extract_blocks(content)
+
+    def check_since(self, since: Optional[str] = None, jobs: int = 1) -> List[QualityScore]:
+        """检查并合并到上次的完整结果（顺序与 self.all_files 一致）"""
+        order = {file_path: index for index, file_path in enumerate(self.all_files)}
+        return sorted(self.iter_since(since, jobs), key=lambda r: order[r.file_path])
+
+    def iter_since(self, since: Optional[str] = None, jobs: int = 1) -> Iterator[QualityScore]:
+        """逐个产出合并后的结果
+
+        since 为空时做完整检查；否则只检查自该 git 引用以来变更的文件及链接到
+        变更/删除文件的文档，其余文件沿用结果存储中的上次结果，汇总数据仍覆盖全部文档。
+        新检查的结果先产出，沿用的结果随后产出。
+        """
+        store = ResultStore('enhanced_quality_checker', self.base_path)
+        files = select_since(since, self.all_files, store) if since else self.all_files
+        for _, result in self.iter_documents(jobs=jobs, files=files):
+            store.put(result.file_path, asdict(result))
+            yield result
+        checked = set(files)
         for file_path in self.all_files:
-            result = self.check_document(file_path)
-            results.append(result)
+            stored = None if file_path in checked else store.get(file_path)
+            if stored is not None:
+                yield QualityScore(**dict(stored, issues=[QualityIssue(**i) for i in stored['issues']]))
+        store.retain(self.all_files)
+        store.save()
+        store.close()
+
+    def watch(self, output: str, output_format: str = 'html', jobs: int = 1,
+              interval: float = 1.0, polling: bool = False, batch: int = 50) -> None:
+        """监视模式：常驻进程，文件变化后只重新检查变化的文件及链接到它们的文档
+
+        启动时做一次完整检查（有缓存时基本全部命中），之后文件索引、链接图和每个
+        文件的结果都保留在内存中。每批变化（inotify，不可用时轮询）先检查变化的
+        文件及其链接依赖方并打印结果，再原子地重写报告，磁盘上的报告始终与当前
+        内容一致。图片等任意文件或目录的出现与消失会重新检查链接到它们的文档；新增或
+        删除 Markdown 文件还会改变交叉引用所依赖的文档集合，其余文档随后在空闲时每次
+        batch 个分批重新检查。Ctrl-C 退出时保存结果存储，
+        之后的 --since 运行可直接沿用。
+        """
+        from watcher import watch_changes
+
+        results = {norm_path(r.file_path): r for r in self.iter_since(None, jobs=jobs)}
+        known = {norm_path(p): p for p in self.all_files}
+        graph = LinkGraph()
+        graph.sync(self.all_files)
+        self.write_report(output_format, output, self._ordered(results))
+        # 监视全部文件而不只是 Markdown：链接目标可以是图片等任意文件
+        watcher = watch_changes(self.base_path, suffixes=None, interval=interval, polling=polling)
+        print(f"监视中（{type(watcher).__name__}）: {self.base_path}，{len(results)} 个文档，报告: {output}")
+
+        stale: List[str] = []
+        try:
+            while True:
+                events = watcher.wait(0 if stale else None)
+                if not events:
+                    if not stale:
+                        continue
+                    # 空闲：分批补查文件集合变化后的其余文档
+                    todo, stale = stale[:batch], stale[batch:]
+                    self._recheck([p for p in todo if norm_path(p) in known], results)
+                    if not stale:
+                        self.write_report(output_format, output, self._ordered(results))
+                        print(f"文件集合变化后的补查完成，报告已更新: {output}")
+                    continue
+
+                start = time.perf_counter()
+                # 任何文件或目录（图片等链接目标）的出现或消失都会改变内部链接的结果；
+                # 只是修改了非 Markdown 文件（包括报告本身）则无需重新检查
+                flipped = {norm_path(p) for p in shared_index().apply_events(events)}
+                keys = {norm_path(p): p for p in events if p.endswith('.md') or norm_path(p) in flipped}
+                if not keys:
+                    continue
+                docs = {k: p for k, p in keys.items() if p.endswith('.md')}
+                created = {k for k, p in docs.items() if k not in known and os.path.isfile(p)}
+                deleted = {k for k in docs if k in known and not os.path.exists(k)}
+                if created or deleted:
+                    for k in created:
+                        known[k] = os.path.join(self.base_path, os.path.relpath(keys[k], self.base_path))
+                    for k in deleted:
+                        del known[k]
+                        results.pop(k, None)
+                        print(f"已删除: {keys[k]}")
+                    # 新的列表对象：交叉引用检查器据此重建路径索引
+                    self.all_files = [p for p in self.all_files if norm_path(p) in known]
+                    self.all_files += [known[k] for k in created]
+                    if self.cache is not None:
+                        self.corpus_fingerprint = fingerprint([self.base_path] + self.all_files)
+                graph.sync(docs.values())
+                selected = {k for k in docs if k in known} | graph.dependents(set(keys))
+                files = [known[k] for k in selected if k in known]
+                for result in self._recheck(files, results):
+                    print(f"  {result.overall:6.1f}  {len(result.issues):4d} 个问题  {result.file_path}")
+                if created or deleted:
+                    stale = [p for p in self.all_files if norm_path(p) not in selected]
+                self.write_report(output_format, output, self._ordered(results))
+                print(f"重新检查 {len(files)} 个文档，用时 {(time.perf_counter() - start) * 1000:.0f} ms"
+                      + (f"，另有 {len(stale)} 个文档待补查" if stale else ""))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+            store = ResultStore('enhanced_quality_checker', self.base_path)
+            store.merge(self.all_files, {r.file_path: asdict(r) for r in results.values()})
+            store.save()
+            graph.save()
+            shared_index().save()
+
+    def _recheck(self, files: List[str], results: Dict[str, QualityScore]) -> List[QualityScore]:
+        """监视模式下在本进程内重新检查一批文件（不清理缓存，其余文件的缓存条目仍有效）"""
+        self.checkers['links'].prefetch_external_links(self._collect_external_links(files))
+        checked = [self.check_document(file_path) for file_path in files]
+        for result in checked:
+            results[norm_path(result.file_path)] = result
+        if self.cache is not None:
+            self.cache.commit()
+        return checked
+
+    def _ordered(self, results: Dict[str, QualityScore]) -> List[QualityScore]:
+        return [results[k] for k in map(norm_path, self.all_files) if k in results]
+
+    def write_report(self, output_format: str, output: str, results: List[QualityScore]) -> None:
+        """写出完整报告；先写临时文件再替换，读者不会看到写了一半的报告"""
+        if output_format == 'html-pages':
+            # 分页报告的索引页本身就是替换写入的
+            target = output
+        else:
+            target = output + '.tmp'
+        if output_format in STREAM_FORMATS:
+            stream = StreamingReport(output_format, target, self.timer)
+            for result in results:
+                stream.write(result)
+            stream.close()
+        else:
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(self.generate_report(results, output_format))
+        if target != output:
+            os.replace(target, output)
+
+    def _iter_parallel(self, jobs: int, files: List[str]) -> Iterator[Tuple[int, QualityScore]]:
+        """进程池并行检查，按块号顺序产出（与 jobs=1 的顺序相同）
+
+        在途任务数受限：最早未产出的块之后最多再提交 max_in_flight 个块，先完成的
+        后续块在内存中等待前面的块，避免一次性提交全部分块占用内存。
+        """
+        cache_path = None
+        if self.cache is not None:
+            self.cache.commit()
+            cache_path = str(self.cache.path)
+        external_config = self.checkers['links']._external_checker().config
+
+        chunks = plan_chunks(files, jobs)
+        max_in_flight = jobs * 2
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(self.base_path, self.all_files, cache_path, external_config,
+                                           self.timer.profile)) as executor:
+            pending: Dict[int, Any] = {}
+            submitted = 0
+            for emitted in range(len(chunks)):
+                while submitted < len(chunks) and submitted - emitted < max_in_flight:
+                    pending[submitted] = executor.submit(_check_chunk, chunks[submitted])
+                    submitted += 1
+                yield from self._chunk_results(pending.pop(emitted))
+
+    def _chunk_results(self, future) -> List[Tuple[int, QualityScore]]:
+        """取出任务块结果，并把工作进程的计时并入本进程"""
+        results, timing = future.result()
+        self.timer.merge(timing)
         return results
     
     def generate_report(self, results: List[QualityScore], output_format: str = 'html') -> str:
@@ -765,29 +1272,19 @@ class EnhancedQualityChecker:
     
     def _generate_html_report(self, results: List[QualityScore]) -> str:
         """生成HTML报告"""
-        html = """
+        html = f"""
         <!DOCTYPE html>
         <html>
         <head>
-            <title>数据科学知识库质量检查报告</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 20px; }
-                .header { background-color: #f0f0f0; padding: 20px; border-radius: 5px; }
-                .summary { margin: 20px 0; }
-                .document { border: 1px solid #ddd; margin: 10px 0; padding: 15px; border-radius: 5px; }
-                .score { font-weight: bold; }
-                .error { color: red; }
-                .warning { color: orange; }
-                .info { color: blue; }
-                .issue { margin: 5px 0; padding: 5px; background-color: #f9f9f9; }
-            </style>
+            <title>{REPORT_TITLE}</title>
+            <style>{REPORT_STYLE}</style>
         </head>
         <body>
             <div class="header">
-                <h1>数据科学知识库质量检查报告</h1>
-                <p>生成时间: {}</p>
+                <h1>{REPORT_TITLE}</h1>
+                <p>生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
             </div>
-        """.format(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        """
         
         # 总体统计
         total_docs = len(results)
@@ -802,29 +1299,36 @@ class EnhancedQualityChecker:
                 <p>总问题数: {total_issues}</p>
             </div>
         """
+        html += timing_html(self.timer)
         
         # 文档详情
         for result in sorted(results, key=lambda x: x.overall):
-            html += f"""
+            html += self._document_html(result)
+        
+        html += "</body></html>"
+        return html
+
+    @staticmethod
+    def _document_html(result: QualityScore) -> str:
+        """单个文档的HTML片段（完整报告与分页报告共用）"""
+        html = f"""
                 <div class="document">
                     <h3>{result.file_path}</h3>
                     <p class="score">总体分数: {result.overall:.2f}</p>
                     <p>字数: {result.word_count}, 代码块: {result.code_block_count}, 数学公式: {result.math_formula_count}, 链接: {result.link_count}</p>
             """
-            
-            if result.issues:
-                html += "<h4>问题列表:</h4>"
-                for issue in result.issues:
-                    html += f"""
+        
+        if result.issues:
+            html += "<h4>问题列表:</h4>"
+            for issue in result.issues:
+                html += f"""
                         <div class="issue {issue.severity}">
                             <strong>{issue.issue_type}</strong> (第{issue.line_number}行): {issue.description}
                             {f'<br>建议: {issue.suggestion}' if issue.suggestion else ''}
                         </div>
                     """
-            
-            html += "</div>"
         
-        html += "</body></html>"
+        html += "</div>"
         return html
     
     def _generate_json_report(self, results: List[QualityScore]) -> str:
@@ -834,6 +1338,7 @@ class EnhancedQualityChecker:
             'total_documents': len(results),
             'average_score': sum(r.overall for r in results) / len(results) if results else 0,
             'total_issues': sum(len(r.issues) for r in results),
+            'timing': self.timer.as_dict(),
             'documents': [asdict(result) for result in results]
         }
         return json.dumps(report_data, indent=2, ensure_ascii=False)
@@ -848,7 +1353,7 @@ class EnhancedQualityChecker:
 - 检查文档数: {len(results)}
 - 平均质量分数: {sum(r.overall for r in results) / len(results) if results else 0:.2f}
 - 总问题数: {sum(len(r.issues) for r in results)}
-
+{timing_text(self.timer)}
 文档详情:
 """
         
@@ -869,36 +1374,263 @@ class EnhancedQualityChecker:
         return report
 
 
+def timing_html(timer: CheckTimer) -> str:
+    """检查耗时：各检查器的耗时分布与最慢的 文件×检查器 组合（本次没有执行检查时为空）"""
+    summary = timer.summary()
+    if not summary:
+        return ''
+    rows = ''.join(
+        f"<tr><td>{name}</td><td>{wall.count}</td><td>{wall.total:.2f}</td><td>{cpu.total:.2f}</td>"
+        f"<td>{wall.quantile(0.5) * 1000:.2f}</td><td>{wall.quantile(0.9) * 1000:.2f}</td>"
+        f"<td>{wall.quantile(0.99) * 1000:.2f}</td><td>{wall.max * 1000:.2f}</td></tr>"
+        for name, wall, cpu in summary)
+    slowest = ''.join(
+        f"<tr><td>{escape(file_path)}</td><td>{name}</td><td>{wall * 1000:.1f}</td><td>{cpu * 1000:.1f}</td></tr>"
+        for file_path, name, wall, cpu in timer.slowest())
+    return f"""
+            <div class="summary">
+                <h2>检查耗时</h2>
+                <table border="1" cellspacing="0" cellpadding="4">
+                    <tr><th>检查器</th><th>文件数</th><th>总耗时(s)</th><th>CPU(s)</th>
+                        <th>p50(ms)</th><th>p90(ms)</th><th>p99(ms)</th><th>最大(ms)</th></tr>
+                    {rows}
+                </table>
+                <h3>最慢的 {timer.keep} 个 文件×检查器</h3>
+                <table border="1" cellspacing="0" cellpadding="4">
+                    <tr><th>文件</th><th>检查器</th><th>耗时(ms)</th><th>CPU(ms)</th></tr>
+                    {slowest}
+                </table>
+            </div>
+        """
+
+
+def timing_text(timer: CheckTimer) -> str:
+    """timing_html 的文本版本"""
+    summary = timer.summary()
+    if not summary:
+        return ''
+    lines = ['', '检查耗时（分位数为对数分桶上界）:',
+             f"  {'检查器':<10} {'文件数':>7} {'总耗时s':>9} {'CPU s':>9} {'p50 ms':>9} {'p90 ms':>9} "
+             f"{'p99 ms':>9} {'最大 ms':>9}"]
+    for name, wall, cpu in summary:
+        lines.append(f"  {name:<13} {wall.count:>7} {wall.total:>9.2f} {cpu.total:>9.2f} "
+                     f"{wall.quantile(0.5) * 1000:>9.2f} {wall.quantile(0.9) * 1000:>9.2f} "
+                     f"{wall.quantile(0.99) * 1000:>9.2f} {wall.max * 1000:>9.2f}")
+    lines.append(f'最慢的 {timer.keep} 个 文件×检查器:')
+    for file_path, name, wall, cpu in timer.slowest():
+        lines.append(f"  {wall * 1000:>9.1f} ms  (CPU {cpu * 1000:.1f} ms)  {name:<10} {file_path}")
+    return '\n'.join(lines) + '\n'
+
+
+class StreamingReport:
+    """流式报告：每个结果到达即写出，内存占用与文档数量无关
+
+    jsonl 每行一个文档、末行为汇总；html-pages 为分页 HTML 加索引页；
+    summary 为每文档一行的文本摘要加末尾汇总。中途中断时已写出的部分仍可查看。
+    """
+
+    def __init__(self, output_format: str, output: str, timer: Optional[CheckTimer] = None):
+        self.format = output_format
+        self.timer = timer or CheckTimer()
+        self.stats = ReportStats()
+        if output_format == 'jsonl':
+            self.writer = JsonlWriter(output)
+        elif output_format == 'html-pages':
+            self.writer = ShardedHtmlWriter(output, REPORT_TITLE, REPORT_STYLE, self.stats)
+        else:
+            self.writer = TextSummaryWriter(output, REPORT_TITLE)
+
+    def write(self, result: QualityScore) -> None:
+        href = None
+        if self.format == 'jsonl':
+            self.writer.write(asdict(result))
+        elif self.format == 'html-pages':
+            href = self.writer.write(EnhancedQualityChecker._document_html(result), result.file_path)
+        else:
+            self.writer.write(result.overall, len(result.issues), result.file_path)
+        self.stats.add(result.file_path, result.overall, (issue.severity for issue in result.issues), href)
+
+    def close(self) -> None:
+        if self.format == 'jsonl':
+            self.writer.close(dict(self.stats.as_dict(), timing=self.timer.as_dict()))
+        elif self.format == 'html-pages':
+            self.writer.close(extra_html=timing_html(self.timer))
+        else:
+            self.writer.close(self.stats, extra=timing_text(self.timer))
+
+
+def plan_chunks(files: List[str], jobs: int, chunks_per_job: int = 8) -> List[List[Tuple[int, str]]]:
+    """按文件大小切分任务块
+
+    按输入顺序把相邻文件按字节数累积成块，每块约为总量的 1/(jobs*chunks_per_job)；
+    大文件（如 Matter/ 下 1MB+ 的文档）单独成块，不会把一批小文件拖在它后面。
+    块内外都保持输入顺序，按块号依次产出即得到确定的结果顺序。
+    """
+    sizes = []
+    for file_path in files:
+        try:
+            sizes.append(os.path.getsize(file_path))
+        except OSError:
+            sizes.append(0)
+
+    target = max(1, sum(sizes) // max(1, jobs * chunks_per_job))
+    chunks = []
+    current: List[Tuple[int, str]] = []
+    current_bytes = 0
+    for index, size in enumerate(sizes):
+        if size >= target and current:
+            chunks.append(current)
+            current, current_bytes = [], 0
+        current.append((index, files[index]))
+        current_bytes += size
+        if current_bytes >= target:
+            chunks.append(current)
+            current, current_bytes = [], 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+_worker_checker: Optional['EnhancedQualityChecker'] = None
+
+
+def _init_worker(base_path: str, all_files: List[str], cache_path: Optional[str],
+                 external_config: Dict[str, Any], profile: bool = False) -> None:
+    """进程池初始化：每个工作进程构建一次检查器（及自己的缓存连接）"""
+    global _worker_checker
+    # 每个任务块结束时提交缓存写入，工作进程退出时无需再做清理
+    cache = ParseCache(cache_path) if cache_path else None
+    # 外部链接已由主进程预检查并写入磁盘缓存，工作进程按相同配置读取
+    external = ExternalLinkChecker(**external_config)
+    _worker_checker = EnhancedQualityChecker(base_path, cache=cache, all_files=all_files, external=external,
+                                             profile=profile)
+
+
+def _check_chunk(chunk: List[Tuple[int, str]]) -> Tuple[List[Tuple[int, QualityScore]], Dict[str, Any]]:
+    """在工作进程中检查一个任务块，返回 [(原始序号, 结果)] 与该块的计时数据"""
+    results = [(index, _worker_checker.check_document(file_path)) for index, file_path in chunk]
+    if _worker_checker.cache is not None:
+        _worker_checker.cache.commit()
+    return results, _worker_checker.timer.drain()
+
+
+def write_profiles(checker: EnhancedQualityChecker, directory: str) -> None:
+    """写出 --profile 的剖析结果"""
+    paths = checker.timer.write_profiles(directory)
+    print(f"剖析结果已写入: {directory}（{len(paths)} 个文件，pstats 用 python -m pstats 查看）")
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='数据科学知识库质量检查工具')
     parser.add_argument('--path', default='.', help='检查路径')
     parser.add_argument('--output', default='quality_report.html', help='输出文件')
-    parser.add_argument('--format', choices=['html', 'json', 'text'], default='html', help='输出格式')
+    parser.add_argument('--format', choices=['html', 'json', 'text'] + STREAM_FORMATS, default='html',
+                        help='输出格式（jsonl/html-pages/summary 为边检查边写出的流式报告）')
     parser.add_argument('--single', help='检查单个文件')
+    parser.add_argument('--cache', default=str(CACHE_PATH), help='解析/结果缓存文件路径')
+    parser.add_argument('--no-cache', action='store_true', help='禁用缓存，完整重新检查')
+    parser.add_argument('--jobs', type=int, default=1, help='并行进程数（0 表示使用全部CPU核心）')
+    parser.add_argument('--link-ttl', type=float, default=168, help='外部链接检查结果的缓存有效期（小时）')
+    parser.add_argument('--link-negative-ttl', type=float, default=24, help='失效外部链接结果的缓存有效期（小时）')
+    parser.add_argument('--link-concurrency', type=int, default=32, help='外部链接并发检查数（每个站点最多4个）')
+    parser.add_argument('--since', metavar='GIT_REF',
+                        help='增量检查：只检查自该引用以来变更的文件及其链接依赖方，并合并到上次的完整结果')
+    parser.add_argument('--watch', action='store_true',
+                        help='监视模式：常驻运行，文件变化后只重新检查变化的文件及其链接依赖方并更新报告')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='监视模式在 inotify 不可用时的轮询间隔（秒）')
+    parser.add_argument('--poll', action='store_true', help='监视模式强制使用轮询而非 inotify')
+    parser.add_argument('--results-db', default=str(RESULTS_DB_PATH),
+                        help='运行历史数据库（每次目录检查的分数与问题追加写入，用 tools/results_db.py 查询）')
+    parser.add_argument('--no-results-db', action='store_true', help='不记录本次运行的结果')
+    parser.add_argument('--profile', metavar='DIR',
+                        help='按检查器写出 cProfile（<检查器>.prof）与折叠栈（<检查器>.collapsed，可用 flamegraph.pl 绘制）；'
+                             '启用缓存时只有未命中缓存的检查会被剖析')
     
     args = parser.parse_args()
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    
+    cache = None if args.no_cache else ParseCache(args.cache)
+    external = ExternalLinkChecker(ttl=args.link_ttl * 3600, negative_ttl=args.link_negative_ttl * 3600,
+                                   concurrency=args.link_concurrency)
+    checker = EnhancedQualityChecker(args.path, cache=cache, external=external, profile=bool(args.profile))
+    
+    if args.watch:
+        # kill/systemd 停止时与 Ctrl-C 一样保存结果后退出
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            checker.watch(args.output, args.format, jobs=jobs, interval=args.poll_interval, polling=args.poll)
+        finally:
+            if cache is not None:
+                cache.close()
+            checker.checkers['links'].close()
+            if args.profile:
+                write_profiles(checker, args.profile)
+        return
     
-    checker = EnhancedQualityChecker(args.path)
+    recorder = None
+    if not args.single and not args.no_results_db:
+        recorder = RunRecorder('enhanced_quality_checker', args.path, Path(args.results_db))
+    
+    if args.format in STREAM_FORMATS and not args.single:
+        # 流式报告：结果到达即写出，不在内存中保留全部结果
+        stream = StreamingReport(args.format, args.output, checker.timer)
+        completed = False
+        try:
+            for result in checker.iter_since(args.since, jobs=jobs):
+                stream.write(result)
+                if recorder is not None:
+                    recorder.add(asdict(result))
+            completed = True
+        finally:
+            stream.close()
+            if recorder is not None:
+                recorder.close(completed)
+            if cache is not None:
+                cache.close()
+            checker.checkers['links'].close()
+        print(f"质量检查完成，报告已保存到: {args.output}")
+        print(f"检查了 {stream.stats.documents} 个文档")
+        print(f"平均质量分数: {stream.stats.average:.2f}")
+        if args.profile:
+            write_profiles(checker, args.profile)
+        return
     
     if args.single:
         # 检查单个文件
+        checker.checkers['links'].prefetch_external_links(checker._collect_external_links([args.single]))
         result = checker.check_document(args.single)
         results = [result]
     else:
-        # 检查所有文件
-        results = checker.check_all_documents()
-    
-    # 生成报告
-    report = checker.generate_report(results, args.format)
+        # 检查所有文件（--since 时增量检查并与上次结果合并）
+        results = checker.check_since(args.since, jobs=jobs)
+        if recorder is not None:
+            for result in results:
+                recorder.add(asdict(result))
+            recorder.close()
+    if cache is not None:
+        cache.close()
+    checker.checkers['links'].close()
     
-    # 保存报告
-    with open(args.output, 'w', encoding='utf-8') as f:
-        f.write(report)
+    # 生成报告（流式格式用于单文件时同样逐条写出）
+    if args.format in STREAM_FORMATS:
+        stream = StreamingReport(args.format, args.output, checker.timer)
+        for result in results:
+            stream.write(result)
+        stream.close()
+    else:
+        report = checker.generate_report(results, args.format)
+        
+        # 保存报告
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
     
     print(f"质量检查完成，报告已保存到: {args.output}")
     print(f"检查了 {len(results)} 个文档")
     print(f"平均质量分数: {sum(r.overall for r in results) / len(results) if results else 0:.2f}")
+    if args.profile:
+        write_profiles(checker, args.profile)
 
 
 if __name__ == '__main__':
@@ -10,14 +10,22 @@
 
 import os
 import re
+import sys
 from pathlib import Path
 from typing import List, Tuple, Dict, Optional
 import json
 from datetime import datetime
+from functools import partial
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+from md_tokens import tokenize
+from rewrite_engine import rewrite_files
 
 class P1TaskFixer:
-    def __init__(self, root_dir: str):
+    def __init__(self, root_dir: str, backup: bool = True, jobs: int = 0):
         self.root_dir = Path(root_dir)
+        self.backup = backup  # 保留改写批次的日志（原文件），可用 tools/rewrite_engine.py rollback 回滚
+        self.jobs = jobs
         self.fixed_files = []
         self.errors = []
         
@@ -37,34 +45,17 @@ class P1TaskFixer:
     def extract_headings(self, content: str) -> List[Tuple[int, str, int, Optional[str]]]:
         """提取所有标题，返回 (级别, 标题文本, 行号, 编号)，排除代码块中的标题"""
         headings = []
-        lines = content.split('\n')
-        in_code_block = False
-        code_block_pattern = re.compile(r'^```')
-        
-        for i, line in enumerate(lines, 1):
-            # 检查是否进入或退出代码块
-            if code_block_pattern.match(line.strip()):
-                in_code_block = not in_code_block
-                continue
-            
-            # 跳过代码块中的内容
-            if in_code_block:
-                continue
-            
-            # 匹配标题（不在代码块中）
-            match = re.match(r'^(#{1,6})\s+(.+)$', line.strip())
-            if match:
-                level = len(match.group(1))
-                text = match.group(2).strip()
-                # 提取编号（如果有）
-                num_match = re.match(r'^(\d+(?:\.\d+)*)\.?\s+(.+)$', text)
-                if num_match:
-                    numbering = num_match.group(1)
-                    title = num_match.group(2)
-                else:
-                    numbering = None
-                    title = text
-                headings.append((level, title, i, numbering))
+        for heading in tokenize(content).headings:
+            text = heading.text
+            # 提取编号（如果有）
+            num_match = re.match(r'^(\d+(?:\.\d+)*)\.?\s+(.+)$', text)
+            if num_match:
+                numbering = num_match.group(1)
+                title = num_match.group(2)
+            else:
+                numbering = None
+                title = text
+            headings.append((heading.level, title, heading.line, numbering))
         return headings
     
     def generate_toc(self, headings: List[Tuple[int, str, int, Optional[str]]], max_level: int = 3) -> str:
@@ -113,86 +104,81 @@ class P1TaskFixer:
     def fix_heading_level_jumps(self, content: str) -> Tuple[str, List[str]]:
         """修复标题层级跳跃问题，排除代码块中的标题"""
         lines = content.split('\n')
-        new_lines = []
         issues_fixed = []
         prev_level = 0
-        in_code_block = False
-        code_block_pattern = re.compile(r'^```')
         
-        for i, line in enumerate(lines):
-            # 检查是否进入或退出代码块
-            if code_block_pattern.match(line.strip()):
-                in_code_block = not in_code_block
-                new_lines.append(line)
-                continue
-            
-            # 跳过代码块中的内容（不处理）
-            if in_code_block:
-                new_lines.append(line)
-                continue
+        # 只处理 md_tokens 识别出的标题（代码块中的内容不处理）
+        for heading in tokenize(content).headings:
+            level, text, i = heading.level, heading.text, heading.line - 1
             
-            # 匹配标题（不在代码块中）
-            match = re.match(r'^(#{1,6})\s+(.+)$', line.strip())
-            if match:
-                level = len(match.group(1))
-                text = match.group(2).strip()
-                
-                # 检查层级跳跃
-                if prev_level > 0 and level > prev_level + 1:
-                    # 需要插入中间层级
-                    new_level = prev_level + 1
-                    # 调整当前标题层级
-                    new_line = '#' * new_level + ' ' + text
-                    new_lines.append(new_line)
-                    issues_fixed.append(f"行{i+1}: 修复层级跳跃 (h{level} -> h{new_level})")
-                    prev_level = new_level
-                else:
-                    new_lines.append(line)
-                    if level > 0:
-                        prev_level = level
-            else:
-                new_lines.append(line)
+            # 检查层级跳跃
+            if prev_level > 0 and level > prev_level + 1:
+                # 需要插入中间层级
+                new_level = prev_level + 1
+                # 调整当前标题层级
+                lines[i] = '#' * new_level + ' ' + text
+                issues_fixed.append(f"行{i+1}: 修复层级跳跃 (h{level} -> h{new_level})")
+                prev_level = new_level
+            elif level > 0:
+                prev_level = level
+        
+        return '\n'.join(lines), issues_fixed
+    
+    def insert_toc(self, content: str, max_level: int = 3) -> Optional[str]:
+        """在第一个一级标题之后插入目录，没有标题时返回 None"""
+        headings = self.extract_headings(content)
+        if not headings:
+            return None
+        
+        # 生成目录
+        toc = self.generate_toc(headings, max_level)
+        
+        # 找到插入位置（在第一个标题之后）
+        lines = content.split('\n')
+        insert_pos = 0
+        for i, line in enumerate(lines):
+            if re.match(r'^#\s+', line):
+                insert_pos = i + 1
+                break
+        
+        # 插入目录
+        new_lines = lines[:insert_pos] + [toc] + lines[insert_pos:]
+        return '\n'.join(new_lines)
+    
+    def toc_content(self, file_path: str, content: str, max_level: int = 3) -> Tuple[Optional[str], List[str]]:
+        """为文件内容添加目录，返回 (新内容, 说明)；新内容为 None 表示不改写（供 rewrite_files 并行调用）"""
+        # 检查是否已有目录
+        if re.search(r'^##\s*[📑目录|目录|Table of Contents]', content, re.MULTILINE | re.IGNORECASE):
+            return None, ["已有目录"]
+        
+        new_content = self.insert_toc(content, max_level)
+        if new_content is None:
+            return None, ["无标题"]
+        return new_content, ["已添加目录"]
+    
+    def high_priority_content(self, file_path: str, content: str) -> Tuple[Optional[str], List[str]]:
+        """修复层级跳跃并补充目录，返回 (新内容, 修复项)"""
+        # 修复层级跳跃
+        new_content, issues = self.fix_heading_level_jumps(content)
         
-        return '\n'.join(new_lines), issues_fixed
+        # 添加目录（如果没有）
+        has_toc = re.search(r'^##\s*[📑目录|目录|Table of Contents]', content, re.MULTILINE | re.IGNORECASE)
+        if not has_toc:
+            with_toc = self.insert_toc(new_content)
+            if with_toc is not None:
+                new_content = with_toc
+                issues.append("已添加目录")
+        
+        return new_content, issues
     
     def add_toc_to_file(self, file_path: Path, max_level: int = 3) -> Tuple[bool, List[str]]:
         """为文件添加目录"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 检查是否已有目录
-            if re.search(r'^##\s*[📑目录|目录|Table of Contents]', content, re.MULTILINE | re.IGNORECASE):
-                return False, ["已有目录"]
-            
-            # 提取标题
-            headings = self.extract_headings(content)
-            if not headings:
-                return False, ["无标题"]
-            
-            # 生成目录
-            toc = self.generate_toc(headings, max_level)
-            
-            # 找到插入位置（在第一个标题之后）
-            lines = content.split('\n')
-            insert_pos = 0
-            for i, line in enumerate(lines):
-                if re.match(r'^#\s+', line):
-                    insert_pos = i + 1
-                    break
-            
-            # 插入目录
-            new_lines = lines[:insert_pos] + [toc] + lines[insert_pos:]
-            new_content = '\n'.join(new_lines)
-            
-            # 写入文件
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            
-            return True, ["已添加目录"]
-            
-        except Exception as e:
-            return False, [f"错误: {str(e)}"]
+        batch = rewrite_files(partial(self.toc_content, max_level=max_level), [file_path], jobs=1,
+                              label='p1_toc', keep_journal=self.backup)
+        result = batch.results[0]
+        if result.error:
+            return False, [f"错误: {result.error}"]
+        return result.changed, result.info
     
     def fix_high_priority_files(self):
         """修复高优先级文件"""
@@ -209,99 +195,66 @@ class P1TaskFixer:
             "8-形式理论深化/8.7-博弈论深化/8.7.2-机制设计理论深化.md",
         ]
         
+        existing = [rel_path for rel_path in high_priority_files if (self.root_dir / rel_path).exists()]
+        batch = rewrite_files(self.high_priority_content, [self.root_dir / p for p in existing],
+                              jobs=self.jobs, label='p1_high_priority', keep_journal=self.backup)
+        outcomes = dict(zip(existing, batch.results))
+        
         results = []
         for rel_path in high_priority_files:
-            file_path = self.root_dir / rel_path
-            if not file_path.exists():
+            result = outcomes.get(rel_path)
+            if result is None:
                 results.append({
                     "file": rel_path,
                     "status": "not_found",
                     "issues": []
                 })
-                continue
-            
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # 修复层级跳跃
-                new_content, issues = self.fix_heading_level_jumps(content)
-                
-                # 添加目录（如果没有）
-                has_toc = re.search(r'^##\s*[📑目录|目录|Table of Contents]', content, re.MULTILINE | re.IGNORECASE)
-                if not has_toc:
-                    headings = self.extract_headings(new_content)
-                    if headings:
-                        toc = self.generate_toc(headings)
-                        lines = new_content.split('\n')
-                        insert_pos = 0
-                        for i, line in enumerate(lines):
-                            if re.match(r'^#\s+', line):
-                                insert_pos = i + 1
-                                break
-                        new_lines = lines[:insert_pos] + [toc] + lines[insert_pos:]
-                        new_content = '\n'.join(new_lines)
-                        issues.append("已添加目录")
-                
-                # 写入文件
-                if new_content != content:
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write(new_content)
-                    results.append({
-                        "file": rel_path,
-                        "status": "fixed",
-                        "issues": issues
-                    })
-                    self.fixed_files.append(rel_path)
-                else:
-                    results.append({
-                        "file": rel_path,
-                        "status": "no_changes",
-                        "issues": []
-                    })
-                    
-            except Exception as e:
+            elif result.error:
                 results.append({
                     "file": rel_path,
                     "status": "error",
-                    "issues": [f"错误: {str(e)}"]
+                    "issues": [f"错误: {result.error}"]
+                })
+                self.errors.append(f"{rel_path}: {result.error}")
+            elif result.changed:
+                results.append({
+                    "file": rel_path,
+                    "status": "fixed",
+                    "issues": result.info
+                })
+                self.fixed_files.append(rel_path)
+            else:
+                results.append({
+                    "file": rel_path,
+                    "status": "no_changes",
+                    "issues": []
                 })
-                self.errors.append(f"{rel_path}: {str(e)}")
         
         return results
     
     def add_toc_to_all_files(self, max_level: int = 3):
-        """为所有文件添加目录"""
+        """为所有文件添加目录（进程池并行，作为一个批次原子提交；已有目录的文件跳过）"""
         md_files = self.find_markdown_files()
+        batch = rewrite_files(partial(self.toc_content, max_level=max_level), md_files, jobs=self.jobs,
+                              label='p1_toc', keep_journal=self.backup)
         results = []
         
-        for file_path in md_files:
+        for file_path, result in zip(md_files, batch.results):
             rel_path = str(file_path.relative_to(self.root_dir))
-            
-            # 跳过已有目录的文件
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                if re.search(r'^##\s*[📑目录|目录|Table of Contents]', content, re.MULTILINE | re.IGNORECASE):
-                    continue
-                
-                success, issues = self.add_toc_to_file(file_path, max_level)
-                if success:
-                    results.append({
-                        "file": rel_path,
-                        "status": "added_toc",
-                        "issues": issues
-                    })
-                    self.fixed_files.append(rel_path)
-                    
-            except Exception as e:
+            if result.error:
                 results.append({
                     "file": rel_path,
                     "status": "error",
-                    "issues": [f"错误: {str(e)}"]
+                    "issues": [f"错误: {result.error}"]
+                })
+                self.errors.append(f"{rel_path}: {result.error}")
+            elif result.changed:
+                results.append({
+                    "file": rel_path,
+                    "status": "added_toc",
+                    "issues": result.info
                 })
-                self.errors.append(f"{rel_path}: {str(e)}")
+                self.fixed_files.append(rel_path)
         
         return results
 
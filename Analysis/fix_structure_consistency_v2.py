@@ -8,15 +8,20 @@
 
 import os
 import re
+import sys
 from pathlib import Path
-from typing import List, Tuple, Dict
-import shutil
+from typing import List, Tuple, Dict, Optional
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+from md_tokens import tokenize
+from rewrite_engine import rewrite_files
+
 class StructureFixer:
-    def __init__(self, root_dir: str, backup: bool = True):
+    def __init__(self, root_dir: str, backup: bool = True, jobs: int = 0):
         self.root_dir = Path(root_dir)
-        self.backup = backup
+        self.backup = backup  # 保留改写批次的日志（原文件），可用 tools/rewrite_engine.py rollback 回滚
+        self.jobs = jobs
         self.fixed_files = []
         self.errors = []
         
@@ -33,137 +38,106 @@ class StructureFixer:
                     md_files.append(Path(root) / file)
         return sorted(md_files)
     
-    def backup_file(self, file_path: Path):
-        """备份文件"""
-        if self.backup:
-            backup_dir = self.root_dir / '.structure_backup_v2' / file_path.relative_to(self.root_dir).parent
-            backup_dir.mkdir(parents=True, exist_ok=True)
-            backup_path = backup_dir / file_path.name
-            shutil.copy2(file_path, backup_path)
-    
     def extract_headings(self, content: str) -> List[Tuple[int, str, int]]:
         """提取所有标题"""
-        headings = []
-        lines = content.split('\n')
-        for i, line in enumerate(lines, 1):
-            match = re.match(r'^(#{1,6})\s+(.+)$', line.strip())
-            if match:
-                level = len(match.group(1))
-                text = match.group(2).strip()
-                headings.append((level, text, i))
-        return headings
+        # md_tokens 一次扫描得到标题，代码块中的 # 行不算标题
+        return [(h.level, h.text, h.line) for h in tokenize(content).headings]
     
     def fix_duplicate_numbering(self, content: str) -> str:
         """修复重复编号问题（如 ## 3. 1. -> ## 3.）"""
         lines = content.split('\n')
-        new_lines = []
         
-        for line in lines:
-            # 匹配标题行
-            match = re.match(r'^(#{1,6})\s+(.+)$', line.strip())
-            if match:
-                level = len(match.group(1))
-                text = match.group(2).strip()
-                
-                # 检查是否有重复编号（如 "3. 1. " 或 "1. 1. "）
-                duplicate_pattern = r'^(\d+)\s*\.\s+(\d+)\s*\.\s+'
-                if re.match(duplicate_pattern, text):
-                    # 移除重复的编号，只保留第一个
-                    text = re.sub(duplicate_pattern, r'\1. ', text)
-                    hashes = '#' * level
-                    new_lines.append(f"{hashes} {text}")
-                else:
-                    new_lines.append(line)
-            else:
-                new_lines.append(line)
+        # 只处理 md_tokens 识别出的标题，代码块中的 # 行保持不变
+        for heading in tokenize(content).headings:
+            # 检查是否有重复编号（如 "3. 1. " 或 "1. 1. "）
+            duplicate_pattern = r'^(\d+)\s*\.\s+(\d+)\s*\.\s+'
+            if re.match(duplicate_pattern, heading.text):
+                # 移除重复的编号，只保留第一个
+                text = re.sub(duplicate_pattern, r'\1. ', heading.text)
+                hashes = '#' * heading.level
+                lines[heading.line - 1] = f"{hashes} {text}"
         
-        return '\n'.join(new_lines)
+        return '\n'.join(lines)
     
     def fix_heading_level_jumps(self, content: str) -> str:
         """修复标题层级跳跃"""
         lines = content.split('\n')
-        new_lines = []
         prev_level = 1
         
-        for i, line in enumerate(lines):
-            match = re.match(r'^(#{1,6})\s+(.+)$', line.strip())
-            if match:
-                level = len(match.group(1))
-                text = match.group(2).strip()
-                
-                if level > prev_level + 1:
-                    new_level = min(level, prev_level + 1)
-                    hashes = '#' * new_level
-                    new_lines.append(f"{hashes} {text}")
-                    prev_level = new_level
-                else:
-                    new_lines.append(line)
-                    if level > 0:
-                        prev_level = level
-            else:
-                new_lines.append(line)
+        for heading in tokenize(content).headings:
+            level, text = heading.level, heading.text
+            
+            if level > prev_level + 1:
+                new_level = min(level, prev_level + 1)
+                hashes = '#' * new_level
+                lines[heading.line - 1] = f"{hashes} {text}"
+                prev_level = new_level
+            elif level > 0:
+                prev_level = level
         
-        return '\n'.join(new_lines)
+        return '\n'.join(lines)
     
+    def fix_content(self, file_path: str, content: str) -> Tuple[Optional[str], List[str]]:
+        """修复单个文件的内容，返回 (新内容, 修复项)；新内容为 None 表示无需改写（供 rewrite_files 并行调用）"""
+        original_content = content
+        issues_fixed = []
+        
+        # 检查是否有重复编号
+        if re.search(r'^##\s+\d+\s*\.\s+\d+\s*\.', content, re.MULTILINE):
+            content = self.fix_duplicate_numbering(content)
+            if content != original_content:
+                issues_fixed.append("修复重复编号")
+        
+        # 检查是否有层级跳跃
+        headings = self.extract_headings(content)
+        if headings:
+            prev_level = headings[0][0]
+            for level, text, line_num in headings[1:]:
+                if level > prev_level + 1:
+                    content = self.fix_heading_level_jumps(content)
+                    issues_fixed.append(f"修复层级跳跃（行{line_num}）")
+                    break
+                if level > 0:
+                    prev_level = level
+        
+        if not issues_fixed:
+            return None, []
+        
+        if content == original_content:
+            return None, []
+        
+        return content, issues_fixed
+
     def fix_file(self, file_path: Path) -> Tuple[bool, List[str]]:
-        """修复单个文件"""
-        try:
-            self.backup_file(file_path)
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            original_content = content
-            issues_fixed = []
-            
-            # 检查是否有重复编号
-            if re.search(r'^##\s+\d+\s*\.\s+\d+\s*\.', content, re.MULTILINE):
-                content = self.fix_duplicate_numbering(content)
-                if content != original_content:
-                    issues_fixed.append("修复重复编号")
-            
-            # 检查是否有层级跳跃
-            headings = self.extract_headings(content)
-            if headings:
-                prev_level = headings[0][0]
-                for level, text, line_num in headings[1:]:
-                    if level > prev_level + 1:
-                        content = self.fix_heading_level_jumps(content)
-                        issues_fixed.append(f"修复层级跳跃（行{line_num}）")
-                        break
-                    if level > 0:
-                        prev_level = level
-            
-            if not issues_fixed:
-                return False, []
-            
-            # 写入文件
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            return True, issues_fixed
-            
-        except Exception as e:
-            return False, [f"错误: {str(e)}"]
+        """修复单个文件（内容不变时不写文件）"""
+        batch = rewrite_files(self.fix_content, [file_path], jobs=1, label='structure_v2', keep_journal=self.backup)
+        return self._outcome(batch.results[0])
+    
+    @staticmethod
+    def _outcome(result) -> Tuple[bool, List[str]]:
+        if result.error:
+            return False, [f"错误: {result.error}"]
+        return result.changed, result.info or []
     
     def fix_all_files(self):
         """修复所有文件"""
         md_files = self.find_markdown_files()
         print(f"找到 {len(md_files)} 个 Markdown 文件\n")
         
-        if self.backup:
-            backup_dir = self.root_dir / '.structure_backup_v2'
-            backup_dir.mkdir(exist_ok=True)
-            print(f"备份目录: {backup_dir}\n")
+        # 所有文件在进程池中修复，作为一个批次原子提交（内容不变的文件不写）
+        batch = rewrite_files(self.fix_content, md_files, jobs=self.jobs, label='structure_v2',
+                              keep_journal=self.backup)
+        if self.backup and batch.changed:
+            print(f"改写批次: {batch.id}（回滚: python tools/rewrite_engine.py rollback {batch.id}）\n")
         
         fixed_count = 0
         error_count = 0
         
-        for i, file_path in enumerate(md_files, 1):
+        for i, (file_path, result) in enumerate(zip(md_files, batch.results), 1):
             rel_path = file_path.relative_to(self.root_dir)
             print(f"[{i}/{len(md_files)}] 处理: {rel_path}")
             
-            success, issues = self.fix_file(file_path)
+            success, issues = self._outcome(result)
             
             if success:
                 fixed_count += 1
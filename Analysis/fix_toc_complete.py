@@ -9,66 +9,33 @@
 
 import os
 import re
+import sys
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+from md_tokens import tokenize
+from rewrite_engine import rewrite_files
 
 def extract_headings(content: str) -> List[Tuple[int, str, str]]:
-    """提取所有标题，返回(级别, 标题文本, 原始行)"""
+    """提取所有标题，返回(级别, 标题文本, 原始行)；代码块由 md_tokens 统一识别并跳过"""
     headings = []
-    lines = content.split('\n')
-    in_code_block = False
-    code_block_markers = ['```', '~~~']
-    
-    for i, line in enumerate(lines):
-        # 检测代码块
-        stripped = line.strip()
-        
-        # 检测代码块开始/结束
-        if stripped.startswith('```') or stripped.startswith('~~~'):
-            marker_char = stripped[0] if stripped else ''
-            if len(stripped) >= 3 and stripped[0] == stripped[1] == stripped[2]:
-                in_code_block = not in_code_block
-            continue
+    for heading in tokenize(content).headings:
+        line, text = heading.raw, heading.text
         
-        # 跳过代码块内的所有内容
-        if in_code_block:
+        # 只接受行首的 #（缩进的行可能是代码或列表项）
+        if heading.indent or not re.match(r'^#{1,6}\s+[^#]', line):
             continue
         
-        # 跳过空行
-        if not stripped:
+        # 过滤掉明显不是标题的内容
+        if len(text) < 2:
             continue
-        
-        # 跳过缩进的行（可能是代码或列表项）
-        if line.startswith('    ') or line.startswith('\t'):
-            continue
-        
-        # 跳过看起来像代码注释的行
-        if stripped.startswith('#') and not re.match(r'^#{1,6}\s+[^#]', line):
+        if re.match(r'^[\[\{\(].*[\]\}\)]$', text) and any(c in text for c in ["'", '"', 'b\'']):
             continue
-        
-        # 跳过看起来像代码输出的行
-        if re.match(r'^[\[\{\(].*[\]\}\)]', stripped) and any(c in stripped for c in ["'", '"', 'b\'', 'b"']):
-            continue
-        
-        # 跳过配置文件名
-        if re.match(r'^[a-z_]+\.(conf|config|yaml|yml|json|xml)$', stripped, re.IGNORECASE):
+        if text.startswith('b\'') or text.startswith('b"'):
             continue
         
-        # 匹配标题
-        match = re.match(r'^(#{1,6})\s+(.+)$', line)
-        if match:
-            level = len(match.group(1))
-            text = match.group(2).strip()
-            
-            # 过滤掉明显不是标题的内容
-            if len(text) < 2:
-                continue
-            if re.match(r'^[\[\{\(].*[\]\}\)]$', text) and any(c in text for c in ["'", '"', 'b\'']):
-                continue
-            if text.startswith('b\'') or text.startswith('b"'):
-                continue
-            
-            headings.append((level, text, line))
+        headings.append((heading.level, text, line))
     
     return headings
 
@@ -122,24 +89,18 @@ def generate_toc(headings: List[Tuple[int, str, str]]) -> str:
     
     return "\n".join(toc_lines)
 
+# fix_content 返回这些说明时文件被跳过
+SKIP_MESSAGES = ("占位文件，跳过", "没有找到标题", "无法生成目录")
+
 def find_toc_positions(content: str) -> List[Tuple[int, int]]:
     """找到所有目录的位置（开始行，结束行），排除代码块中的"""
     lines = content.split('\n')
     toc_positions = []
-    in_code_block = False
-    code_block_markers = ['```', '~~~']
-    
+    fenced = tokenize(content).fenced_lines()
+
     for i, line in enumerate(lines):
-        # 检测代码块
-        stripped = line.strip()
-        if stripped.startswith('```') or stripped.startswith('~~~'):
-            marker_char = stripped[0] if stripped else ''
-            if len(stripped) >= 3 and stripped[0] == marker_char == stripped[1] == stripped[2]:
-                in_code_block = not in_code_block
-            continue
-        
-        # 跳过代码块内的内容
-        if in_code_block:
+        # 跳过代码块内的内容（含围栏行）
+        if i + 1 in fenced:
             continue
         
         # 检查是否是目录标题（支持中英文）
@@ -162,29 +123,23 @@ def find_toc_positions(content: str) -> List[Tuple[int, int]]:
     
     return toc_positions
 
-def fix_document(file_path: Path) -> Tuple[bool, str, str]:
-    """修复单个文档的目录结构"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except Exception as e:
-        return False, f"读取文件失败: {e}", ""
-    
+def fix_content(file_path: str, content: str) -> Tuple[Optional[str], str]:
+    """修复单个文档内容的目录结构，返回 (新内容, 说明)；新内容为 None 表示跳过（供 rewrite_files 并行调用）"""
     # 检查是否是占位文件
     if '本文件由自动化工具创建' in content:
-        return False, "占位文件，跳过", ""
+        return None, "占位文件，跳过"
     
     # 提取标题
     headings = extract_headings(content)
     
     if not headings:
-        return False, "没有找到标题", ""
+        return None, "没有找到标题"
     
     # 生成新目录
     new_toc = generate_toc(headings)
     
     if not new_toc:
-        return False, "无法生成目录", ""
+        return None, "无法生成目录"
     
     # 检查现有目录
     toc_positions = find_toc_positions(content)
@@ -246,13 +201,20 @@ def fix_document(file_path: Path) -> Tuple[bool, str, str]:
         new_content = '\n'.join(new_lines)
         action = f"移除{len(toc_positions)-1}个多余目录，更新剩余目录"
     
-    # 写回文件
-    try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(new_content)
-        return True, action, ""
-    except Exception as e:
-        return False, f"写入文件失败: {e}", ""
+    return new_content, action
+
+def fix_document(file_path: Path) -> Tuple[bool, str, str]:
+    """修复单个文档的目录结构（目录已是最新时不写文件）"""
+    return _outcome(rewrite_files(fix_content, [file_path], jobs=1, label='toc').results[0])
+
+def _outcome(result) -> Tuple[bool, str, str]:
+    if result.error:
+        return False, f"处理失败: {result.error}", ""
+    if not result.changed and result.info in SKIP_MESSAGES:
+        return False, result.info, ""
+    if not result.changed:
+        return False, "目录已是最新", ""
+    return True, result.info, ""
 
 def main():
     """主函数"""
@@ -271,18 +233,22 @@ def main():
     skipped_count = 0
     multiple_toc_fixed = 0
     
-    for md_file in sorted(md_files):
+    # 所有文件在进程池中处理，作为一个批次原子提交；目录已是最新的文件不写
+    md_files = sorted(md_files)
+    batch = rewrite_files(fix_content, md_files, label='toc')
+    
+    for md_file, result in zip(md_files, batch.results):
         rel_path = md_file.relative_to(base_dir)
         print(f"\n处理: {rel_path}")
         
-        success, message, _ = fix_document(md_file)
+        success, message, _ = _outcome(result)
         
         if success:
             print(f"  ✅ {message}")
             fixed_count += 1
             if "移除" in message and "多余目录" in message:
                 multiple_toc_fixed += 1
-        elif "占位文件" in message or "没有找到标题" in message or "无法生成目录" in message:
+        elif message in SKIP_MESSAGES or message == "目录已是最新":
             print(f"  ⏭️  {message}")
             skipped_count += 1
         else:
@@ -296,6 +262,8 @@ def main():
     print(f"  ⏭️  跳过: {skipped_count}")
     print(f"  ❌ 错误: {error_count}")
     print(f"  📊 总计: {len(md_files)}")
+    if batch.changed:
+        print(f"  ↩️  回滚: python tools/rewrite_engine.py rollback {batch.id}")
 
 if __name__ == "__main__":
     main()
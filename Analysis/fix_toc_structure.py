@@ -11,68 +11,32 @@
 
 import os
 import re
+import sys
 from pathlib import Path
 from typing import List, Tuple, Dict
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+from md_tokens import tokenize
+
 def extract_headings(content: str) -> List[Tuple[int, str, str]]:
-    """提取所有标题，返回(级别, 标题文本, 原始行)"""
+    """提取所有标题，返回(级别, 标题文本, 原始行)；代码块由 md_tokens 统一识别并跳过"""
     headings = []
-    lines = content.split('\n')
-    in_code_block = False
-    code_block_markers = ['```', '~~~']
-    
-    for i, line in enumerate(lines):
-        # 检测代码块（更严格的检测）
-        stripped = line.strip()
-        
-        # 检测代码块开始/结束
-        # 检查是否是代码块标记（以```或~~~开头，且至少3个相同字符）
-        if stripped.startswith('```') or stripped.startswith('~~~'):
-            # 检查前3个字符是否相同
-            if len(stripped) >= 3 and stripped[0] == stripped[1] == stripped[2]:
-                in_code_block = not in_code_block
-            continue
+    for heading in tokenize(content).headings:
+        line, text = heading.raw, heading.text
         
-        # 跳过代码块内的所有内容
-        if in_code_block:
+        # 只接受行首的 #（缩进的行可能是代码或列表项）
+        if heading.indent or not re.match(r'^#{1,6}\s+[^#]', line):
             continue
         
-        # 跳过空行
-        if not stripped:
+        # 过滤掉明显不是标题的内容
+        if len(text) < 2:
             continue
-        
-        # 跳过缩进的行（可能是代码或列表项）
-        if line.startswith('    ') or line.startswith('\t'):
-            continue
-        
-        # 跳过看起来像代码注释的行（以 # 开头但不是标题，且不在代码块中）
-        # 但需要确保不是Markdown标题
-        if stripped.startswith('#') and not re.match(r'^#{1,6}\s+[^#]', line):
+        if re.match(r'^[\[\{\(].*[\]\}\)]$', text) and any(c in text for c in ["'", '"', 'b\'']):
             continue
-        
-        # 跳过看起来像代码输出的行
-        if re.match(r'^[\[\{\(].*[\]\}\)]', stripped) and any(c in stripped for c in ["'", '"', 'b\'', 'b"']):
-            continue
-        
-        # 跳过配置文件名（如 redis.conf）
-        if re.match(r'^[a-z_]+\.(conf|config|yaml|yml|json|xml)$', stripped, re.IGNORECASE):
+        if text.startswith('b\'') or text.startswith('b"'):
             continue
         
-        # 匹配标题（必须是行首的 #）
-        match = re.match(r'^(#{1,6})\s+(.+)$', line)
-        if match:
-            level = len(match.group(1))
-            text = match.group(2).strip()
-            
-            # 过滤掉明显不是标题的内容
-            if len(text) < 2:
-                continue
-            if re.match(r'^[\[\{\(].*[\]\}\)]$', text) and any(c in text for c in ["'", '"', 'b\'']):
-                continue
-            if text.startswith('b\'') or text.startswith('b"'):
-                continue
-            
-            headings.append((level, text, line))
+        headings.append((heading.level, text, line))
     
     return headings
 
@@ -11,34 +11,17 @@
 
 import os
 import re
+import sys
 from pathlib import Path
 from typing import List, Tuple, Dict
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+from md_tokens import tokenize
+
 def extract_headings(content: str) -> List[Tuple[int, str, str]]:
-    """提取所有标题，返回(级别, 标题文本, 原始行)"""
-    headings = []
-    lines = content.split('\n')
-    in_code_block = False
-    code_block_markers = ['```', '~~~']
-    
-    for i, line in enumerate(lines):
-        # 检测代码块
-        stripped = line.strip()
-        if any(stripped.startswith(marker) for marker in code_block_markers):
-            in_code_block = not in_code_block
-            continue
-        
-        if in_code_block:
-            continue
-        
-        # 匹配标题
-        match = re.match(r'^(#{1,6})\s+(.+)$', line)
-        if match:
-            level = len(match.group(1))
-            text = match.group(2).strip()
-            headings.append((level, text, line))
-    
-    return headings
+    """提取所有标题，返回(级别, 标题文本, 原始行)；代码块由 md_tokens 统一识别并跳过"""
+    # 只接受行首的 #
+    return [(h.level, h.text, h.raw) for h in tokenize(content).headings if not h.indent]
 
 def generate_anchor(text: str) -> str:
     """生成GitHub风格的锚点"""
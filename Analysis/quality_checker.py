@@ -12,16 +12,39 @@
 
 import os
 import re
+import sys
 import ast
 import json
 import argparse
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Optional
 import markdown
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from collections import defaultdict
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+from parse_cache import CACHE_PATH, ParseCache, decode_text, source_version
+from incremental import ResultStore, select_since
+from line_index import line_index
+from report_writers import JsonlWriter, ReportStats, ShardedHtmlWriter, TextSummaryWriter
+from results_db import RESULTS_DB_PATH, RunRecorder
+
+REPORT_TITLE = '知识库质量检查报告'
+REPORT_STYLE = """
+                body { font-family: Arial, sans-serif; margin: 20px; }
+                .issue { color: red; }
+                .warning { color: orange; }
+                .info { color: blue; }
+                .success { color: green; }
+                .score { font-weight: bold; }
+                table { border-collapse: collapse; width: 100%; }
+                th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+                th { background-color: #f2f2f2; }
+"""
+# 边检查边写出的报告格式
+STREAM_FORMATS = ['jsonl', 'html-pages', 'summary']
+
 
 @dataclass
 class QualityIssue:
@@ -85,48 +108,71 @@ class DocumentParser:
     def extract_code_blocks(self, content: str) -> List[Dict[str, Any]]:
         """提取代码块"""
         code_blocks = []
+        lines = line_index(content)
         for match in re.finditer(self.code_pattern, content, re.DOTALL):
             language = match.group(1) or 'text'
             code = match.group(2)
             code_blocks.append({
                 'language': language,
                 'code': code,
-                'start_line': content[:match.start()].count('\n') + 1
+                'start_line': lines.line_of(match.start())
             })
         return code_blocks
     
-    def extract_math_formulas(self, content: str) -> Dict[str, List[str]]:
-        """提取数学公式"""
-        inline_formulas = re.findall(self.math_pattern, content)
-        block_formulas = re.findall(self.block_math_pattern, content)
+    def extract_math_formulas(self, content: str) -> Dict[str, List[Any]]:
+        """提取数学公式（*_lines 为对应公式所在行号）"""
+        lines = line_index(content)
+        inline_matches = list(re.finditer(self.math_pattern, content))
+        block_matches = list(re.finditer(self.block_math_pattern, content))
         
         return {
-            'inline': inline_formulas,
-            'block': block_formulas
+            'inline': [m.group(1) for m in inline_matches],
+            'block': [m.group(1) for m in block_matches],
+            'inline_lines': [lines.line_of(m.start()) for m in inline_matches],
+            'block_lines': [lines.line_of(m.start()) for m in block_matches]
         }
     
-    def extract_links(self, content: str) -> List[Dict[str, str]]:
+    def extract_links(self, content: str) -> List[Dict[str, Any]]:
         """提取链接"""
         links = []
+        lines = line_index(content)
         for match in re.finditer(self.link_pattern, content):
             text = match.group(1)
             url = match.group(2)
-            links.append({'text': text, 'url': url})
+            links.append({'text': text, 'url': url, 'line_number': lines.line_of(match.start())})
         return links
 
 
 class QualityChecker:
     """质量检查器"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[ParseCache] = None):
         self.parser = DocumentParser()
         self.issues = []
+        self.cache = cache
+        if cache is not None:
+            # 版本取自解析器/检查器源码，规则变化后旧缓存自动失效
+            self.parse_version = source_version(DocumentParser)
+            self.check_version = source_version(DocumentParser, QualityChecker)
     
     def check_document(self, file_path: str) -> QualityScore:
         """检查单个文档的质量"""
+        digest = None
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            if self.cache is None:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            else:
+                # 内容未变化的文档直接复用上次的检查结果，无需重新读取
+                digest, data = self.cache.file_digest(file_path)
+                cached = self.cache.get(digest, 'quality_checker.score', self.check_version, file_path)
+                if cached is not None:
+                    cached['issues'] = [QualityIssue(**issue) for issue in cached['issues']]
+                    return QualityScore(**cached)
+                if data is None:
+                    with open(file_path, 'rb') as f:
+                        data = f.read()
+                content = decode_text(data)
         except Exception as e:
             return QualityScore(
                 file_path=file_path,
@@ -140,7 +186,7 @@ class QualityChecker:
             )
         
         # 解析文档
-        parsed = self.parser.parse_document(content)
+        parsed = self._parse(content, digest)
         
         # 执行各项检查
         title_score, title_issues = self.check_title_hierarchy(parsed['titles'])
@@ -155,7 +201,7 @@ class QualityChecker:
         # 计算总体评分
         overall_score = (title_score + code_score + math_score + link_score + format_score) / 5
         
-        return QualityScore(
+        result = QualityScore(
             file_path=file_path,
             title_hierarchy=title_score,
             code_quality=code_score,
@@ -165,6 +211,22 @@ class QualityChecker:
             overall=overall_score,
             issues=all_issues
         )
+        if digest is not None:
+            self.cache.put(digest, 'quality_checker.score', self.check_version, asdict(result), file_path)
+        return result
+
+    def _parse(self, content: str, digest: Optional[str]) -> Dict[str, Any]:
+        """解析文档；启用缓存时复用相同内容的解析结构（标题、代码块、公式、链接）"""
+        if digest is None:
+            return self.parser.parse_document(content)
+        parsed = self.cache.get(digest, 'quality_checker.parse', self.parse_version)
+        if parsed is None:
+            parsed = self.parser.parse_document(content)
+            self.cache.put(digest, 'quality_checker.parse', self.parse_version,
+                           {k: v for k, v in parsed.items() if k != 'content'})
+        else:
+            parsed['content'] = content
+        return parsed
     
     def check_title_hierarchy(self, titles: List[Dict[str, Any]]) -> Tuple[float, List[QualityIssue]]:
         """检查标题层次"""
@@ -256,18 +318,19 @@ class QualityChecker:
         
         return max(0.0, score), issues
     
-    def check_math_formulas(self, formulas: Dict[str, List[str]]) -> Tuple[float, List[QualityIssue]]:
+    def check_math_formulas(self, formulas: Dict[str, List[Any]]) -> Tuple[float, List[QualityIssue]]:
         """检查数学公式"""
         issues = []
         score = 10.0
         
         all_formulas = formulas['inline'] + formulas['block']
+        all_lines = formulas['inline_lines'] + formulas['block_lines']
         
-        for formula in all_formulas:
+        for formula, line_number in zip(all_formulas, all_lines):
             # 检查基本的LaTeX语法
             if not self.is_valid_latex(formula):
                 issues.append(QualityIssue(
-                    file_path="", line_number=0,
+                    file_path="", line_number=line_number,
                     issue_type="math_formulas",
                     description=f"LaTeX语法可能有问题: {formula}",
                     severity="warning"
@@ -295,7 +358,7 @@ class QualityChecker:
         # 这里可以添加更复杂的LaTeX语法检查
         return True
     
-    def check_links(self, links: List[Dict[str, str]], file_path: str) -> Tuple[float, List[QualityIssue]]:
+    def check_links(self, links: List[Dict[str, Any]], file_path: str) -> Tuple[float, List[QualityIssue]]:
         """检查链接有效性"""
         issues = []
         score = 10.0
@@ -307,7 +370,7 @@ class QualityChecker:
             if url.startswith('./') or url.startswith('../'):
                 if not self.is_valid_internal_link(url, file_path):
                     issues.append(QualityIssue(
-                        file_path="", line_number=0,
+                        file_path="", line_number=link['line_number'],
                         issue_type="links",
                         description=f"内部链接可能无效: {url}",
                         severity="warning"
@@ -318,7 +381,7 @@ class QualityChecker:
             elif url.startswith('http'):
                 if not self.is_valid_external_link_format(url):
                     issues.append(QualityIssue(
-                        file_path="", line_number=0,
+                        file_path="", line_number=link['line_number'],
                         issue_type="links",
                         description=f"外部链接格式可能有问题: {url}",
                         severity="info"
@@ -381,17 +444,7 @@ class ReportGenerator:
         <html>
         <head>
             <title>知识库质量检查报告</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 20px; }
-                .issue { color: red; }
-                .warning { color: orange; }
-                .info { color: blue; }
-                .success { color: green; }
-                .score { font-weight: bold; }
-                table { border-collapse: collapse; width: 100%; }
-                th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
-                th { background-color: #f2f2f2; }
-            </style>
+            <style>{style}</style>
         </head>
         <body>
             <h1>知识库质量检查报告</h1>
@@ -448,6 +501,7 @@ class ReportGenerator:
                 details += "</ul>"
         
         return html_template.format(
+            style=REPORT_STYLE,
             total_score=f"{total_score:.1f}/10",
             timestamp=timestamp,
             file_count=file_count,
@@ -467,43 +521,106 @@ class ReportGenerator:
         }
         
         for result in check_results:
-            detail = {
-                'file_path': result.file_path,
-                'scores': {
-                    'overall': result.overall,
-                    'title_hierarchy': result.title_hierarchy,
-                    'code_quality': result.code_quality,
-                    'math_formulas': result.math_formulas,
-                    'links': result.links,
-                    'format': result.format
-                },
-                'issues': [
-                    {
-                        'type': issue.issue_type,
-                        'description': issue.description,
-                        'severity': issue.severity,
-                        'suggestion': issue.suggestion
-                    }
-                    for issue in result.issues
-                ]
-            }
-            report['details'].append(detail)
+            report['details'].append(self.document_detail(result))
         
         return json.dumps(report, indent=2, ensure_ascii=False)
+    
+    def document_detail(self, result: QualityScore) -> Dict[str, Any]:
+        """单个文件的JSON结构（JSON报告与JSONL报告共用）"""
+        return {
+            'file_path': result.file_path,
+            'scores': {
+                'overall': result.overall,
+                'title_hierarchy': result.title_hierarchy,
+                'code_quality': result.code_quality,
+                'math_formulas': result.math_formulas,
+                'links': result.links,
+                'format': result.format
+            },
+            'issues': [
+                {
+                    'type': issue.issue_type,
+                    'description': issue.description,
+                    'severity': issue.severity,
+                    'suggestion': issue.suggestion
+                }
+                for issue in result.issues
+            ]
+        }
+    
+    def document_html(self, result: QualityScore) -> str:
+        """单个文件的HTML片段（分页报告使用）"""
+        html = f"<h4>{result.file_path}</h4>"
+        html += "<table>"
+        html += "<tr><th>总体评分</th><th>标题层次</th><th>代码质量</th><th>数学公式</th><th>链接</th><th>格式</th></tr>"
+        html += (f"<tr><td class='score'>{result.overall:.1f}/10</td><td>{result.title_hierarchy:.1f}/10</td>"
+                 f"<td>{result.code_quality:.1f}/10</td><td>{result.math_formulas:.1f}/10</td>"
+                 f"<td>{result.links:.1f}/10</td><td>{result.format:.1f}/10</td></tr>")
+        html += "</table>"
+        if result.issues:
+            html += "<ul>"
+            for issue in result.issues:
+                html += f"<li class='{issue.severity}'>{issue.description}"
+                if issue.suggestion:
+                    html += f" (建议: {issue.suggestion})"
+                html += "</li>"
+            html += "</ul>"
+        return html
+
+
+class StreamingReport:
+    """流式报告：每个结果到达即写出（jsonl / 分页HTML / 文本摘要），内存占用与文件数量无关"""
+    
+    def __init__(self, output_format: str, output: str, generator: ReportGenerator):
+        self.format = output_format
+        self.generator = generator
+        self.stats = ReportStats()
+        if output_format == 'jsonl':
+            self.writer = JsonlWriter(output)
+        elif output_format == 'html-pages':
+            self.writer = ShardedHtmlWriter(output, REPORT_TITLE, REPORT_STYLE, self.stats)
+        else:
+            self.writer = TextSummaryWriter(output, REPORT_TITLE)
+    
+    def write(self, result: QualityScore) -> None:
+        href = None
+        if self.format == 'jsonl':
+            self.writer.write(self.generator.document_detail(result))
+        elif self.format == 'html-pages':
+            href = self.writer.write(self.generator.document_html(result), result.file_path)
+        else:
+            self.writer.write(result.overall, len(result.issues), result.file_path)
+        self.stats.add(result.file_path, result.overall, (issue.severity for issue in result.issues), href)
+    
+    def close(self) -> None:
+        if self.format == 'jsonl':
+            self.writer.close(self.stats.as_dict())
+        elif self.format == 'html-pages':
+            self.writer.close()
+        else:
+            self.writer.close(self.stats)
 
 
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='知识库质量检查工具')
     parser.add_argument('path', help='要检查的文件或目录路径')
-    parser.add_argument('--format', choices=['html', 'json'], default='html',
-                       help='输出格式 (默认: html)')
+    parser.add_argument('--format', choices=['html', 'json'] + STREAM_FORMATS, default='html',
+                       help='输出格式 (默认: html；jsonl/html-pages/summary 为边检查边写出的流式报告)')
     parser.add_argument('--output', help='输出文件路径')
+    parser.add_argument('--cache', default=str(CACHE_PATH), help='解析/结果缓存文件路径')
+    parser.add_argument('--no-cache', action='store_true', help='禁用缓存，完整重新检查')
+    parser.add_argument('--since', metavar='GIT_REF',
+                        help='增量检查：只检查自该引用以来变更的文件及其链接依赖方，并合并到上次的完整结果')
+    parser.add_argument('--results-db', default=str(RESULTS_DB_PATH),
+                        help='运行历史数据库（每次目录检查的分数与问题追加写入，用 tools/results_db.py 查询）')
+    parser.add_argument('--no-results-db', action='store_true', help='不记录本次运行的结果')
     
     args = parser.parse_args()
     
     # 创建检查器
-    checker = QualityChecker()
+    cache = None if args.no_cache else ParseCache(args.cache)
+    checker = QualityChecker(cache=cache)
     generator = ReportGenerator()
     
     # 收集要检查的文件
@@ -516,12 +633,71 @@ def main():
         for file_path in path.rglob('*.md'):
             files_to_check.append(str(file_path))
     
+    # 目录检查的结果保存在结果存储中，--since 时只重新检查变更文件及其链接依赖方
+    store = ResultStore('quality_checker', path) if path.is_dir() else None
+    all_files = files_to_check
+    if store is not None and args.since:
+        files_to_check = select_since(args.since, all_files, store)
+    # 目录检查的结果追加到运行历史数据库
+    recorder = None
+    if store is not None and not args.no_results_db:
+        recorder = RunRecorder('quality_checker', path, Path(args.results_db))
+    
+    if args.format in STREAM_FORMATS:
+        output = args.output or {'jsonl': 'quality_report.jsonl', 'html-pages': 'quality_report.html',
+                                 'summary': 'quality_report.txt'}[args.format]
+        stream = StreamingReport(args.format, output, generator)
+        completed = False
+        try:
+            for file_path in files_to_check:
+                print(f"检查文件: {file_path}")
+                result = checker.check_document(file_path)
+                stream.write(result)
+                if store is not None:
+                    store.put(file_path, asdict(result))
+                if recorder is not None:
+                    recorder.add(asdict(result))
+            # 未重新检查的文件沿用上次结果
+            if store is not None:
+                checked = set(files_to_check)
+                for file_path in all_files:
+                    stored = None if file_path in checked else store.get(file_path)
+                    if stored is not None:
+                        stream.write(QualityScore(**dict(stored, issues=[QualityIssue(**i) for i in stored['issues']])))
+                        if recorder is not None:
+                            recorder.add(stored)
+                store.retain(all_files)
+                store.save()
+            completed = True
+        finally:
+            stream.close()
+            if recorder is not None:
+                recorder.close(completed)
+            if cache is not None:
+                if path.is_dir():
+                    cache.prune()
+                cache.close()
+        print(f"报告已保存到: {output}")
+        return
+    
     # 执行检查
     results = []
     for file_path in files_to_check:
         print(f"检查文件: {file_path}")
         result = checker.check_document(file_path)
         results.append(result)
+    if store is not None:
+        merged = store.merge(all_files, {r.file_path: asdict(r) for r in results})
+        store.save()
+        if recorder is not None:
+            for record in merged:
+                recorder.add(record)
+            recorder.close()
+        results = [QualityScore(**dict(d, issues=[QualityIssue(**i) for i in d['issues']])) for d in merged]
+    if cache is not None:
+        if path.is_dir():
+            cache.prune()
+        cache.close()
     
     # 生成报告
     if args.format == 'html':
@@ -1,25 +1,67 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""从备份恢复文件"""
+"""从备份恢复文件
 
-import shutil
+修复工具改写前的原文件保存在 tools/backup_store.py 的内容寻址备份库中
+（压缩 blob + SQLite 清单）。恢复按清单批量写回一次运行的所有文件：
+  python restore_from_backup.py            恢复最近一次运行
+  python restore_from_backup.py <run_id>   恢复指定运行（运行列表: python tools/backup_store.py list）
+  python restore_from_backup.py --force    运行之后又被编辑过的文件也强制恢复
+改写引擎的批次经 rewrite_engine.rollback() 回滚，同时更新批次日志的状态；运行之后又被编辑过的
+文件默认拒绝恢复，不会覆盖新的修改。
+旧的 .structure_backup 副本目录只在首次运行时导入备份库（按副本的修改时间排入运行列表），之后不再重复导入。
+"""
+
+import argparse
+import sys
 from pathlib import Path
 
-backup_dir = Path('.structure_backup')
-root_dir = Path('.')
-
-if backup_dir.exists():
-    for backup_file in backup_dir.rglob('*.md'):
-        if backup_file.is_file():
-            # 计算目标路径
-            rel_path = backup_file.relative_to(backup_dir)
-            target_file = root_dir / rel_path
-            
-            # 确保目标目录存在
-            target_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            # 复制文件
-            shutil.copy2(backup_file, target_file)
-            print(f"恢复: {rel_path}")
-
-print("恢复完成")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+from backup_store import BackupStore, RestoreConflict
+from rewrite_engine import list_batches, rollback
+
+LEGACY_LABEL = 'structure_backup'
+
+
+def import_legacy_backup(store: BackupStore, backup_dir: Path, root_dir: Path) -> None:
+    """旧的 .structure_backup 副本目录只导入一次；之后的运行直接使用备份库中的记录"""
+    if not backup_dir.exists() or any(run['label'] == LEGACY_LABEL for run in store.runs()):
+        return
+    run_id = store.import_tree(backup_dir, root_dir.resolve(), label=LEGACY_LABEL)
+    print(f"已导入 {backup_dir} 为运行 {run_id}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='从备份恢复文件')
+    parser.add_argument('run_id', nargs='?', help='要恢复的运行（默认最近一次）')
+    parser.add_argument('--force', action='store_true', help='运行之后又被编辑过的文件也强制恢复')
+    args = parser.parse_args()
+
+    store = BackupStore()
+    try:
+        import_legacy_backup(store, Path('.structure_backup'), Path('.'))
+        run_id = args.run_id
+        if run_id is None:
+            runs = store.runs()
+            if not runs:
+                raise SystemExit("没有可恢复的备份")
+            run_id = runs[-1]['id']
+        if any(m['id'] == run_id and m['state'] == 'committed' for m in list_batches()):
+            restored = rollback(run_id, force=args.force)
+        else:
+            restored = store.restore_run(run_id, force=args.force)
+    except RestoreConflict as e:
+        print(f"拒绝恢复（可用 --force 强制）: {e}", file=sys.stderr)
+        raise SystemExit(1)
+    finally:
+        store.close()
+
+    for path in restored:
+        print(f"恢复: {path}")
+
+    print("恢复完成")
+
+
+if __name__ == '__main__':
+    main()
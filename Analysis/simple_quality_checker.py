@@ -6,18 +6,26 @@
 
 import os
 import re
+import sys
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+from parse_cache import CACHE_PATH, ParseCache, decode_text, source_version
+from incremental import ResultStore, select_since
 
 
 class SimpleQualityChecker:
     """简化版质量检查器"""
     
-    def __init__(self, base_path: str):
+    def __init__(self, base_path: str, cache: Optional[ParseCache] = None):
         self.base_path = base_path
         self.all_files = self._get_all_markdown_files()
+        self.cache = cache
+        if cache is not None:
+            self.version = source_version(SimpleQualityChecker._evaluate)
     
     def _get_all_markdown_files(self) -> List[str]:
         """获取所有Markdown文件"""
@@ -30,9 +38,21 @@ class SimpleQualityChecker:
     
     def check_document(self, file_path: str) -> Dict[str, Any]:
         """检查单个文档"""
+        digest = None
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            if self.cache is None:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            else:
+                # 内容未变化的文档直接复用上次的结果
+                digest, data = self.cache.file_digest(file_path)
+                cached = self.cache.get(digest, 'simple.result', self.version, file_path)
+                if cached is not None:
+                    return cached
+                if data is None:
+                    with open(file_path, 'rb') as f:
+                        data = f.read()
+                content = decode_text(data)
         except Exception as e:
             return {
                 'file_path': file_path,
@@ -42,6 +62,13 @@ class SimpleQualityChecker:
                 'issues': []
             }
         
+        result = self._evaluate(file_path, content)
+        if digest is not None:
+            self.cache.put(digest, 'simple.result', self.version, result, file_path)
+        return result
+
+    def _evaluate(self, file_path: str, content: str) -> Dict[str, Any]:
+        """计算单个文档的指标与问题"""
         # 计算基础指标
         lines = content.split('\n')
         line_count = len(lines)
@@ -133,12 +160,22 @@ class SimpleQualityChecker:
             'issues': issues
         }
     
-    def check_all_documents(self) -> List[Dict[str, Any]]:
-        """检查所有文档"""
+    def check_all_documents(self, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """检查所有文档
+
+        since 为 git 引用时只检查此后变更的文件及链接到变更/删除文件的文档，
+        其余文档沿用结果存储中的上次结果。
+        """
+        store = ResultStore('simple_quality_checker', self.base_path)
+        files = select_since(since, self.all_files, store) if since else self.all_files
         results = []
-        for file_path in self.all_files:
+        for file_path in files:
             result = self.check_document(file_path)
             results.append(result)
+        if self.cache is not None:
+            self.cache.prune()
+        results = store.merge(self.all_files, {r['file_path']: r for r in results})
+        store.save()
         return results
     
     def generate_report(self, results: List[Dict[str, Any]]) -> str:
@@ -238,11 +275,18 @@ def main():
     parser = argparse.ArgumentParser(description='简化版质量检查工具')
     parser.add_argument('--path', default='.', help='检查路径')
     parser.add_argument('--output', default='simple_quality_report.md', help='输出文件')
+    parser.add_argument('--cache', default=str(CACHE_PATH), help='结果缓存文件路径')
+    parser.add_argument('--no-cache', action='store_true', help='禁用缓存，完整重新检查')
+    parser.add_argument('--since', metavar='GIT_REF',
+                        help='增量检查：只检查自该引用以来变更的文件及其链接依赖方，并合并到上次的完整结果')
     
     args = parser.parse_args()
     
-    checker = SimpleQualityChecker(args.path)
-    results = checker.check_all_documents()
+    cache = None if args.no_cache else ParseCache(args.cache)
+    checker = SimpleQualityChecker(args.path, cache=cache)
+    results = checker.check_all_documents(since=args.since)
+    if cache is not None:
+        cache.close()
     report = checker.generate_report(results)
     
     # 保存报告
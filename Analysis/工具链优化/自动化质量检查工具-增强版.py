@@ -6,23 +6,31 @@ PostgreSQL知识库自动化质量检查工具 - 2025增强版
 """
 
 import os
+import sys
+import argparse
+import heapq
 import json
 import re
 import ast
 import hashlib
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Dict, Iterator, List, Tuple, Optional, Any
 from dataclasses import dataclass, asdict
 from pathlib import Path
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
 import yaml
 import requests
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.cluster import KMeans
 import numpy as np
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / 'tools'))
+from results_db import RESULTS_DB_PATH, RunRecorder
+from report_writers import JsonlWriter, ScoreSketch
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -563,81 +571,127 @@ class EnhancedQualityChecker:
             last_updated=datetime.now()
         )
     
+    def iter_check_files(self, max_workers: int = 4) -> Iterator[QualityMetrics]:
+        """逐个产出检查结果（按完成顺序）
+
+        文件边遍历边提交，在途任务数限制为 max_workers 的 4 倍，已产出的结果不再被引用，
+        内存占用与文件总数无关。
+        """
+        
+        max_in_flight = max_workers * 4
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+            
+            def drain(return_when):
+                done, _ = wait(pending, return_when=return_when)
+                for future in done:
+                    file_path = pending.pop(future)
+                    try:
+                        metrics = future.result()
+                    except Exception as e:
+                        logger.error(f"检查文件 {file_path} 时出错：{e}")
+                        continue
+                    logger.info(f"完成检查：{file_path}")
+                    yield metrics
+            
+            for file_path in self.base_path.rglob("*.md"):
+                if len(pending) >= max_in_flight:
+                    yield from drain(FIRST_COMPLETED)
+                pending[executor.submit(self.check_file, file_path)] = file_path
+            while pending:
+                yield from drain(ALL_COMPLETED)
+    
     def check_all_files(self, max_workers: int = 4) -> Dict[str, QualityMetrics]:
         """检查所有文件"""
         
         logger.info("开始质量检查...")
         
-        # 获取所有Markdown文件
-        md_files = list(self.base_path.rglob("*.md"))
-        logger.info(f"找到 {len(md_files)} 个Markdown文件")
-        
-        results = {}
-        
-        # 并行处理
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_file = {executor.submit(self.check_file, file_path): file_path 
-                            for file_path in md_files}
-            
-            for future in as_completed(future_to_file):
-                file_path = future_to_file[future]
-                try:
-                    metrics = future.result()
-                    results[str(file_path)] = metrics
-                    logger.info(f"完成检查：{file_path}")
-                except Exception as e:
-                    logger.error(f"检查文件 {file_path} 时出错：{e}")
+        results = {metrics.file_path: metrics for metrics in self.iter_check_files(max_workers)}
+        logger.info(f"检查了 {len(results)} 个Markdown文件")
         
         # 保存结果
         self.save_results(results)
         
         return results
     
-    def save_results(self, results: Dict[str, QualityMetrics]):
-        """保存检查结果"""
+    def check_all_files_streaming(self, max_workers: int = 4, top_k: int = 100) -> 'StreamingSummary':
+        """流式检查所有文件：结果边产出边汇总、写入运行历史并溢写问题，不保留逐文件结果
         
-        # 转换为可序列化格式
-        serializable_results = {}
-        for file_path, metrics in results.items():
-            serializable_results[file_path] = {
-                'file_path': metrics.file_path,
-                'overall_score': metrics.overall_score,
-                'content_quality': metrics.content_quality,
-                'structure_quality': metrics.structure_quality,
-                'code_quality': metrics.code_quality,
-                'math_quality': metrics.math_quality,
-                'link_quality': metrics.link_quality,
-                'format_quality': metrics.format_quality,
-                'ai_enhancement_score': metrics.ai_enhancement_score,
-                'issues': [asdict(issue) for issue in metrics.issues],
-                'recommendations': metrics.recommendations,
-                'last_updated': metrics.last_updated.isoformat()
-            }
+        适用于十万级文件的语料库：内存中只有各分数的统计与分数最低的 top_k 个文件。
+        """
         
-        # 保存到文件
+        logger.info("开始质量检查（流式汇总）...")
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = f"quality_report_enhanced_{timestamp}.json"
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(serializable_results, f, ensure_ascii=False, indent=2)
+        recorder = RunRecorder('quality_checker_2025', self.base_path, overall='overall_score')
+        summary = StreamingSummary(f"quality_issues_{timestamp}.jsonl", top_k=top_k)
+        completed = False
+        try:
+            for metrics in self.iter_check_files(max_workers):
+                recorder.add(asdict(metrics))
+                summary.add(metrics)
+            completed = True
+        finally:
+            summary.close()
+            recorder.close(completed)
+        
+        logger.info(f"质量检查结果已写入运行历史：{RESULTS_DB_PATH}（运行 {recorder.run_id}）")
+        logger.info(f"问题明细已写入：{summary.issues_path}")
+        self.write_summary_report(summary, f"quality_summary_{timestamp}.md")
+        
+        return summary
+    
+    def save_results(self, results: Dict[str, QualityMetrics]):
+        """保存检查结果
         
-        logger.info(f"质量检查结果已保存到：{output_file}")
+        分数与问题按批追加到运行历史数据库（tools/results_db.py），不再整体序列化为
+        JSON；最差文件、问题趋势等查询用 python tools/results_db.py 完成。
+        """
+        
+        recorder = RunRecorder('quality_checker_2025', self.base_path, overall='overall_score')
+        for metrics in results.values():
+            recorder.add(asdict(metrics))
+        recorder.close()
+        
+        logger.info(f"质量检查结果已写入运行历史：{RESULTS_DB_PATH}（运行 {recorder.run_id}）")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # 生成摘要报告
         self.generate_summary_report(results, f"quality_summary_{timestamp}.md")
     
     def generate_summary_report(self, results: Dict[str, QualityMetrics], output_file: str):
-        """生成摘要报告"""
+        """生成摘要报告（详细结果列出全部文件）"""
         
-        total_files = len(results)
-        avg_score = sum(metrics.overall_score for metrics in results.values()) / total_files
+        summary = StreamingSummary(top_k=len(results))
+        for metrics in results.values():
+            summary.add(metrics)
+        self.write_summary_report(summary, output_file)
+    
+    def write_summary_report(self, summary: 'StreamingSummary', output_file: str):
+        """由汇总统计生成摘要报告"""
+        
+        total_files = summary.documents
+        overall = summary.scores['overall_score']
         
         # 统计问题
-        total_issues = sum(len(metrics.issues) for metrics in results.values())
-        critical_issues = sum(1 for metrics in results.values() 
-                            for issue in metrics.issues if issue.severity == 'critical')
-        warning_issues = sum(1 for metrics in results.values() 
-                           for issue in metrics.issues if issue.severity == 'warning')
+        total_issues = summary.issues
+        critical_issues = summary.severities['critical']
+        warning_issues = summary.severities['warning']
+        
+        def share(count: int) -> str:
+            return f"{count / total_files * 100:.1f}%" if total_files else "0.0%"
+        
+        distribution = [
+            ('9.0-10.0', overall.count_between(9.0)),
+            ('8.0-8.9', overall.count_between(8.0, 9.0)),
+            ('7.0-7.9', overall.count_between(7.0, 8.0)),
+            ('< 7.0', overall.count_between(float('-inf'), 7.0)),
+        ]
+        distribution_rows = "\n".join(f"| {label} | {count} | {share(count)} |" for label, count in distribution)
+        score_rows = "\n".join(
+            f"| {field} | {sketch.mean:.2f} | {sketch.stdev:.2f} | {sketch.quantile(0.1):.2f} | "
+            f"{sketch.quantile(0.5):.2f} | {sketch.quantile(0.9):.2f} |"
+            for field, sketch in summary.scores.items())
         
         # 生成报告
         report = f"""# 质量检查摘要报告
@@ -645,7 +699,7 @@ class EnhancedQualityChecker:
 ## 总体统计
 
 - **检查文件数**: {total_files}
-- **平均质量分数**: {avg_score:.2f}/10
+- **平均质量分数**: {overall.mean:.2f}/10
 - **总问题数**: {total_issues}
   - 严重问题: {critical_issues}
   - 警告问题: {warning_issues}
@@ -655,10 +709,13 @@ class EnhancedQualityChecker:
 
 | 分数区间 | 文件数 | 占比 |
 |---------|--------|------|
-| 9.0-10.0 | {len([m for m in results.values() if m.overall_score >= 9.0])} | {len([m for m in results.values() if m.overall_score >= 9.0])/total_files*100:.1f}% |
-| 8.0-8.9 | {len([m for m in results.values() if 8.0 <= m.overall_score < 9.0])} | {len([m for m in results.values() if 8.0 <= m.overall_score < 9.0])/total_files*100:.1f}% |
-| 7.0-7.9 | {len([m for m in results.values() if 7.0 <= m.overall_score < 8.0])} | {len([m for m in results.values() if 7.0 <= m.overall_score < 8.0])/total_files*100:.1f}% |
-| < 7.0 | {len([m for m in results.values() if m.overall_score < 7.0])} | {len([m for m in results.values() if m.overall_score < 7.0])/total_files*100:.1f}% |
+{distribution_rows}
+
+## 各维度分数
+
+| 维度 | 均值 | 标准差 | P10 | P50 | P90 |
+|------|------|--------|-----|-----|-----|
+{score_rows}
 
 ## 改进建议
 
@@ -681,13 +738,20 @@ class EnhancedQualityChecker:
 
 """
         
+        worst = summary.worst()
+        if len(worst) < total_files:
+            report += f"以下为分数最低的 {len(worst)} 个文件"
+            if summary.issues_path:
+                report += f"，全部文件的问题明细见 `{summary.issues_path}`"
+            report += "。\n\n"
+        
         # 添加详细结果
-        for file_path, metrics in sorted(results.items(), key=lambda x: x[1].overall_score):
+        for score, file_path, issue_count, recommendations in worst:
             report += f"### {file_path}\n"
-            report += f"- **总分**: {metrics.overall_score:.2f}/10\n"
-            report += f"- **问题数**: {len(metrics.issues)}\n"
-            if metrics.recommendations:
-                report += f"- **建议**: {', '.join(metrics.recommendations[:3])}\n"
+            report += f"- **总分**: {score:.2f}/10\n"
+            report += f"- **问题数**: {issue_count}\n"
+            if recommendations:
+                report += f"- **建议**: {', '.join(recommendations)}\n"
             report += "\n"
         
         # 保存报告
@@ -696,28 +760,103 @@ class EnhancedQualityChecker:
         
         logger.info(f"摘要报告已保存到：{output_file}")
 
+class StreamingSummary:
+    """流式汇总：逐个文件累计统计，内存占用与文件数无关
+    
+    - 每个分数维度一个 ScoreSketch（计数、均值、标准差、分位数）
+    - 问题总数与按严重程度的计数
+    - 分数最低的 top_k 个文件（堆，只保留路径、问题数和前三条建议）
+    - 给定 issues_path 时，每个文件的问题与建议即时写入 JSONL，不在内存中保留
+    """
+    
+    SCORE_FIELDS = ('overall_score', 'content_quality', 'structure_quality', 'code_quality',
+                    'math_quality', 'link_quality', 'format_quality', 'ai_enhancement_score')
+    
+    def __init__(self, issues_path: Optional[str] = None, top_k: int = 100):
+        self.issues_path = issues_path
+        self.top_k = top_k
+        self.documents = 0
+        self.issues = 0
+        self.severities: Counter = Counter()
+        self.scores = {field: ScoreSketch() for field in self.SCORE_FIELDS}
+        self._worst: List[Tuple[float, int, str, int, List[str]]] = []
+        self._spill = JsonlWriter(issues_path) if issues_path else None
+    
+    def add(self, metrics: QualityMetrics):
+        self.documents += 1
+        self.issues += len(metrics.issues)
+        self.severities.update(issue.severity for issue in metrics.issues)
+        for field, sketch in self.scores.items():
+            sketch.add(getattr(metrics, field))
+        
+        # 以负分数为键的小顶堆，堆顶是已保留文件中分数最高的
+        item = (-metrics.overall_score, -self.documents, metrics.file_path, len(metrics.issues),
+                metrics.recommendations[:3])
+        if self.top_k > 0:
+            if len(self._worst) < self.top_k:
+                heapq.heappush(self._worst, item)
+            elif item > self._worst[0]:
+                heapq.heapreplace(self._worst, item)
+        
+        if self._spill is not None:
+            self._spill.write({
+                'file_path': metrics.file_path,
+                'overall_score': metrics.overall_score,
+                'issues': [asdict(issue) for issue in metrics.issues],
+                'recommendations': metrics.recommendations,
+            })
+    
+    def worst(self) -> List[Tuple[float, str, int, List[str]]]:
+        """(总分, 文件, 问题数, 建议)，分数从低到高，同分按检查顺序"""
+        return [(-score, file_path, issue_count, recommendations)
+                for score, _, file_path, issue_count, recommendations in sorted(self._worst, reverse=True)]
+    
+    def close(self):
+        if self._spill is not None:
+            self._spill.close({
+                'documents': self.documents,
+                'total_issues': self.issues,
+                'issues_by_severity': dict(self.severities),
+                'scores': {field: sketch.as_dict() for field, sketch in self.scores.items()},
+            })
+            self._spill = None
+
 def main():
     """主函数"""
     
+    parser = argparse.ArgumentParser(description='PostgreSQL知识库自动化质量检查工具 - 2025增强版')
+    parser.add_argument('--path', default='Analysis', help='检查路径')
+    parser.add_argument('--workers', type=int, default=4, help='并行检查线程数')
+    parser.add_argument('--stream', action='store_true',
+                        help='流式汇总：不保留逐文件结果，问题明细写入 quality_issues_<时间>.jsonl，适合大型语料库')
+    parser.add_argument('--top-k', type=int, default=100, help='流式汇总时报告中列出的最低分文件数')
+    args = parser.parse_args()
+    
     # 创建质量检查器
-    checker = EnhancedQualityChecker()
+    checker = EnhancedQualityChecker(args.path)
     
     # 执行质量检查
-    results = checker.check_all_files(max_workers=4)
+    if args.stream:
+        summary = checker.check_all_files_streaming(max_workers=args.workers, top_k=args.top_k)
+        total_files = summary.documents
+        avg_score = summary.scores['overall_score'].mean
+        worst_files = [(file_path, score) for score, file_path, _, _ in summary.worst()[:5]]
+    else:
+        results = checker.check_all_files(max_workers=args.workers)
+        total_files = len(results)
+        avg_score = sum(metrics.overall_score for metrics in results.values()) / total_files if total_files else 0
+        worst_files = [(file_path, metrics.overall_score)
+                       for file_path, metrics in sorted(results.items(), key=lambda x: x[1].overall_score)[:5]]
     
     # 输出统计信息
-    total_files = len(results)
-    avg_score = sum(metrics.overall_score for metrics in results.values()) / total_files
-    
     print(f"\n质量检查完成！")
     print(f"检查文件数: {total_files}")
     print(f"平均质量分数: {avg_score:.2f}/10")
     
     # 显示最需要改进的文件
-    worst_files = sorted(results.items(), key=lambda x: x[1].overall_score)[:5]
     print(f"\n最需要改进的文件:")
-    for file_path, metrics in worst_files:
-        print(f"  {file_path}: {metrics.overall_score:.2f}/10")
+    for file_path, score in worst_files:
+        print(f"  {file_path}: {score:.2f}/10")
 
 if __name__ == "__main__":
     main()
@@ -18,6 +18,9 @@ from dataclasses import dataclass
 from enum import Enum
 import logging
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+from line_index import line_index
+
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -109,10 +112,11 @@ class PostgreSQLQualityChecker:
             (r'\\\(([^)]+)\\\)', "行内公式")
         ]
         
+        lines = line_index(content)
         for pattern, formula_type in latex_patterns:
             for match in re.finditer(pattern, content, re.MULTILINE):
                 formula = match.group(1)
-                line_number = content[:match.start()].count('\n') + 1
+                line_number = lines.line_of(match.start())
                 
                 # 检查基本语法错误
                 if self.has_latex_syntax_error(formula):
@@ -197,10 +201,11 @@ class PostgreSQLQualityChecker:
             r'\\ref\{([^}]+)\}'  # \ref{引用}
         ]
         
+        lines = line_index(content)
         for pattern in citation_patterns:
             for match in re.finditer(pattern, content):
                 citation = match.group(1)
-                line_number = content[:match.start()].count('\n') + 1
+                line_number = lines.line_of(match.start())
                 
                 # 检查引用是否在参考文献列表中
                 if not self.is_valid_reference(citation, content):
@@ -228,7 +233,7 @@ class PostgreSQLQualityChecker:
             if term in content:
                 # 检查是否有Wikidata ID
                 if f"Q{wikidata_id}" not in content and wikidata_id not in content:
-                    line_number = content.find(term) // 80 + 1  # 估算行号
+                    line_number = line_index(content).line_of(content.find(term))
                     yield QualityIssue(
                         issue_type=IssueType.WIKIDATA_ALIGNMENT,
                         file_path=file_path,
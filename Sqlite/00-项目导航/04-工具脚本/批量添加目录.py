@@ -6,29 +6,33 @@
 
 import os
 import re
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / 'tools'))
+from md_tokens import tokenize
+
 def extract_headings(content):
-    """提取文档中的所有标题"""
+    """提取文档中的所有标题（代码块中的 # 行由 md_tokens 排除）"""
     headings = []
-    lines = content.split('\n')
     
-    for i, line in enumerate(lines):
+    for heading in tokenize(content).headings:
+        line = heading.raw
         # 匹配一级标题（## 一、...）
         if re.match(r'^## [一二三四五六七八九十]+、', line):
             level = 1
             text = line.replace('## ', '').strip()
-            headings.append((level, text, i))
+            headings.append((level, text, heading.line - 1))
         # 匹配二级标题（### 1.1 ...）
         elif re.match(r'^### \d+\.\d+', line):
             level = 2
             text = line.replace('### ', '').strip()
-            headings.append((level, text, i))
+            headings.append((level, text, heading.line - 1))
         # 匹配三级标题（#### 1.1.1 ...）
         elif re.match(r'^#### \d+\.\d+\.\d+', line):
             level = 3
             text = line.replace('#### ', '').strip()
-            headings.append((level, text, i))
+            headings.append((level, text, heading.line - 1))
     
     return headings
 
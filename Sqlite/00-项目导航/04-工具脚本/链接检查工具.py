@@ -9,9 +9,13 @@ SQLite 知识库链接检查工具
 
 import os
 import re
+import sys
 from pathlib import Path
 from urllib.parse import unquote
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / 'tools'))
+from file_index import shared_index
+
 def extract_links(content):
     """提取Markdown中的链接"""
     # 匹配 [text](link) 格式
@@ -42,8 +46,8 @@ def check_link(link, file_path, project_root):
         current_dir = file_path.parent
         target_path = current_dir / link
     
-    # 检查文件是否存在
-    if target_path.exists():
+    # 检查文件是否存在（查语料库索引）
+    if shared_index().exists(target_path):
         return True, "有效"
     else:
         return False, f"文件不存在: {target_path}"
@@ -77,7 +81,8 @@ def check_all_files(project_root):
     print("=" * 60)
     print()
     
-    md_files = list(project_root.rglob('*.md'))
+    md_files = [project_root / Path(p).relative_to(project_root.resolve())
+                for p in shared_index().files_under(project_root)]
     total_issues = 0
     files_with_issues = []
     
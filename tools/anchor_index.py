@@ -0,0 +1,173 @@
+"""Persisted, GitHub-accurate heading anchors for the markdown files of the repo.
+
+Slugs follow GitHub's renderer (github-slugger). The heading text is reduced
+to what is rendered: closing ``#``s, link/image targets and HTML tags go.
+The text is lowercased, every character that is not a letter, digit, mark,
+connector punctuation (``_``), ``-`` or space is dropped, and each space
+becomes ``-``. A slug that was already used in the document gets ``-1``,
+``-2``, ... appended. Headings come from ``md_tokens``, so ``#`` lines inside fenced code
+blocks do not produce anchors. Lines indented four or more columns do not
+produce anchors either, because GitHub renders them as code. Explicit
+``<a id=...>``/``<a name=...>`` targets count as anchors too, with their case
+kept.
+
+The index is saved to ``.reports/anchor_index.json`` as
+``rel path -> [size, mtime_ns, digest, anchors]``. A file is rescanned only
+when its size or mtime changed. Even then, a file whose content digest is
+unchanged keeps its anchors without being tokenized again. ``refresh`` scans
+stale files in a process pool. ``anchors`` stats a file once per index
+instance; call ``refresh`` again to pick up later edits.
+"""
+
+import json
+import os
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from md_tokens import tokenize
+from parse_cache import REPO_ROOT, content_hash, decode_text
+
+
+ANCHOR_INDEX_PATH = REPO_ROOT / ".reports" / "anchor_index.json"
+
+CLOSING_HASHES_RE = re.compile(r"(?:^|\s+)#+\s*$")
+INLINE_LINK_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+REF_LINK_RE = re.compile(r"!?\[([^\]]*)\]\[[^\]]*\]")
+HTML_TAG_RE = re.compile(r"<[^>]+>")
+HTML_ANCHOR_RE = re.compile(r"<a\s[^>]*?\b(?:id|name)\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+
+
+def heading_text(text: str) -> str:
+    """The rendered text of an ATX heading's content."""
+    text = CLOSING_HASHES_RE.sub("", text)
+    text = INLINE_LINK_RE.sub(r"\1", text)
+    text = REF_LINK_RE.sub(r"\1", text)
+    return HTML_TAG_RE.sub("", text).strip()
+
+
+def github_slug(text: str) -> str:
+    """Slug of one rendered heading text, without the duplicate suffix."""
+    kept = []
+    for ch in text.lower():
+        category = unicodedata.category(ch)
+        if ch in " -" or category[0] in "LMN" or category == "Pc":
+            kept.append(ch)
+    return "".join(kept).replace(" ", "-")
+
+
+def document_anchors(content: str) -> List[str]:
+    """Anchors of a document in heading order, with GitHub's -1/-2 duplicate suffixes."""
+    occurrences: Dict[str, int] = {}
+    anchors = []
+    for heading in tokenize(content).headings:
+        if len(heading.indent.expandtabs(4)) >= 4:
+            continue
+        slug = base = github_slug(heading_text(heading.text))
+        while slug in occurrences:
+            occurrences[base] += 1
+            slug = f"{base}-{occurrences[base]}"
+        occurrences[slug] = 0
+        anchors.append(slug)
+    anchors.extend(HTML_ANCHOR_RE.findall(content))
+    return anchors
+
+
+def _scan(job: Tuple[str, Optional[str]]) -> Optional[list]:
+    """[size, mtime_ns, digest, anchors or None]; anchors are None when the digest is ``known``."""
+    path, known = job
+    try:
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    digest = content_hash(data)
+    if digest == known:
+        return [st.st_size, st.st_mtime_ns, digest, None]
+    return [st.st_size, st.st_mtime_ns, digest, document_anchors(decode_text(data))]
+
+
+class AnchorIndex:
+    def __init__(self, root: Path = REPO_ROOT, path: Optional[Path] = ANCHOR_INDEX_PATH):
+        self.root = os.path.abspath(str(root))
+        self.path = Path(path) if path else None
+        self.entries: Dict[str, list] = {}
+        self._sets: Dict[str, FrozenSet[str]] = {}
+        self._checked: Set[str] = set()
+        self._dirty = False
+        if self.path and self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def _key(self, path) -> str:
+        full = os.path.normpath(os.path.abspath(str(path)))
+        if full.startswith(self.root + os.sep):
+            return full[len(self.root) + 1:].replace(os.sep, "/")
+        return full
+
+    def _full(self, key: str) -> str:
+        return key if os.path.isabs(key) else os.path.join(self.root, key)
+
+    def _fresh(self, key: str) -> bool:
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        try:
+            st = os.stat(self._full(key))
+        except OSError:
+            return False
+        return entry[0] == st.st_size and entry[1] == st.st_mtime_ns
+
+    def refresh(self, paths: Iterable, jobs: int = 0) -> int:
+        """Rescan the given files whose size/mtime changed; returns how many were rescanned."""
+        keys = list(dict.fromkeys(self._key(p) for p in paths))
+        self._checked.update(keys)
+        stale = [k for k in keys if not self._fresh(k)]
+        self._rescan(stale, jobs)
+        return len(stale)
+
+    def _rescan(self, keys: List[str], jobs: int) -> None:
+        jobs_list = [(self._full(k), self.entries.get(k, [None] * 3)[2]) for k in keys]
+        jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        if jobs > 1 and len(jobs_list) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                scanned = list(pool.map(_scan, jobs_list, chunksize=max(1, len(jobs_list) // (jobs * 8))))
+        else:
+            scanned = [_scan(job) for job in jobs_list]
+        for key, entry in zip(keys, scanned):
+            self._sets.pop(key, None)
+            if entry is None:
+                self.entries.pop(key, None)
+                continue
+            if entry[3] is None:
+                entry[3] = self.entries[key][3]
+            self.entries[key] = entry
+        if keys:
+            self._dirty = True
+
+    def anchors(self, path) -> Optional[FrozenSet[str]]:
+        """Anchors of ``path`` (rescanned first if stale), or None if it cannot be read."""
+        key = self._key(path)
+        if key not in self._checked:
+            self._checked.add(key)
+            if not self._fresh(key):
+                self._rescan([key], jobs=1)
+        if key not in self.entries:
+            return None
+        if key not in self._sets:
+            self._sets[key] = frozenset(self.entries[key][3])
+        return self._sets[key]
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._dirty = False
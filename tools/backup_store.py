@@ -0,0 +1,290 @@
+"""Content-addressed, compressed backup store for the fixers.
+
+Blobs live under ``.reports/backup_store/blobs/<2 hex>/<digest>``, keyed by the
+blake2b digest of the original bytes. Each blob starts with a one-byte codec
+tag and holds the zstd (if ``zstandard`` is installed) or zlib compressed
+content, so identical content is stored once however many runs back it up.
+``manifest.sqlite`` records one row per run and one row per (run, path, digest).
+An entry can also record the digest the file had right after the run. Restoring
+a run then refuses (``RestoreConflict``) to overwrite a file that was edited
+since, unless forced. Restoring is a single query over the run's manifest; each
+distinct blob is decompressed once and written back atomically.
+
+``gc`` leaves blobs younger than a grace period alone, so blobs a running batch
+has stored but not yet recorded survive. ``put`` refreshes the mtime of a blob
+it reuses for the same reason.
+
+``put``/``get`` only touch blob files, so worker processes can call them
+without opening the manifest. ``python tools/backup_store.py list|restore|gc``
+exposes the store from the command line.
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from parse_cache import REPO_ROOT, content_hash
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+STORE_ROOT = REPO_ROOT / ".reports" / "backup_store"
+
+_ZLIB, _ZSTD = b"z", b"s"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    label TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    run_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    expected TEXT,
+    PRIMARY KEY (run_id, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest);
+"""
+
+
+# Blobs younger than this are never garbage collected (seconds)
+GC_GRACE = 3600
+
+
+class RestoreConflict(Exception):
+    """A file to restore was edited after the run that backed it up."""
+
+
+def _compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return _ZSTD + zstandard.ZstdCompressor(level=10).compress(data)
+    return _ZLIB + zlib.compress(data, 6)
+
+
+def _decompress(blob: bytes) -> bytes:
+    codec, body = blob[:1], blob[1:]
+    if codec == _ZLIB:
+        return zlib.decompress(body)
+    if codec == _ZSTD:
+        if zstandard is None:
+            raise RuntimeError("blob is zstd compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise ValueError(f"unknown blob codec {codec!r}")
+
+
+def file_digest(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return content_hash(f.read())
+    except OSError:
+        return None
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    if os.path.exists(path):
+        shutil.copymode(path, tmp)
+    os.replace(tmp, path)
+
+
+class BackupStore:
+    def __init__(self, root: Path = STORE_ROOT):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.root / "manifest.sqlite"), timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(entries)")}
+            if "expected" not in columns:
+                self._conn.execute("ALTER TABLE entries ADD COLUMN expected TEXT")
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # --- blobs --------------------------------------------------------------
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / digest
+
+    def has(self, digest: str) -> bool:
+        return self.blob_path(digest).exists()
+
+    def put(self, data: bytes, digest: Optional[str] = None) -> str:
+        """Store ``data`` unless a blob with its digest already exists; return the digest."""
+        digest = digest or content_hash(data)
+        path = self.blob_path(digest)
+        try:
+            # Reused blob: a fresh mtime keeps gc() away until the run is recorded
+            os.utime(path)
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(str(path), _compress(data))
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return _decompress(self.blob_path(digest).read_bytes())
+
+    # --- runs ---------------------------------------------------------------
+
+    def record_run(self, run_id: str, label: str,
+                   entries: Iterable[Tuple[str, str, int, int, Optional[str]]],
+                   created: Optional[float] = None) -> None:
+        """Record a run whose blobs are already stored.
+
+        Entries are (path, digest, size, mtime_ns, expected): ``expected`` is the
+        digest of the file right after the run, or None if unknown.
+        """
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO runs (id, label, created) VALUES (?, ?, ?)",
+                              (run_id, label, time.time() if created is None else created))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO entries (run_id, path, digest, size, mtime_ns, expected) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((run_id, os.path.abspath(p), d, s, m, e) for p, d, s, m, e in entries))
+
+    def import_tree(self, backup_dir: Path, target_root: Path, label: str = "import",
+                    pattern: str = "*.md") -> str:
+        """Turn a directory of plain backup copies into a run that restores onto ``target_root``.
+
+        The run is dated by its newest copy, so it sorts among runs by when the copies were made.
+        """
+        backup_dir, target_root = Path(backup_dir), Path(target_root)
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{label}"
+        entries = []
+        for copy in sorted(backup_dir.rglob(pattern)):
+            if copy.is_file():
+                st = copy.stat()
+                digest = self.put(copy.read_bytes())
+                entries.append((str(target_root / copy.relative_to(backup_dir)), digest,
+                                st.st_size, st.st_mtime_ns, None))
+        created = max((m for _, _, _, m, _ in entries), default=None)
+        self.record_run(run_id, label, entries, None if created is None else created / 1e9)
+        return run_id
+
+    def runs(self) -> List[dict]:
+        """All runs, oldest first, with their file counts."""
+        rows = self.conn.execute(
+            "SELECT r.id, r.label, r.created, COUNT(e.path) FROM runs r "
+            "LEFT JOIN entries e ON e.run_id = r.id GROUP BY r.id ORDER BY r.created, r.id")
+        return [{"id": i, "label": l, "created": c, "files": n} for i, l, c, n in rows]
+
+    def run_entries(self, run_id: str) -> List[Tuple[str, str, Optional[str]]]:
+        """(path, digest, expected) of a run's files, grouped by digest."""
+        return self.conn.execute(
+            "SELECT path, digest, expected FROM entries WHERE run_id = ? ORDER BY digest, path",
+            (run_id,)).fetchall()
+
+    def restore_run(self, run_id: Optional[str] = None, paths: Optional[Iterable[str]] = None,
+                    force: bool = False) -> List[str]:
+        """Write back every file of a run (default: the latest), or only ``paths`` of it.
+
+        Raises ``RestoreConflict`` before writing anything if a file was edited
+        after the run (its digest is neither the recorded post-run digest nor the
+        backed-up one), unless ``force`` is set.
+        """
+        if run_id is None:
+            runs = self.runs()
+            if not runs:
+                raise SystemExit("no backup runs")
+            run_id = runs[-1]["id"]
+        wanted = {os.path.abspath(str(p)) for p in paths} if paths is not None else None
+        entries = [e for e in self.run_entries(run_id) if wanted is None or e[0] in wanted]
+        if not force:
+            conflicts = [path for path, digest, expected in entries
+                         if expected is not None and file_digest(path) not in (expected, digest)]
+            if conflicts:
+                raise RestoreConflict("edited after the run: " + ", ".join(conflicts))
+        restored = []
+        digest, data = None, b""
+        for path, entry_digest, _ in entries:
+            if entry_digest != digest:
+                digest, data = entry_digest, self.get(entry_digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, data)
+            restored.append(path)
+        return restored
+
+    def delete_run(self, run_id: str) -> None:
+        with self.conn:
+            self.conn.execute("DELETE FROM entries WHERE run_id = ?", (run_id,))
+            self.conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+    def gc(self, grace: float = GC_GRACE) -> int:
+        """Remove blobs no run refers to and older than ``grace`` seconds; returns how many were removed."""
+        if not self.blob_dir.exists():
+            return 0
+        # Blobs of a batch still in flight are written before its run is recorded
+        cutoff = time.time() - grace
+        live = {d for (d,) in self.conn.execute("SELECT DISTINCT digest FROM entries")}
+        removed = 0
+        for blob in self.blob_dir.glob("*/*"):
+            if blob.name not in live and not blob.name.endswith(".tmp") and blob.stat().st_mtime < cutoff:
+                blob.unlink()
+                removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        blobs = list(self.blob_dir.glob("*/*")) if self.blob_dir.exists() else []
+        return {"runs": len(self.runs()), "blobs": len(blobs),
+                "bytes": sum(b.stat().st_size for b in blobs)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and restore backup runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="list backup runs")
+    rs = sub.add_parser("restore", help="restore the files of a run (default: latest)")
+    rs.add_argument("run", nargs="?")
+    rs.add_argument("--force", action="store_true", help="also restore files edited after the run")
+    gc = sub.add_parser("gc", help="remove blobs no run refers to")
+    gc.add_argument("--grace", type=float, default=GC_GRACE,
+                    help=f"keep unreferenced blobs younger than this many seconds (default {GC_GRACE})")
+    args = parser.parse_args()
+
+    store = BackupStore()
+    if args.command == "list":
+        for r in store.runs():
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r["created"]))
+            print(f"{r['id']}  {r['files']:5d} files  {created}")
+        s = store.stats()
+        print(f"{s['blobs']} blobs, {s['bytes'] / 1e6:.1f} MB compressed")
+    elif args.command == "restore":
+        try:
+            paths = store.restore_run(args.run, force=args.force)
+        except RestoreConflict as e:
+            print(f"refusing to restore: {e}", file=sys.stderr)
+            raise SystemExit(1)
+        print(f"restored {len(paths)} files")
+    else:
+        print(f"removed {store.gc(args.grace)} blobs")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
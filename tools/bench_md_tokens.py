@@ -0,0 +1,123 @@
+"""Micro-benchmark: ``md_tokens.tokenize`` against the per-tool heading scanners it replaced.
+
+Usage: python tools/bench_md_tokens.py [DIR ...] [--repeat N]
+
+The baselines are copies of the loops that used to live in the TOC and
+structure tools:
+
+- ``legacy_fence_toggle``: the fix_toc_* loop, which toggles on any ```/~~~ line
+- ``legacy_plain``: the check/fix_structure_consistency loop, which has no fence handling
+- ``legacy_multi_pass``: headings, code blocks, links and math, each found with its
+  own regex pass over the document, the way the checkers collect them
+
+``md_tokens (headings)`` reads only the block-level tokens. ``md_tokens (all)``
+also reads the links and math spans, which are scanned lazily.
+
+Each one runs over the same in-memory corpus. The report shows the time per
+pass, the throughput, and how many documents get a heading list that differs
+from ``tokenize``.
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from file_index import shared_index
+from md_tokens import tokenize
+from parse_cache import REPO_ROOT
+
+
+def legacy_fence_toggle(content: str) -> List[Tuple[int, str]]:
+    headings = []
+    in_code_block = False
+    for line in content.split('\n'):
+        stripped = line.strip()
+        if stripped.startswith('```') or stripped.startswith('~~~'):
+            in_code_block = not in_code_block
+            continue
+        if in_code_block:
+            continue
+        match = re.match(r'^(#{1,6})\s+(.+)$', stripped)
+        if match:
+            headings.append((len(match.group(1)), match.group(2).strip()))
+    return headings
+
+
+def legacy_plain(content: str) -> List[Tuple[int, str]]:
+    headings = []
+    for line in content.split('\n'):
+        match = re.match(r'^(#{1,6})\s+(.+)$', line.strip())
+        if match:
+            headings.append((len(match.group(1)), match.group(2).strip()))
+    return headings
+
+
+def legacy_multi_pass(content: str) -> List[Tuple[int, str]]:
+    headings = legacy_fence_toggle(content)
+    re.findall(r'```(\w+)?\n(.*?)```', content, re.DOTALL)
+    re.findall(r'\[([^\]]+)\]\(([^)]+)\)', content)
+    re.findall(r'\$\$([^$]+)\$\$', content)
+    re.findall(r'\$([^$]+)\$', content)
+    return headings
+
+
+def tokenized(content: str) -> List[Tuple[int, str]]:
+    return [(h.level, h.text) for h in tokenize(content).headings]
+
+
+def tokenized_all(content: str) -> List[Tuple[int, str]]:
+    tokens = tokenize(content)
+    tokens.links, tokens.math
+    return [(h.level, h.text) for h in tokens.headings]
+
+
+CANDIDATES: List[Tuple[str, Callable[[str], List[Tuple[int, str]]]]] = [
+    ('legacy_plain', legacy_plain),
+    ('legacy_fence_toggle', legacy_fence_toggle),
+    ('legacy_multi_pass', legacy_multi_pass),
+    ('md_tokens (headings)', tokenized),
+    ('md_tokens (all)', tokenized_all),
+]
+
+
+def load_corpus(dirs: List[str]) -> List[str]:
+    index = shared_index()
+    texts = []
+    for d in dirs:
+        for path in index.files_under(Path(d).resolve()):
+            try:
+                texts.append(Path(path).read_text(encoding='utf-8'))
+            except (OSError, UnicodeDecodeError):
+                continue
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('dirs', nargs='*', default=[str(REPO_ROOT)], help='directories to load (default: whole repo)')
+    parser.add_argument('--repeat', type=int, default=3, help='passes per candidate; the best is reported')
+    args = parser.parse_args()
+
+    texts = load_corpus(args.dirs)
+    megabytes = sum(len(t.encode('utf-8')) for t in texts) / 1e6
+    print(f'{len(texts)} documents, {megabytes:.1f} MB, best of {args.repeat}')
+    reference = [tokenized(t) for t in texts]
+
+    print(f'{"candidate":<22} {"seconds":>8} {"MB/s":>8} {"us/doc":>8} {"differs":>8}')
+    for name, func in CANDIDATES:
+        best = float('inf')
+        for _ in range(max(1, args.repeat)):
+            start = time.perf_counter()
+            results = [func(t) for t in texts]
+            best = min(best, time.perf_counter() - start)
+        differs = sum(1 for got, want in zip(results, reference) if got != want)
+        per_doc = best / len(texts) * 1e6 if texts else 0.0
+        print(f'{name:<22} {best:8.3f} {megabytes / best if best else 0:8.1f} {per_doc:8.1f} {differs:8d}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Benchmark the markdown checkers on a synthetic corpus.
+
+Usage: python tools/bench_toolchain.py [--files N] [--jobs 1 2 4] [--tools NAME ...] [--warm]
+                                       [--corpus DIR] [--output FILE]
+       python tools/bench_toolchain.py --compare OLD.json NEW.json
+
+The corpus comes from ``synth_corpus.py``, the same bytes for the same
+parameters, and is reused between runs. Each checker runs as its own process,
+the way it is used, with its output going to a scratch directory. Every run
+records the following:
+
+- wall and CPU time (user + sys, worker processes included)
+- peak RSS of the largest process
+- files/s and MB/s
+
+Tools that take ``--jobs`` are run once per ``--jobs`` value. By default every
+run is cold, with caches disabled. ``--warm`` adds a second run per
+configuration that reuses a parse cache built by an untimed first run. Tools
+without a cache option (check_structure_consistency, link_check) get no warm
+run, since it would only repeat the cold one.
+
+Checkers keep state under .reports/: the file and anchor indexes, the link
+graph and result stores. That state is saved before each measurement and put
+back afterwards, so benchmarking leaves the repository's state as it was.
+
+Results are written as JSON (commit, machine, corpus manifest, one record per
+run) to ``.reports/bench/bench-<commit>-<files>.json``. ``--compare`` prints
+the wall-time and RSS ratios of two such files.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from parse_cache import REPO_ROOT
+from synth_corpus import generate
+
+BENCH_DIR = REPO_ROOT / ".reports" / "bench"
+STATE_FILES = [
+    REPO_ROOT / ".reports" / "file_index.json",
+    REPO_ROOT / ".reports" / "anchor_index.json",
+    REPO_ROOT / ".reports" / "incremental" / "link_graph.json",
+]
+STATE_DIRS = [REPO_ROOT / ".reports" / "incremental"]
+
+PY = sys.executable
+ANALYSIS = REPO_ROOT / "Analysis"
+
+
+def _cache_args(cache: Optional[Path]) -> List[str]:
+    return ["--cache", str(cache)] if cache else ["--no-cache"]
+
+
+# name -> (command builder(corpus, scratch, jobs, cache file or None), takes --jobs, takes a cache)
+TOOLS: Dict[str, tuple] = {
+    "enhanced_quality_checker": (
+        lambda corpus, out, jobs, cache: [PY, str(ANALYSIS / "enhanced_quality_checker.py"), "--path", str(corpus),
+                                          "--output", str(out / "enhanced.html"), "--jobs", str(jobs),
+                                          "--no-results-db"] + _cache_args(cache),
+        True, True),
+    "quality_checker": (
+        lambda corpus, out, jobs, cache: [PY, str(ANALYSIS / "quality_checker.py"), str(corpus),
+                                          "--output", str(out / "quality.html"), "--no-results-db"] + _cache_args(cache),
+        False, True),
+    "simple_quality_checker": (
+        lambda corpus, out, jobs, cache: [PY, str(ANALYSIS / "simple_quality_checker.py"), "--path", str(corpus),
+                                          "--output", str(out / "simple.md")] + _cache_args(cache),
+        False, True),
+    "check_structure_consistency": (
+        lambda corpus, out, jobs, cache: [PY, str(ANALYSIS / "check_structure_consistency.py"), "--root", str(corpus),
+                                          "--output", str(out / "structure.json")],
+        False, False),
+    "link_check": (
+        lambda corpus, out, jobs, cache: [PY, str(REPO_ROOT / "tools" / "link_check.py"), "--root", str(corpus),
+                                          "--jobs", str(jobs)],
+        True, False),
+}
+
+
+class StateGuard:
+    """Saves the checkers' shared state files and restores them (and removes new ones) on exit."""
+
+    def __enter__(self) -> "StateGuard":
+        self.saved = {p: p.read_bytes() for p in STATE_FILES if p.exists()}
+        self.listing = {d: set(os.listdir(d)) if d.exists() else set() for d in STATE_DIRS}
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for d, names in self.listing.items():
+            if d.exists():
+                for name in set(os.listdir(d)) - names:
+                    path = d / name
+                    shutil.rmtree(path) if path.is_dir() else path.unlink()
+        for p in STATE_FILES:
+            if p in self.saved:
+                p.write_bytes(self.saved[p])
+            elif p.exists():
+                p.unlink()
+
+
+def measure(cmd: List[str], cwd: Path) -> Dict[str, Any]:
+    """Run one command; wall/CPU seconds and peak RSS (MB) of the process and its waited-for children."""
+    with open(cwd / "stderr.txt", "wb") as err:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=str(cwd), stdout=subprocess.DEVNULL, stderr=err)
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(proc.pid, 0)
+            wall = time.perf_counter() - start
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is in KB on Linux and in bytes on macOS
+            rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+            cpu = usage.ru_utime + usage.ru_stime
+        else:
+            proc.wait()
+            wall = time.perf_counter() - start
+            rss = cpu = None
+    return {"wall_s": round(wall, 3), "cpu_s": None if cpu is None else round(cpu, 3),
+            "peak_rss_mb": None if rss is None else round(rss, 1), "exit_code": proc.returncode}
+
+
+def run_tool(name: str, corpus: Path, info: Dict[str, Any], jobs: int, warm: bool) -> Dict[str, Any]:
+    build = TOOLS[name][0]
+    with tempfile.TemporaryDirectory(prefix="md-bench-") as tmp, StateGuard():
+        scratch = Path(tmp)
+        cache = scratch / "cache.sqlite" if warm else None
+        if warm:
+            measure(build(corpus, scratch, jobs, cache), scratch)
+        record = measure(build(corpus, scratch, jobs, cache), scratch)
+        if record["exit_code"]:
+            record["stderr_tail"] = (scratch / "stderr.txt").read_text(encoding="utf-8", errors="replace")[-2000:]
+    wall = record["wall_s"] or float("inf")
+    record.update(tool=name, jobs=jobs, mode="warm" if warm else "cold",
+                  files_per_s=round(info["files"] / wall, 1), mb_per_s=round(info["bytes"] / 1e6 / wall, 2))
+    return record
+
+
+def _commit() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        proc = subprocess.run(["git", "-C", str(REPO_ROOT), *args], capture_output=True, text=True)
+        return proc.stdout.strip() if proc.returncode == 0 else ""
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown",
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def compare(old_path: str, new_path: str) -> None:
+    old = json.loads(Path(old_path).read_text(encoding="utf-8"))
+    new = json.loads(Path(new_path).read_text(encoding="utf-8"))
+    key: Callable[[Dict[str, Any]], tuple] = lambda r: (r["tool"], r["mode"], r["jobs"])
+    before = {key(r): r for r in old["results"]}
+    print(f"{old['commit']} -> {new['commit']}  ({old['corpus']['files']} -> {new['corpus']['files']} files)")
+    print(f"{'tool':<28} {'mode':<5} {'jobs':>4} {'old s':>8} {'new s':>8} {'ratio':>6} {'rss ratio':>9}")
+    for r in new["results"]:
+        o = before.get(key(r))
+        if o is None:
+            continue
+        ratio = r["wall_s"] / o["wall_s"] if o["wall_s"] else float("nan")
+        rss = (r["peak_rss_mb"] / o["peak_rss_mb"]) if r.get("peak_rss_mb") and o.get("peak_rss_mb") else float("nan")
+        print(f"{r['tool']:<28} {r['mode']:<5} {r['jobs']:>4} {o['wall_s']:8.2f} {r['wall_s']:8.2f} {ratio:6.2f} {rss:9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the markdown checkers on a synthetic corpus")
+    parser.add_argument("--files", type=int, default=1000, help="documents in the corpus (default 1000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--median-kb", type=float, default=8.0)
+    parser.add_argument("--outliers", type=float, default=0.002, help="share of 1-2 MB documents")
+    parser.add_argument("--cjk", type=float, default=0.6, help="share of Chinese words")
+    parser.add_argument("--links", type=float, default=1.0, help="relative links per KB")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1], help="--jobs values for tools that take it")
+    parser.add_argument("--tools", nargs="+", choices=sorted(TOOLS), default=sorted(TOOLS))
+    parser.add_argument("--warm", action="store_true",
+                        help="also measure runs with a warm parse cache (tools that take --cache)")
+    parser.add_argument("--corpus", help="corpus directory (default: a reusable one in the temp dir)")
+    parser.add_argument("--output", help="result JSON (default: .reports/bench/bench-<commit>-<files>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    corpus = Path(args.corpus or Path(tempfile.gettempdir()) / f"md-bench-corpus-{args.files}-{args.seed}")
+    start = time.perf_counter()
+    info = generate(corpus, args.files, args.seed, args.median_kb, args.outliers, args.cjk, args.links)
+    print(f"corpus {corpus}: {info['files']} files, {info['bytes'] / 1e6:.1f} MB, "
+          f"largest {info['largest'] / 1e6:.2f} MB ({time.perf_counter() - start:.1f}s)")
+
+    revision = _commit()
+    results = []
+    for name in args.tools:
+        for jobs in (args.jobs if TOOLS[name][1] else [1]):
+            for warm in ([False, True] if args.warm and TOOLS[name][2] else [False]):
+                record = run_tool(name, corpus, info, jobs, warm)
+                results.append(record)
+                status = "" if not record["exit_code"] else f"  FAILED (exit {record['exit_code']})"
+                print(f"{name:<28} {record['mode']:<5} jobs={jobs:<3} {record['wall_s']:8.2f}s "
+                      f"cpu {record['cpu_s']}s  rss {record['peak_rss_mb']} MB  "
+                      f"{record['files_per_s']} files/s{status}")
+
+    output = Path(args.output) if args.output else BENCH_DIR / f"bench-{revision['commit']}-{args.files}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        **revision,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "corpus": {k: v for k, v in info.items()},
+        "results": results,
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
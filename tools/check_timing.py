@@ -0,0 +1,261 @@
+"""Per-checker, per-file timing for the quality checkers.
+
+``CheckTimer.call(checker, file_path, fn, *args)`` runs one check and records
+its wall time (``perf_counter``) and CPU time (``process_time``). For each
+checker there are two ``LatencyHistogram``s, one for wall time and one for CPU
+time. The timer also keeps the ``keep`` slowest (file, checker) pairs. Each
+record costs two clock reads, so timing is always on.
+
+With ``profile=True`` each checker also gets:
+
+- a ``cProfile`` profiler, enabled only while that checker runs. It is written
+  as ``<checker>.prof`` and can be read with ``pstats`` or snakeviz.
+- a stack sampler driven by ``ITIMER_PROF``, where the timer is available. It is
+  written as ``<checker>.collapsed``, one ``frame;frame;... microseconds`` line
+  per stack, ready for flamegraph.pl or speedscope. Samples are weighted by the
+  CPU time since the previous sample. The signal is only delivered between
+  bytecodes, so a long regex or ``ast.parse`` call is charged to the Python
+  function that made it, instead of being undercounted.
+
+Worker processes ``drain()`` their timer after each chunk. The parent passes
+the snapshot to ``merge()``, so the report covers the whole run.
+"""
+
+import cProfile
+import heapq
+import os
+import pstats
+import signal
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Bucket i holds durations in [2**(i-1), 2**i) microseconds; the last bucket is open-ended
+BUCKETS = 28
+SAMPLE_INTERVAL = 0.002
+
+
+class LatencyHistogram:
+    """Log2-bucketed durations in microseconds; quantiles are bucket upper bounds."""
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        us = int(seconds * 1e6)
+        self.counts[min(us.bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound (seconds) of the bucket holding the q-quantile, capped at the observed max."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min((1 << i) / 1e6, self.max)
+        return self.max
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'total_s': round(self.total, 6),
+            'p50_s': self.quantile(0.5),
+            'p90_s': self.quantile(0.9),
+            'p99_s': self.quantile(0.99),
+            'max_s': round(self.max, 6),
+            # Upper bound in microseconds -> count, empty buckets left out
+            'buckets_us': {str(1 << i): n for i, n in enumerate(self.counts) if n},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        hist = cls()
+        for bound, n in data['buckets_us'].items():
+            hist.counts[int(bound).bit_length() - 1] = n
+        hist.count = data['count']
+        hist.total = data['total_s']
+        hist.max = data['max_s']
+        return hist
+
+
+class _RawStats:
+    """Lets ``pstats.Stats`` load a stats dict that came from another process."""
+
+    def __init__(self, stats: Dict):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+class CheckTimer:
+    def __init__(self, profile: bool = False, keep: int = 20):
+        self.profile = profile
+        self.keep = keep
+        self.wall: Dict[str, LatencyHistogram] = {}
+        self.cpu: Dict[str, LatencyHistogram] = {}
+        self._slowest: List[Tuple[float, float, str, str]] = []  # min-heap of (wall, cpu, file, checker)
+        self._profilers: Dict[str, cProfile.Profile] = {}
+        self._pstats: Dict[str, pstats.Stats] = {}
+        self.stacks: Dict[str, Counter] = {}
+        self._active: Optional[str] = None
+        self._base = None
+        self._last_cpu = 0.0
+        self._sampling = False
+        if profile and hasattr(signal, 'setitimer'):
+            try:
+                signal.signal(signal.SIGPROF, self._sample)
+                signal.setitimer(signal.ITIMER_PROF, SAMPLE_INTERVAL, SAMPLE_INTERVAL)
+                self._sampling = True
+            except ValueError:
+                # signal handlers can only be installed from the main thread
+                pass
+
+    def call(self, checker: str, file_path: str, fn: Callable, *args):
+        """Run ``fn(*args)`` as checker ``checker`` on ``file_path`` and record its timings."""
+        profiler = None
+        if self.profile:
+            profiler = self._profilers.get(checker)
+            if profiler is None:
+                profiler = self._profilers[checker] = cProfile.Profile()
+            self._active, self._base = checker, sys._getframe()
+            self._last_cpu = time.process_time()
+            profiler.enable()
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.process_time() - cpu_start
+            if profiler is not None:
+                profiler.disable()
+                self._active = self._base = None
+            self.record(checker, file_path, wall, cpu)
+
+    def record(self, checker: str, file_path: str, wall: float, cpu: float) -> None:
+        if checker not in self.wall:
+            self.wall[checker] = LatencyHistogram()
+            self.cpu[checker] = LatencyHistogram()
+        self.wall[checker].add(wall)
+        self.cpu[checker].add(cpu)
+        item = (wall, cpu, file_path, checker)
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, item)
+        elif item > self._slowest[0]:
+            heapq.heapreplace(self._slowest, item)
+
+    def _sample(self, signum, frame) -> None:
+        checker = self._active
+        if checker is None:
+            return
+        now = time.process_time()
+        weight = int((now - self._last_cpu) * 1e6)
+        self._last_cpu = now
+        names = []
+        base = self._base
+        while frame is not None and frame is not base:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if frame is None:
+            # Sampled outside the checker call (e.g. between enable() and the call)
+            return
+        names.append(checker)
+        self.stacks.setdefault(checker, Counter())[';'.join(reversed(names))] += max(1, weight)
+
+    def slowest(self) -> List[Tuple[str, str, float, float]]:
+        """(file, checker, wall seconds, CPU seconds), slowest first."""
+        return [(f, c, wall, cpu) for wall, cpu, f, c in sorted(self._slowest, reverse=True)]
+
+    def summary(self) -> List[Tuple[str, LatencyHistogram, LatencyHistogram]]:
+        """(checker, wall histogram, CPU histogram), largest total wall time first."""
+        return sorted(((name, self.wall[name], self.cpu[name]) for name in self.wall),
+                      key=lambda item: -item[1].total)
+
+    def drain(self) -> Dict[str, Any]:
+        """Picklable snapshot of everything recorded so far; the timer starts over empty."""
+        profiles = {}
+        for name, profiler in self._profilers.items():
+            profiler.create_stats()
+            profiles[name] = profiler.stats
+        snapshot = {
+            'wall': {name: hist.as_dict() for name, hist in self.wall.items()},
+            'cpu': {name: hist.as_dict() for name, hist in self.cpu.items()},
+            'slowest': list(self._slowest),
+            'profiles': profiles,
+            'stacks': {name: dict(counter) for name, counter in self.stacks.items()},
+        }
+        self.wall, self.cpu, self._slowest = {}, {}, []
+        self._profilers, self.stacks = {}, {}
+        return snapshot
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        for name, data in snapshot['wall'].items():
+            if name not in self.wall:
+                self.wall[name] = LatencyHistogram()
+                self.cpu[name] = LatencyHistogram()
+            self.wall[name].merge(LatencyHistogram.from_dict(data))
+            self.cpu[name].merge(LatencyHistogram.from_dict(snapshot['cpu'][name]))
+        for wall, cpu, file_path, checker in snapshot['slowest']:
+            item = (wall, cpu, file_path, checker)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, item)
+            elif item > self._slowest[0]:
+                heapq.heapreplace(self._slowest, item)
+        for name, stats in snapshot['profiles'].items():
+            self._add_stats(name, stats)
+        for name, stacks in snapshot['stacks'].items():
+            self.stacks.setdefault(name, Counter()).update(stacks)
+
+    def _add_stats(self, name: str, stats: Dict) -> None:
+        if name in self._pstats:
+            self._pstats[name].add(_RawStats(stats))
+        else:
+            self._pstats[name] = pstats.Stats(_RawStats(stats))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'checkers': {name: {'wall': wall.as_dict(), 'cpu': cpu.as_dict()} for name, wall, cpu in self.summary()},
+            'slowest': [{'file_path': f, 'checker': c, 'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6)}
+                        for f, c, wall, cpu in self.slowest()],
+        }
+
+    def write_profiles(self, directory) -> List[Path]:
+        """Write ``<checker>.prof`` and ``<checker>.collapsed`` under ``directory``; returns the paths."""
+        if self._sampling:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            self._sampling = False
+        for name, profiler in self._profilers.items():
+            profiler.create_stats()
+            self._add_stats(name, profiler.stats)
+        self._profilers = {}
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        written = []
+        for name, stats in sorted(self._pstats.items()):
+            path = directory / f"{name}.prof"
+            stats.dump_stats(str(path))
+            written.append(path)
+        for name, stacks in sorted(self.stacks.items()):
+            path = directory / f"{name}.collapsed"
+            path.write_text(''.join(f"{stack} {n}\n" for stack, n in sorted(stacks.items())), encoding='utf-8')
+            written.append(path)
+        return written
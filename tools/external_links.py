@@ -0,0 +1,184 @@
+"""Concurrent external link checking with a persistent TTL cache.
+
+``ExternalLinkChecker.check_many`` probes a batch of URLs from an asyncio event
+loop. Concurrency is bounded globally and per host. Each host gets one
+``requests.Session`` so connections are kept alive and reused. Requests go
+through a thread pool because ``requests`` is blocking, and the repo has no
+async HTTP client dependency.
+
+A URL is probed with HEAD first. If the server rejects HEAD or the request
+fails, a streamed GET is tried (the body is not downloaded). Any status below
+400 counts as reachable, as with the previous ``requests.head`` check.
+
+Results are stored in ``.reports/external_links.sqlite``. Reachable URLs stay
+valid for ``ttl`` seconds; failures expire sooner (``negative_ttl``) so that
+transient outages get re-probed.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from parse_cache import REPO_ROOT
+
+
+LINK_CACHE_PATH = REPO_ROOT / ".reports" / "external_links.sqlite"
+
+# Servers that answer HEAD with these statuses often serve GET fine
+HEAD_FALLBACK_STATUSES = {403, 404, 405, 501}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS links (
+    url TEXT PRIMARY KEY,
+    ok INTEGER NOT NULL,
+    status INTEGER,
+    checked_at REAL NOT NULL
+);
+"""
+
+
+def _host(url: str) -> str:
+    try:
+        return urlparse(url).netloc.lower()
+    except ValueError:
+        return url
+
+
+class LinkCache:
+    """url -> (ok, status, checked_at) with separate expiry for good and bad results."""
+
+    def __init__(self, path: Path = LINK_CACHE_PATH, ttl: float = 7 * 86400, negative_ttl: float = 86400):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[bool]:
+        with self._lock:
+            row = self.conn.execute("SELECT ok, checked_at FROM links WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        ok, checked_at = bool(row[0]), row[1]
+        if time.time() - checked_at > (self.ttl if ok else self.negative_ttl):
+            return None
+        return ok
+
+    def put_many(self, results: Iterable[Tuple[str, bool, Optional[int]]]) -> None:
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO links (url, ok, status, checked_at) VALUES (?, ?, ?, ?)",
+                ((url, int(ok), status, now) for url, ok, status in results),
+            )
+            self.conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+class ExternalLinkChecker:
+    """Checks URLs concurrently; ``check``/``check_many`` consult and fill the TTL cache."""
+
+    def __init__(self, cache_path: Optional[Path] = LINK_CACHE_PATH, ttl: float = 7 * 86400,
+                 negative_ttl: float = 86400, concurrency: int = 32, per_host: int = 4,
+                 timeout: float = 5.0):
+        # Constructor arguments, so worker processes can build an equivalent checker
+        self.config = dict(cache_path=cache_path, ttl=ttl, negative_ttl=negative_ttl,
+                           concurrency=concurrency, per_host=per_host, timeout=timeout)
+        self.cache = LinkCache(cache_path, ttl, negative_ttl) if cache_path else None
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self._sessions: Dict[str, requests.Session] = {}
+        self._sessions_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def check(self, url: str) -> bool:
+        return self.check_many([url])[url]
+
+    def check_many(self, urls: Iterable[str]) -> Dict[str, bool]:
+        """Reachability of every URL; cached results are reused, the rest probed concurrently."""
+        results: Dict[str, bool] = {}
+        pending = []
+        for url in dict.fromkeys(urls):
+            cached = self.cache.get(url) if self.cache else None
+            if cached is None:
+                pending.append(url)
+            else:
+                results[url] = cached
+        if pending:
+            probed = asyncio.run(self._probe_all(pending))
+            if self.cache:
+                self.cache.put_many(probed)
+            results.update((url, ok) for url, ok, _ in probed)
+        return results
+
+    async def _probe_all(self, urls):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        loop = asyncio.get_running_loop()
+        global_limit = asyncio.Semaphore(self.concurrency)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+
+        async def probe(url):
+            host = _host(url)
+            host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+            async with host_limit, global_limit:
+                ok, status = await loop.run_in_executor(self._executor, self._probe, host, url)
+            return url, ok, status
+
+        return await asyncio.gather(*(probe(url) for url in urls))
+
+    def _session(self, host: str) -> requests.Session:
+        with self._sessions_lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.per_host)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+            return session
+
+    def _probe(self, host: str, url: str) -> Tuple[bool, Optional[int]]:
+        session = self._session(host)
+        status = None
+        try:
+            response = session.head(url, timeout=self.timeout, allow_redirects=True)
+            status = response.status_code
+            if status < 400:
+                return True, status
+            if status not in HEAD_FALLBACK_STATUSES:
+                return False, status
+        except Exception:
+            # Malformed URLs raise more than RequestException; all count as failures
+            pass
+        try:
+            with session.get(url, timeout=self.timeout, allow_redirects=True, stream=True) as response:
+                return response.status_code < 400, response.status_code
+        except Exception:
+            return False, status
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+        if self.cache:
+            self.cache.close()
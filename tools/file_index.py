@@ -0,0 +1,238 @@
+"""Corpus-wide file and heading index for the link checkers.
+
+One ``os.scandir`` walk records every file and directory under the repo root as
+a normalized relative path, so "does this link target exist" is a set lookup
+instead of a filesystem probe per link. Heading lines of markdown files are
+read lazily on the first anchor lookup and kept with the file's size/mtime.
+
+The index is saved to ``.reports/file_index.json``. On load every recorded
+directory is stat'ed; if none changed (adding, removing or renaming an entry
+changes its directory's mtime) the stored path set is reused as is, otherwise
+the tree is walked again. Stale heading entries are detected per file.
+
+Directories in ``watcher.SKIP_DIRS`` (``.git``, ``.reports`` and caches) are
+neither indexed nor stat'ed: their contents churn on every run, including this
+index's own save, and lookups below them go to the filesystem.
+"""
+
+import functools
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from parse_cache import REPO_ROOT
+from watcher import SKIP_DIRS
+
+
+INDEX_PATH = REPO_ROOT / ".reports" / "file_index.json"
+
+
+class FileIndex:
+    """Normalized relative paths of everything under ``root`` plus lazily read markdown headings."""
+
+    def __init__(self, root: Path = REPO_ROOT, path: Optional[Path] = INDEX_PATH):
+        self.root = os.path.abspath(str(root))
+        self.path = Path(path) if path else None
+        self.dirs: Dict[str, int] = {}
+        self.paths: Set[str] = set()
+        self.docs: Dict[str, list] = {}
+        self._anchors: Dict[tuple, Set[str]] = {}
+        self._dirty = False
+
+    # --- building -----------------------------------------------------------
+
+    @classmethod
+    def load(cls, root: Path = REPO_ROOT, path: Optional[Path] = INDEX_PATH) -> "FileIndex":
+        """Load the saved index if it still matches the tree, otherwise rebuild it."""
+        index = cls(root, path)
+        data = None
+        if index.path and index.path.exists():
+            try:
+                data = json.loads(index.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = None
+        if data and data.get("root") == index.root and index._dirs_unchanged(data["dirs"]):
+            index.dirs = data["dirs"]
+            index.paths = set(data["paths"])
+            index.docs = data["docs"]
+        else:
+            if data and data.get("root") == index.root:
+                index.docs = data["docs"]
+            index.build()
+        return index
+
+    def build(self) -> None:
+        """Walk the tree once with ``os.scandir``."""
+        dirs, paths = {}, set()
+        stack = [""]
+        while stack:
+            rel = stack.pop()
+            full = os.path.join(self.root, rel) if rel else self.root
+            try:
+                dirs[rel] = os.stat(full).st_mtime_ns
+                with os.scandir(full) as it:
+                    for entry in it:
+                        if entry.name in SKIP_DIRS and entry.is_dir():
+                            continue
+                        child = f"{rel}/{entry.name}" if rel else entry.name
+                        paths.add(child)
+                        if entry.is_dir():
+                            stack.append(child)
+            except OSError:
+                continue
+        self.dirs, self.paths = dirs, paths
+        self.docs = {k: v for k, v in self.docs.items() if k in paths}
+        self._anchors.clear()
+        self._dirty = True
+
+    def update(self, paths: Iterable) -> None:
+        """Apply creations and deletions of single files (from a file watcher) without a full walk."""
+        for path in paths:
+            rel = self.rel(path)
+            if not rel:
+                continue
+            full = os.path.join(self.root, rel)
+            if os.path.exists(full):
+                parts = rel.split("/")
+                for i in range(1, len(parts)):
+                    parent = "/".join(parts[:i])
+                    self.paths.add(parent)
+                self.paths.add(rel)
+                if os.path.isdir(full):
+                    self.dirs[rel] = os.stat(full).st_mtime_ns
+            else:
+                prefix = rel + "/"
+                gone = {p for p in self.paths if p == rel or p.startswith(prefix)}
+                self.paths -= gone
+                for p in gone:
+                    self.dirs.pop(p, None)
+                    self.docs.pop(p, None)
+                self._anchors = {k: v for k, v in self._anchors.items() if k[0] not in gone}
+            parent = os.path.dirname(full)
+            while True:
+                # Stored mtimes are what ``load`` compares against, keep them current
+                key = parent[len(self.root) + 1:].replace(os.sep, "/") if parent != self.root else ""
+                try:
+                    self.dirs[key] = os.stat(parent).st_mtime_ns
+                except OSError:
+                    self.dirs.pop(key, None)
+                if parent == self.root:
+                    break
+                parent = os.path.dirname(parent)
+        self._dirty = True
+
+    def apply_events(self, paths: Iterable) -> Set[str]:
+        """Bring the index up to date for watcher events; returns the paths that appeared or disappeared.
+
+        Events for files that were only modified leave the index alone and are not returned.
+        """
+        flipped = {str(p) for p in paths if self.rel(p) and os.path.exists(str(p)) != self.exists(p)}
+        if flipped:
+            self.update(flipped)
+        return flipped
+
+    def _dirs_unchanged(self, dirs: Dict[str, int]) -> bool:
+        for rel, mtime_ns in dirs.items():
+            try:
+                if os.stat(os.path.join(self.root, rel) if rel else self.root).st_mtime_ns != mtime_ns:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        if not self.path.parent.exists():
+            self.path.parent.mkdir(parents=True)
+            # Creating .reports changed its parent's mtime; record it or the next load rebuilds
+            parent = self.rel(self.path.parent.parent)
+            if parent in self.dirs:
+                self.dirs[parent] = os.stat(self.path.parent.parent).st_mtime_ns
+        tmp = self.path.with_suffix(".tmp")
+        data = {"root": self.root, "dirs": self.dirs, "paths": sorted(self.paths), "docs": self.docs}
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    # --- lookups ------------------------------------------------------------
+
+    def rel(self, path) -> Optional[str]:
+        """Normalized root-relative posix path, or None when ``path`` is outside the indexed tree."""
+        full = os.path.normpath(os.path.abspath(str(path)))
+        if full == self.root:
+            return ""
+        if not full.startswith(self.root + os.sep):
+            return None
+        rel = full[len(self.root) + 1:].replace(os.sep, "/")
+        if not SKIP_DIRS.isdisjoint(rel.split("/")):
+            return None
+        return rel
+
+    def exists(self, path) -> bool:
+        """Same answer as ``Path(path).exists()``; paths outside the index fall back to the filesystem."""
+        rel = self.rel(path)
+        # ".." through a missing directory fails on the filesystem but not after normpath
+        if rel is None or ".." in Path(path).parts:
+            return os.path.exists(str(path))
+        return rel == "" or rel in self.paths
+
+    def files_under(self, base, suffix: str = ".md") -> List[str]:
+        """Indexed paths below ``base`` ending with ``suffix``, as absolute paths in sorted order.
+
+        A ``base`` outside the indexed tree is walked on the filesystem instead.
+        """
+        rel = self.rel(base)
+        if rel is None:
+            # Outside the indexed tree (e.g. a generated benchmark corpus): walk it directly
+            found = []
+            for root, dirs, files in os.walk(str(base)):
+                dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+                found.extend(os.path.join(root, f) for f in files if f.endswith(suffix))
+            return sorted(found)
+        prefix = f"{rel}/" if rel else ""
+        return [os.path.join(self.root, p) for p in sorted(self.paths)
+                if p.startswith(prefix) and p.endswith(suffix) and p not in self.dirs]
+
+    def headings(self, path) -> Optional[List[str]]:
+        """Lines of a markdown file that start with ``#`` (after leading whitespace), or None if not indexed."""
+        rel = self.rel(path)
+        if rel is None or rel not in self.paths or rel in self.dirs or not rel.endswith(".md"):
+            return None
+        full = os.path.join(self.root, rel)
+        try:
+            st = os.stat(full)
+        except OSError:
+            return None
+        doc = self.docs.get(rel)
+        if doc is None or doc[0] != st.st_size or doc[1] != st.st_mtime_ns:
+            try:
+                with open(full, "r", encoding="utf-8", errors="ignore") as f:
+                    lines = f.read().splitlines()
+            except OSError:
+                return None
+            doc = [st.st_size, st.st_mtime_ns, [line for line in lines if line.lstrip().startswith("#")]]
+            self.docs[rel] = doc
+            self._anchors = {k: v for k, v in self._anchors.items() if k[0] != rel}
+            self._dirty = True
+        return doc[2]
+
+    def anchors(self, path, to_anchor: Callable[[str], Optional[str]]) -> Optional[Set[str]]:
+        """Anchors of ``path`` under the caller's slug rule (raw heading line -> anchor or None).
+
+        Each tool keeps its own slug rule; sets are memoized per (file, rule).
+        """
+        headings = self.headings(path)
+        if headings is None:
+            return None
+        key = (self.rel(path), to_anchor)
+        if key not in self._anchors:
+            self._anchors[key] = {a for a in map(to_anchor, headings) if a}
+        return self._anchors[key]
+
+
+@functools.lru_cache(maxsize=None)
+def shared_index(root: str = str(REPO_ROOT)) -> FileIndex:
+    """One index per process, loaded (or built) on first use."""
+    return FileIndex.load(Path(root), INDEX_PATH if os.path.abspath(root) == str(REPO_ROOT) else None)
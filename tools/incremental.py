@@ -0,0 +1,207 @@
+"""Git-diff driven incremental runs for the markdown checkers.
+
+``--since <ref>`` checks only the markdown files changed since ``ref`` plus every
+file that links to a changed or deleted file of any type (e.g. an added or
+removed image). Reverse dependencies come from a link graph persisted between
+runs (``.reports/incremental/link_graph.json``) and refreshed per file by size/mtime. Per-checker results are kept in a SQLite result
+store so an incremental run can be merged back into the last full-run numbers.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import unquote
+
+from parse_cache import REPO_ROOT, fingerprint
+
+
+STATE_DIR = REPO_ROOT / ".reports" / "incremental"
+GRAPH_PATH = STATE_DIR / "link_graph.json"
+
+LINK_RE = re.compile(r"\[[^\]]*\]\(\s*<?([^)\s>]+)")
+SCHEME_RE = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+
+def norm_path(path) -> str:
+    """Absolute, normalized path string used as the key everywhere in this module."""
+    return os.path.normcase(os.path.abspath(str(path)))
+
+
+def git_changed_files(ref: str, repo_root: Path = REPO_ROOT) -> Tuple[Set[str], Set[str]]:
+    """Files of any type changed (including untracked) and deleted since ``ref``."""
+    def git(*args: str) -> List[str]:
+        proc = subprocess.run(
+            ["git", "-C", str(repo_root), *args], capture_output=True, text=True, encoding="utf-8"
+        )
+        if proc.returncode != 0:
+            raise SystemExit(f"git {' '.join(args)} failed: {proc.stderr.strip()}")
+        return [p for p in proc.stdout.split("\0") if p]
+
+    touched = git("diff", "--name-only", "--no-renames", "-z", ref, "--")
+    touched += git("ls-files", "--others", "--exclude-standard", "-z")
+    changed, deleted = set(), set()
+    for rel in touched:
+        full = repo_root / rel
+        (changed if full.exists() else deleted).add(norm_path(full))
+    return changed, deleted
+
+
+def resolve_link(source: str, url: str, repo_root: Path = REPO_ROOT) -> Optional[str]:
+    """Resolve a markdown link target to a normalized path; None for external/anchor-only links."""
+    if SCHEME_RE.match(url) or url.startswith("#"):
+        return None
+    url = unquote(url.split("#", 1)[0].split("?", 1)[0])
+    if not url:
+        return None
+    base = repo_root if url.startswith("/") else Path(source).parent
+    return norm_path(os.path.join(str(base), url.lstrip("/")))
+
+
+def extract_link_targets(source: str, content: str) -> List[str]:
+    targets = set()
+    for m in LINK_RE.finditer(content):
+        target = resolve_link(source, m.group(1))
+        if target is not None:
+            targets.add(target)
+    return sorted(targets)
+
+
+class LinkGraph:
+    """source file -> link targets, with stat info so entries refresh when files change."""
+
+    def __init__(self, path: Path = GRAPH_PATH):
+        self.path = Path(path)
+        self.entries: Dict[str, dict] = {}
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def sync(self, files: Iterable[str]) -> None:
+        """Refresh outgoing links of the given files whose size/mtime changed; drop vanished files."""
+        for file_path in files:
+            key = norm_path(file_path)
+            try:
+                st = os.stat(key)
+            except OSError:
+                self.entries.pop(key, None)
+                continue
+            entry = self.entries.get(key)
+            if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                continue
+            try:
+                with open(key, "r", encoding="utf-8", errors="ignore") as f:
+                    content = f.read()
+            except OSError:
+                continue
+            self.entries[key] = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "links": extract_link_targets(key, content),
+            }
+        for key in [k for k in self.entries if not os.path.exists(k)]:
+            del self.entries[key]
+
+    def dependents(self, targets: Set[str]) -> Set[str]:
+        """Files with at least one link into ``targets``."""
+        return {src for src, entry in self.entries.items() if targets.intersection(entry["links"])}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+class ResultStore:
+    """Last known per-file results of one checker over one base path, keyed by normalized path.
+
+    Results live in SQLite, one JSON row per file. ``put`` buffers at most
+    ``batch_size`` rows before writing them, and ``get`` reads a single row, so
+    streaming runs keep memory flat however large the corpus. Everything written
+    since the last ``save`` is one transaction: a run that dies before ``save``
+    leaves the previous results untouched.
+    """
+
+    def __init__(self, name: str, base_path, state_dir: Path = STATE_DIR, batch_size: int = 500):
+        stem = f"{name}-{fingerprint([norm_path(base_path)])}"
+        self.path = Path(state_dir) / f"{stem}.sqlite"
+        self.batch_size = batch_size
+        self._pending: Dict[str, str] = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS results (path TEXT PRIMARY KEY, result TEXT NOT NULL) "
+                          "WITHOUT ROWID")
+        self.conn.commit()
+
+    def get(self, file_path) -> Optional[object]:
+        key = norm_path(file_path)
+        data = self._pending.get(key)
+        if data is None:
+            row = self.conn.execute("SELECT result FROM results WHERE path = ?", (key,)).fetchone()
+            data = row[0] if row else None
+        return None if data is None else json.loads(data)
+
+    def put(self, file_path, result: object) -> None:
+        self._pending[norm_path(file_path)] = json.dumps(result, ensure_ascii=False)
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def keys(self) -> Set[str]:
+        """Normalized paths that have a stored result."""
+        self._flush()
+        return {k for (k,) in self.conn.execute("SELECT path FROM results")}
+
+    def __contains__(self, file_path) -> bool:
+        return self.get(file_path) is not None
+
+    def _flush(self) -> None:
+        if self._pending:
+            self.conn.executemany("INSERT OR REPLACE INTO results (path, result) VALUES (?, ?)",
+                                  self._pending.items())
+            self._pending = {}
+
+    def retain(self, all_files: List[str]) -> None:
+        """Drop results of files no longer present."""
+        current = {norm_path(p) for p in all_files}
+        gone = self.keys() - current
+        self.conn.executemany("DELETE FROM results WHERE path = ?", ((k,) for k in gone))
+
+    def merge(self, all_files: List[str], fresh: Dict[str, object]) -> List[object]:
+        """Replace stored results with ``fresh`` ones, drop files no longer present,
+        and return the merged results in ``all_files`` order."""
+        self.retain(all_files)
+        for file_path, result in fresh.items():
+            self.put(file_path, result)
+        return [r for r in (self.get(p) for p in all_files) if r is not None]
+
+    def save(self) -> None:
+        self._flush()
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def select_since(ref: str, all_files: List[str], store: ResultStore,
+                 graph: Optional[LinkGraph] = None, repo_root: Path = REPO_ROOT) -> List[str]:
+    """Subset of ``all_files`` to re-check for ``--since ref``.
+
+    That is: markdown files changed since ``ref``, files linking to a changed or
+    deleted file of any type, and files the store has no result for yet (so a missing baseline
+    degrades to a full run instead of a partial report).
+    """
+    graph = graph if graph is not None else LinkGraph()
+    graph.sync(all_files)
+    changed, deleted = git_changed_files(ref, repo_root)
+    # Any changed or deleted file can be a link target; only markdown files are checked themselves
+    selected = {p for p in changed if p.endswith(".md")} | graph.dependents(changed | deleted)
+    graph.save()
+    stored = store.keys()
+    return [p for p in all_files if norm_path(p) in selected or norm_path(p) not in stored]
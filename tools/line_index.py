@@ -0,0 +1,41 @@
+"""Offset -> line number lookups for issue reporting.
+
+``content[:pos].count('\\n') + 1`` copies and rescans the prefix for every
+match, which is quadratic on large documents. ``LineIndex`` records the start
+offset of each line once and answers with a bisect.
+"""
+
+import bisect
+from typing import List
+
+
+class LineIndex:
+    """Start offsets of every line of a text."""
+
+    def __init__(self, text: str):
+        starts: List[int] = [0]
+        find = text.find
+        pos = find("\n")
+        while pos != -1:
+            starts.append(pos + 1)
+            pos = find("\n", pos + 1)
+        self.starts = starts
+
+    def line_of(self, offset: int) -> int:
+        """1-based line number of the character at ``offset``."""
+        return bisect.bisect_right(self.starts, offset)
+
+
+_last = (None, None)
+
+
+def line_index(text: str) -> LineIndex:
+    """LineIndex for ``text``, reused while callers keep passing the same string object.
+
+    The checkers of one document all receive the same ``content`` object, so the
+    table is built once per document rather than once per checker.
+    """
+    global _last
+    if _last[0] is not text:
+        _last = (text, LineIndex(text))
+    return _last[1]
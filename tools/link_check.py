@@ -1,76 +1,188 @@
+"""Check relative markdown links and their #anchors.
+
+Usage: python tools/link_check.py [--root DIR | --all] [--since GIT_REF | --watch] [--jobs N]
+
+Anchors come from ``anchor_index.AnchorIndex``: GitHub slugs with -1/-2
+suffixes for duplicate headings (matched case-insensitively) and
+``<a id/name>`` targets (matched exactly), persisted in .reports/anchor_index.json and
+rescanned per file when it changes, in parallel. Same-document links
+(``[x](#anchor)``) are checked against the source file, and links inside
+fenced code blocks are ignored.
+
+``--watch`` keeps running after the first pass. When markdown files change, or
+any file or directory appears or disappears, it re-checks the changed markdown
+files and every file linking to a changed path (through the incremental link
+graph) and rewrites links.csv atomically.
+"""
+
+import argparse
+import bisect
+import os
 import re
+import signal
+import time
 from pathlib import Path
+from urllib.parse import unquote
+
+from anchor_index import AnchorIndex, document_anchors, github_slug, heading_text
+from file_index import shared_index
+from incremental import LinkGraph, ResultStore, norm_path, select_since
+from md_tokens import tokenize
+from parse_cache import source_version
+
+DEFAULT_ROOT = "Analysis/1-数据库系统/1.1-PostgreSQL"
+LINK_RE = re.compile(r"\[[^\]]+\]\((?!https?://)([^)#\s]*)(#[^)\s]+)?\)")
 
 
 def find_md_files(root: Path):
-    return [p for p in root.rglob("*.md") if p.is_file()]
+    return [Path(p) for p in shared_index().files_under(root)]
 
 
 def iter_links(text: str):
-    # Markdown link: [text](path#anchor)
-    pattern = re.compile(r"\[[^\]]+\]\((?!https?://)([^)#\s]+)(#[^)\s]+)?\)")
-    for m in pattern.finditer(text):
+    # Markdown link: [text](path#anchor) or [text](#anchor); links in fenced code are not links
+    fences = tokenize(text).fences
+    starts = [f.start for f in fences]
+    for m in LINK_RE.finditer(text):
+        i = bisect.bisect_right(starts, m.start()) - 1
+        if i >= 0 and m.start() < fences[i].end:
+            continue
+        if not m.group(1) and not m.group(2):
+            continue
         yield m.group(1), (m.group(2)[1:] if m.group(2) else None)
 
 
-def slugify_heading(h: str) -> str:
-    # GitHub-like anchor slug (approx). Keep ascii letters/digits/CJK/spaces/hyphen
-    s = h.strip().lower()
-    s = re.sub(r"[^0-9a-z\u4e00-\u9fff\s-]", " ", s)
-    s = re.sub(r"\s+", "-", s)
-    return s
-
-
-def extract_anchors(md_path: Path):
-    anchors = set()
+def check_file(src: Path, anchor_index: AnchorIndex):
     try:
-        lines = md_path.read_text(encoding="utf-8", errors="ignore").splitlines()
+        text = src.read_text(encoding="utf-8", errors="ignore")
     except Exception:
-        return anchors
-    for line in lines:
-        if line.lstrip().startswith("#"):
-            heading = line.lstrip("#").strip()
-            if heading:
-                anchors.add(slugify_heading(heading))
-    return anchors
+        return []
+    rows = []
+    anchors_of = {}
+    for link_path, anchor in iter_links(text):
+        status = "ok"
+        if link_path:
+            target = (src.parent / link_path).resolve()
+            if not shared_index().exists(target):
+                status = "missing_file"
+        else:
+            # Same-document link, most of them from tables of contents
+            target = src
+        if anchor and status == "ok":
+            if target not in anchors_of:
+                anchors_of[target] = anchor_index.anchors(target) or frozenset()
+            # Heading slugs are lowercase and matched case-insensitively;
+            # <a id/name> targets keep their case and match exactly
+            fragment = unquote(anchor)
+            if fragment not in anchors_of[target] and fragment.lower() not in anchors_of[target]:
+                status = "missing_anchor"
+        rows.append(
+            f"{src.as_posix()},{link_path},{anchor or ''},{status}"
+        )
+    return rows
+
+
+def write_links_csv(out: Path, all_files, store: ResultStore) -> int:
+    """Write every stored row in ``all_files`` order; returns the number of problem rows."""
+    rows = ["source_file,link_path,anchor,status"]
+    for file_rows in store.merge(all_files, {}):
+        rows.extend(file_rows)
+    tmp = out.with_suffix(".tmp")
+    tmp.write_text("\n".join(rows) + "\n", encoding="utf-8")
+    os.replace(tmp, out)
+    return sum(1 for r in rows[1:] if r.endswith(",missing_file") or r.endswith(",missing_anchor"))
+
+
+def watch(target_root: Path, all_files, store: ResultStore, anchor_index: AnchorIndex, out: Path,
+          interval: float = 1.0, polling: bool = False) -> None:
+    """Re-check changed files and their link dependents until interrupted."""
+    from watcher import watch_changes
+
+    known = {norm_path(p): p for p in all_files}
+    graph = LinkGraph()
+    graph.sync(all_files)
+    # Every file, not just markdown: images and other link targets matter too
+    watcher = watch_changes(str(target_root), suffixes=None, interval=interval, polling=polling)
+    print(f"watching {target_root} with {type(watcher).__name__}")
+    try:
+        while True:
+            events = watcher.wait()
+            if not events:
+                continue
+            start = time.perf_counter()
+            # Any path appearing or disappearing can flip a link; other non-markdown edits cannot
+            flipped = {norm_path(p) for p in shared_index().apply_events(events)}
+            keys = {norm_path(p): p for p in events if p.endswith(".md") or norm_path(p) in flipped}
+            if not keys:
+                continue
+            docs = {k: p for k, p in keys.items() if p.endswith(".md")}
+            created = {k for k, p in docs.items() if k not in known and os.path.isfile(p)}
+            deleted = {k for k in docs if k in known and not os.path.exists(k)}
+            if created or deleted:
+                known.update((k, keys[k]) for k in created)
+                for k in deleted:
+                    del known[k]
+                all_files = [p for p in all_files if norm_path(p) in known] + [keys[k] for k in created]
+            graph.sync(docs.values())
+            anchor_index.refresh([p for k, p in docs.items() if k in known], jobs=1)
+            selected = [known[k] for k in {k for k in docs if k in known} | graph.dependents(set(keys))
+                        if k in known]
+            for src in selected:
+                store.put(src, check_file(Path(src), anchor_index))
+            missing = write_links_csv(out, all_files, store)
+            print(f"rechecked={len(selected)} missing_or_anchor_issues={missing} "
+                  f"elapsed_ms={(time.perf_counter() - start) * 1000:.0f}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        store.save()
+        graph.save()
+        shared_index().save()
+        anchor_index.save()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Check relative markdown links and anchors")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help=f"directory to check (default: {DEFAULT_ROOT})")
+    parser.add_argument("--all", action="store_true", help="check every markdown file in the repository")
+    parser.add_argument("--jobs", type=int, default=0, help="worker processes for the anchor scan (default: CPU count)")
+    parser.add_argument("--since", metavar="GIT_REF",
+                        help="only re-check files changed since GIT_REF and files linking to them; "
+                             "other rows come from the previous run")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and re-check changed files and files linking to them")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="seconds between scans when --watch cannot use inotify")
+    args = parser.parse_args()
+
     repo_root = Path.cwd()
-    target_root = repo_root / "Analysis/1-数据库系统/1.1-PostgreSQL"
+    target_root = repo_root if args.all else repo_root / args.root
     reports = repo_root / ".reports"
     reports.mkdir(parents=True, exist_ok=True)
 
-    rows = ["source_file,link_path,anchor,status"]
-
-    # cache anchors per file
-    anchor_cache = {}
-
-    for src in find_md_files(target_root):
-        try:
-            text = src.read_text(encoding="utf-8", errors="ignore")
-        except Exception:
-            continue
-        for link_path, anchor in iter_links(text):
-            target = (src.parent / link_path).resolve()
-            status = "ok"
-            if not target.exists():
-                status = "missing_file"
-            elif anchor:
-                if target not in anchor_cache:
-                    anchor_cache[target] = extract_anchors(target)
-                if anchor.lower() not in anchor_cache[target]:
-                    status = "missing_anchor"
-            rows.append(
-                f"{src.as_posix()},{link_path},{anchor or ''},{status}"
-            )
+    all_files = [str(p) for p in find_md_files(target_root)]
+    # Results depend on the slug rules, so a rule change starts a new store
+    rules = source_version(iter_links, check_file, document_anchors, github_slug, heading_text)
+    store = ResultStore(f"link_check-{rules}", target_root)
+    files = select_since(args.since, all_files, store) if args.since else all_files
+
+    # Most link targets are under the checked root: rescan their anchors in parallel up front
+    anchor_index = AnchorIndex()
+    anchor_index.refresh(all_files, jobs=args.jobs)
+    fresh = {src: check_file(Path(src), anchor_index) for src in files}
+    store.merge(all_files, fresh)
+    store.save()
+    shared_index().save()
+    anchor_index.save()
 
     out = reports / "links.csv"
-    out.write_text("\n".join(rows) + "\n", encoding="utf-8")
+    missing = write_links_csv(out, all_files, store)
     # print brief summary
-    total = len(rows) - 1
-    missing = sum(1 for r in rows[1:] if r.endswith(",missing_file") or r.endswith(",missing_anchor"))
-    print(f"links_total={total} missing_or_anchor_issues={missing} output={out}")
+    total = sum(len(store.get(p) or []) for p in all_files)
+    print(f"links_total={total} missing_or_anchor_issues={missing} rechecked={len(files)} output={out}")
+    if args.watch:
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        watch(target_root, all_files, store, anchor_index, out, args.poll_interval)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,23 @@
+"""Build .reports/dedupe_plan.csv from the files listed in .reports/priority.csv.
+
+By default documents are grouped by normalized filename stem. With ``--near``
+the documents are also compared by content: MinHash signatures (see
+``minhash.py``), computed in worker processes and cached per content hash in
+the parse cache, go through LSH banding, so only candidate pairs are compared.
+Pairs whose estimated Jaccard similarity reaches ``--threshold`` are joined
+into clusters, which are written to .reports/dedupe_clusters.csv and, when a
+cluster is not already one filename group, added to the plan as ``near:`` rows.
+
+Usage: python tools/make_dedupe_plan.py [--near] [--threshold 0.8] [--roots DIR ...] [--jobs N]
+"""
+
+import argparse
 import csv
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 
 def normalize_key(stem: str) -> str:
@@ -14,55 +31,173 @@ def normalize_key(stem: str) -> str:
     return s
 
 
+def _posix(p: str) -> Path:
+    # priority.csv may hold Windows separators; Path() only splits on them on Windows
+    return Path(p.replace("\\", "/"))
+
+
 def choose_primary(files: list[str]) -> str:
     # Prefer non-archive, non-扩充/增强, path depth minimal
     def score(p: str) -> tuple:
         penalties = 0
         if "99-归档" in p:
             penalties += 10
-        stem = Path(p).stem
+        stem = _posix(p).stem
         if "扩充版" in stem or "增强版" in stem:
             penalties += 5
         # shorter path preferred
-        depth = len(Path(p).parts)
+        depth = len(_posix(p).parts)
         return (penalties, depth, -len(p))
 
     return sorted(files, key=score)[0]
 
 
+def _signature_hex(path: str) -> str:
+    from minhash import signature
+    from parse_cache import decode_text
+
+    with open(path, "rb") as f:
+        return signature(decode_text(f.read())).tobytes().hex()
+
+
+def compute_signatures(paths: List[str], jobs: int = 0):
+    """MinHash signature per path (None when unreadable); cached by content digest."""
+    import numpy as np
+    import minhash
+    from parse_cache import ParseCache, source_version
+
+    version = source_version(minhash.normalize, minhash.shingle_hashes, minhash.signature, minhash._mix)
+    context = f"{minhash.SHINGLE}x{minhash.PERMS}"
+    signatures: Dict[str, Optional[np.ndarray]] = {}
+    with ParseCache() as cache:
+        digests: Dict[str, str] = {}
+        misses = []
+        for path in paths:
+            try:
+                digest, _ = cache.file_digest(path)
+            except OSError:
+                signatures[path] = None
+                continue
+            hit = cache.get(digest, "dedupe.minhash", version, context)
+            if hit is None:
+                digests[path] = digest
+                misses.append(path)
+            else:
+                signatures[path] = np.frombuffer(bytes.fromhex(hit), dtype=np.uint64)
+
+        jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        if jobs > 1 and len(misses) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                computed = list(pool.map(_signature_hex, misses, chunksize=max(1, len(misses) // (jobs * 8))))
+        else:
+            computed = [_signature_hex(p) for p in misses]
+        for path, hexsig in zip(misses, computed):
+            cache.put(digests[path], "dedupe.minhash", version, hexsig, context)
+            signatures[path] = np.frombuffer(bytes.fromhex(hexsig), dtype=np.uint64)
+        missing = sum(1 for sig in signatures.values() if sig is None)
+        print(f"minhash_signatures={len(paths)} cached={len(paths) - len(misses) - missing} "
+              f"computed={len(misses)} unreadable={missing}")
+    return signatures
+
+
+def near_duplicate_clusters(files: Dict[str, str], threshold: float,
+                            jobs: int = 0) -> List[List[Tuple[str, float]]]:
+    """Clusters of near-duplicate documents as [(display path, similarity to the primary)].
+
+    ``files`` maps the display path used in the reports to the file on disk.
+    """
+    from minhash import LSHIndex, bands_for, clusters, similarity
+
+    sigs = compute_signatures(list(files.values()), jobs)
+    keys = [k for k, p in files.items() if sigs.get(p) is not None]
+    index = LSHIndex(bands_for(threshold))
+    for key in keys:
+        index.add(key, sigs[files[key]])
+    pairs = index.candidate_pairs()
+    edges = [(a, b) for a, b in pairs if similarity(sigs[files[a]], sigs[files[b]]) >= threshold]
+    print(f"lsh_candidate_pairs={len(pairs)} similar_pairs={len(edges)}")
+
+    result = []
+    for members in clusters(keys, edges):
+        primary = choose_primary(members)
+        ordered = [primary] + [m for m in members if m != primary]
+        result.append([(m, similarity(sigs[files[primary]], sigs[files[m]])) for m in ordered])
+    return result
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Write the dedupe plan for the files in priority.csv")
+    parser.add_argument("--near", action="store_true", help="also cluster near-duplicate content (MinHash/LSH)")
+    parser.add_argument("--threshold", type=float, default=0.8, help="estimated Jaccard similarity for --near (default 0.8)")
+    parser.add_argument("--roots", nargs="+", help="use every .md under these dirs instead of priority.csv")
+    parser.add_argument("--jobs", type=int, default=0, help="worker processes for signatures (default: CPU count)")
+    args = parser.parse_args()
+
     repo_root = Path.cwd()
     reports = repo_root / ".reports"
     priority_csv = reports / "priority.csv"
-    if not priority_csv.exists():
-        raise SystemExit("priority.csv not found. Run pg_content_scan first.")
+    if args.roots:
+        from file_index import FileIndex
+        index = FileIndex(repo_root, None)
+        index.build()
+        paths = []
+        for root in args.roots:
+            paths.extend(os.path.relpath(p, repo_root).replace(os.sep, "/")
+                         for p in index.files_under(Path(root).resolve()))
+        paths = sorted(set(paths))
+    else:
+        if not priority_csv.exists():
+            raise SystemExit("priority.csv not found. Run pg_content_scan first.")
+        paths = []
+        with priority_csv.open("r", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                path = row["file"].strip()
+                if not path or not path.endswith(".md"):
+                    continue
+                paths.append(path)
 
     groups: dict[str, list[str]] = {}
-    with priority_csv.open("r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            path = row["file"].strip()
-            if not path or not path.endswith(".md"):
-                continue
-            stem = Path(path).stem
-            key = normalize_key(stem)
-            groups.setdefault(key, []).append(path)
+    for path in paths:
+        stem = _posix(path).stem
+        key = normalize_key(stem)
+        groups.setdefault(key, []).append(path)
+
+    near = []
+    if args.near:
+        files = {p: str(repo_root / _posix(p)) for p in dict.fromkeys(paths)}
+        near = near_duplicate_clusters(files, args.threshold, args.jobs)
+        clusters_path = reports / "dedupe_clusters.csv"
+        with clusters_path.open("w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["cluster", "file", "primary_file", "est_jaccard"])
+            for i, members in enumerate(near, 1):
+                for path, sim in members:
+                    writer.writerow([i, path, members[0][0], f"{sim:.3f}"])
+        print(f"dedupe_clusters_written={clusters_path} clusters={len(near)}")
 
     out_path = reports / "dedupe_plan.csv"
     with out_path.open("w", encoding="utf-8", newline="") as f:
         writer = csv.writer(f)
         writer.writerow(["topic_group", "primary_file", "archive_candidates"])
+        name_groups = []
         for key, files in sorted(groups.items(), key=lambda kv: kv[0]):
             if len(files) <= 1:
                 continue
+            name_groups.append(set(files))
             primary = choose_primary(files)
             archives = [p for p in files if p != primary]
             writer.writerow([key, primary, " | ".join(archives)])
+        for members in near:
+            paths_in = {p for p, _ in members}
+            if any(paths_in <= g for g in name_groups):
+                continue
+            primary = members[0][0]
+            writer.writerow([f"near:{normalize_key(_posix(primary).stem)}", primary,
+                             " | ".join(p for p, _ in members[1:])])
 
     print(f"dedupe_plan_written={out_path}")
 
 
 if __name__ == "__main__":
     main()
-
-
@@ -0,0 +1,211 @@
+"""Single-pass markdown tokenizer for the heading/TOC tools.
+
+``tokenize(text)`` walks a document once and returns its front matter, fenced
+code blocks, ATX headings, inline links/images and math spans. Every token has
+character offsets and a 1-based line number. Nothing inside front matter or a
+fenced code block is reported as a heading, link or math span. Links and math
+are scanned on first access, so callers that only need headings skip that work.
+``tools/bench_md_tokens.py`` times the tokenizer against the loops it replaced.
+
+Fences follow CommonMark, with one exception. A line whose stripped text starts
+with three or more backticks or tildes opens a block. A line of the same
+character, at least as long and with nothing after it, closes the block. An
+unclosed block runs to the end of the document. The exception is indentation,
+which is not limited to three spaces, because fenced blocks inside list items
+are common in this repository.
+
+Headings keep the rule the tools already shared: ``#{1,6}``, whitespace, then
+text, matched on the stripped line. ``Heading.indent`` holds the leading
+whitespace, so tools that ignore indented lines can still filter them out.
+"""
+
+import functools
+import re
+from typing import List, NamedTuple, Optional, Set
+
+
+class Heading(NamedTuple):
+    level: int
+    text: str
+    line: int
+    start: int
+    end: int
+    raw: str
+    indent: str
+
+
+class Fence(NamedTuple):
+    marker: str
+    info: str
+    line: int
+    end_line: int
+    start: int
+    end: int
+    closed: bool
+
+
+class Link(NamedTuple):
+    text: str
+    url: str
+    line: int
+    start: int
+    end: int
+    image: bool
+
+
+class MathSpan(NamedTuple):
+    body: str
+    line: int
+    start: int
+    end: int
+    block: bool
+
+
+class FrontMatter(NamedTuple):
+    body: str
+    start: int
+    end: int
+    end_line: int
+
+
+class MarkdownTokens:
+    """Front matter, fences and headings are found by ``tokenize``; links and math
+    are scanned on first access, over the same unfenced segments."""
+
+    def __init__(self, text: str, front_matter: Optional[FrontMatter], fences: List[Fence],
+                 headings: List[Heading], body_start: int):
+        self.text = text
+        self.front_matter = front_matter
+        self.fences = fences
+        self.headings = headings
+        self._body_start = body_start
+        self._links: Optional[List[Link]] = None
+        self._math: Optional[List[MathSpan]] = None
+
+    @property
+    def links(self) -> List[Link]:
+        if self._links is None:
+            self._scan_inline()
+        return self._links
+
+    @property
+    def math(self) -> List[MathSpan]:
+        if self._math is None:
+            self._scan_inline()
+        return self._math
+
+    def fenced_lines(self) -> Set[int]:
+        """Line numbers covered by fenced code blocks, marker lines included."""
+        lines: Set[int] = set()
+        for fence in self.fences:
+            lines.update(range(fence.line, fence.end_line + 1))
+        return lines
+
+    def _scan_inline(self) -> None:
+        text = self.text
+        links: List[Link] = []
+        math: List[MathSpan] = []
+        line, counted_to = 1, 0
+        segment_start = self._body_start
+        bounds = [(f.start, f.end) for f in self.fences] + [(len(text), len(text))]
+        for segment_end, next_start in bounds:
+            for m in INLINE_RE.finditer(text, segment_start, segment_end):
+                kind = m.lastgroup
+                if kind == "code":
+                    continue
+                start = m.start()
+                line += text.count("\n", counted_to, start)
+                counted_to = start
+                if kind == "link":
+                    links.append(Link(m.group("link_text"), m.group("url"), line, start, m.end(),
+                                      m.group("image") is not None))
+                else:
+                    block = kind == "block_math"
+                    body = m.group("block_body" if block else "inline_body")
+                    math.append(MathSpan(body, line, start, m.end(), block))
+            segment_start = next_start
+        self._links, self._math = links, math
+
+
+FRONT_MATTER_RE = re.compile(r"\ufeff?---[^\S\n]*\n(?:(.*?)\n)??(?:---|\.\.\.)[^\S\n]*(?:\n|\Z)", re.DOTALL)
+
+# Block-level candidates: lines whose stripped text starts with a fence marker
+# or '#'. Matching from the preceding newline gives the regex engine a literal
+# to search for; the first line of the body is tried separately.
+LINE_TOKEN_RE = re.compile(r"\n[^\S\n]*(?:(?P<fence>`{3,}|~{3,})|(?P<heading>#))")
+FIRST_LINE_TOKEN_RE = re.compile(r"[^\S\n]*(?:(?P<fence>`{3,}|~{3,})|(?P<heading>#))")
+HEADING_LINE_RE = re.compile(r"(#{1,6})\s+(.+)$")
+
+# Inline tokens outside fences. Code spans are matched only so that links and
+# math inside them are skipped; the lookahead lets the engine jump between
+# candidate characters.
+INLINE_RE = re.compile(
+    r"(?=[`!\[$])(?:"
+    r"(?P<code>(?P<ticks>`+)(?!`)[^\n]*?(?<!`)(?P=ticks)(?!`))"
+    r"|(?P<link>(?P<image>!)?\[(?P<link_text>[^\]\n]*)\]\((?P<url>[^)\n]*)\))"
+    r"|(?P<block_math>\$\$(?P<block_body>[^$]+)\$\$)"
+    r"|(?P<inline_math>\$(?P<inline_body>[^$\n]+)\$))"
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _closing_fence_re(char: str, length: int):
+    return re.compile(r"^[^\S\n]*" + re.escape(char) + "{%d,}[^\S\n]*$" % length, re.MULTILINE)
+
+
+def tokenize(text: str) -> MarkdownTokens:
+    fences: List[Fence] = []
+    headings: List[Heading] = []
+
+    front_matter = None
+    fm = FRONT_MATTER_RE.match(text)
+    pos = fm.end() if fm else 0
+    # Line numbers are counted incrementally, in C, between tokens
+    line, counted_to = 1, 0
+    if fm:
+        line = 1 + text.count("\n", 0, pos - 1)
+        counted_to = pos - 1
+        front_matter = FrontMatter(fm.group(1) or "", 0, pos, line)
+
+    m = FIRST_LINE_TOKEN_RE.match(text, pos)
+    line_start = pos
+    search = LINE_TOKEN_RE.search
+    while True:
+        if m is None:
+            m = search(text, pos)
+            if m is None:
+                break
+            line_start = m.start() + 1
+        line += text.count("\n", counted_to, line_start)
+        counted_to = line_start
+        line_end = text.find("\n", m.end())
+        line_end = len(text) if line_end == -1 else line_end
+        marker = m.group("fence")
+        if marker is not None:
+            info = text[m.end():line_end].strip()
+            if marker[0] == "`" and "`" in info:
+                # Not a fence: backtick info strings cannot contain backticks
+                pos, m = line_end, None
+                continue
+            closer = _closing_fence_re(marker[0], len(marker)).search(text, line_end)
+            if closer and closer.start() > line_end:
+                end, closed = closer.end(), True
+                end_line_start = closer.start()
+            else:
+                end, closed = len(text), False
+                end_line_start = max(text.rfind("\n", line_start, max(end - 1, line_start)) + 1, line_start)
+            end_line = line + text.count("\n", line_start, end_line_start)
+            fences.append(Fence(marker, info, line, end_line, line_start, end, closed))
+            line, counted_to = end_line, end_line_start
+            pos = end
+        else:
+            raw = text[line_start:line_end]
+            hm = HEADING_LINE_RE.match(raw.strip())
+            if hm:
+                stripped = raw.lstrip()
+                headings.append(Heading(len(hm.group(1)), hm.group(2).strip(), line,
+                                        line_start, line_end, raw, raw[:len(raw) - len(stripped)]))
+            pos = line_end
+        m = None
+
+    return MarkdownTokens(text, front_matter, fences, headings, fm.end() if fm else 0)
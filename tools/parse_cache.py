@@ -0,0 +1,182 @@
+"""Persistent content-hash keyed cache shared by the markdown quality checkers.
+
+Entries are keyed by (content digest, namespace, version, context):
+
+- namespace names the parser or checker (e.g. ``enhanced.content``, ``quality_checker.parse``)
+- version changes whenever the parser/checker rules change (see ``source_version``)
+- context carries anything else the result depends on (file path, corpus fingerprint)
+
+A ``files`` table maps (path, size, mtime_ns) to the last seen digest so that
+unchanged files are not even re-read or re-hashed.
+
+Namespaces starting with ``fragment.`` are keyed by the digest of a piece of a
+file (one code block, say) that many files can share. ``prune`` keeps them;
+``prune_versions`` drops the entries older checker versions left behind.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Iterable, Optional, Tuple
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CACHE_PATH = REPO_ROOT / ".reports" / "parse_cache.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    digest TEXT NOT NULL,
+    namespace TEXT NOT NULL,
+    version TEXT NOT NULL,
+    context TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (digest, namespace, version, context)
+) WITHOUT ROWID;
+"""
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def decode_text(data: bytes) -> str:
+    # Same result as open(path, "r", encoding="utf-8"): strict decode + universal newlines
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+@functools.lru_cache(maxsize=None)
+def source_version(*objs: Any) -> str:
+    """Version string derived from the source code of the given classes/functions.
+
+    Editing a checker's rules therefore invalidates its cached results without
+    anyone having to remember to bump a constant.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    for obj in objs:
+        try:
+            h.update(inspect.getsource(obj).encode("utf-8"))
+        except (OSError, TypeError):
+            h.update(getattr(obj, "__qualname__", repr(obj)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def fingerprint(items: Iterable[str]) -> str:
+    h = hashlib.blake2b(digest_size=8)
+    for item in sorted(items):
+        h.update(item.encode("utf-8", "surrogateescape"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ParseCache:
+    """SQLite backed cache; writes are batched and flushed on ``commit``/``close``."""
+
+    def __init__(self, path: Path = CACHE_PATH, batch_size: int = 500):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.batch_size = batch_size
+        self._pending = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self) -> "ParseCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # --- file digests -------------------------------------------------------
+
+    def file_digest(self, file_path: str) -> Tuple[str, Optional[bytes]]:
+        """Return (digest, raw bytes or None).
+
+        Bytes are only returned when the file actually had to be read; callers
+        that hit the result cache never need the content.
+        """
+        key = os.path.abspath(file_path)
+        st = os.stat(key)
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, digest FROM files WHERE path = ?", (key,)
+        ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2], None
+        with open(key, "rb") as f:
+            data = f.read()
+        digest = content_hash(data)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+            (key, st.st_size, st.st_mtime_ns, digest),
+        )
+        self._wrote()
+        return digest, data
+
+    def read_text(self, file_path: str) -> Tuple[str, str]:
+        """Read a file as text, returning (content, digest)."""
+        digest, data = self.file_digest(file_path)
+        if data is None:
+            with open(file_path, "rb") as f:
+                data = f.read()
+        return decode_text(data), digest
+
+    # --- entries ------------------------------------------------------------
+
+    def get(self, digest: str, namespace: str, version: str, context: str = "") -> Optional[Any]:
+        row = self.conn.execute(
+            "SELECT payload FROM entries WHERE digest = ? AND namespace = ? AND version = ? AND context = ?",
+            (digest, namespace, version, context),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, digest: str, namespace: str, version: str, value: Any, context: str = "") -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (digest, namespace, version, context, payload) VALUES (?, ?, ?, ?, ?)",
+            (digest, namespace, version, context, json.dumps(value, ensure_ascii=False)),
+        )
+        self._wrote()
+
+    def prune(self) -> int:
+        """Drop entries whose digest no longer belongs to any known file (fragments excepted)."""
+        missing = [p for (p,) in self.conn.execute("SELECT path FROM files") if not os.path.exists(p)]
+        self.conn.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in missing))
+        cur = self.conn.execute(
+            "DELETE FROM entries WHERE digest NOT IN (SELECT digest FROM files) AND namespace NOT LIKE 'fragment.%'"
+        )
+        self.commit()
+        return cur.rowcount
+
+    def prune_versions(self, namespace: str, version: str) -> int:
+        """Drop entries of ``namespace`` that other versions of its producer wrote."""
+        cur = self.conn.execute("DELETE FROM entries WHERE namespace = ? AND version != ?", (namespace, version))
+        self.commit()
+        return cur.rowcount
+
+    def _wrote(self) -> None:
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.commit()
+
+    def commit(self) -> None:
+        self.conn.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        self.commit()
+        self.conn.close()
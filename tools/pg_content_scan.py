@@ -1,6 +1,37 @@
+import argparse
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+
+DEFAULT_ROOT = "Analysis/1-数据库系统/1.1-PostgreSQL"
+ALL_ROOTS = ["Analysis", "Matter", "Design", "Sql", "Sqlite"]
+
+# All line patterns fused into one alternation; each hit is attributed to its
+# line, so a line is reported at most once per category (same as the old
+# per-line re.search). The leading lookahead lists every character a hit can
+# start with, which lets the regex engine skip ahead with a fast charset scan.
+# Front matter lines (optionally BOM-prefixed) are matched from the preceding
+# newline so whitespace stays out of that set; the first line is checked on its own.
+SCAN_RE = re.compile(
+    r"(?=[#`TtFf待占完后扩增重归\n])(?:"
+    r"(?P<heading>^#)"
+    r"|(?P<codeblock>```)"
+    r"|(?P<todo>TODO|待办|占位|TBD|FIXME|完善|后续补充)"
+    r"|(?P<dup>扩充版|增强版|重复内容|归档)"
+    r"|(?P<frontmatter>\n\ufeff*[^\S\n]*---[^\S\n]*$))",
+    re.IGNORECASE | re.MULTILINE,
+)
+FIRST_LINE_FRONT_MATTER_RE = re.compile(r"\ufeff*[^\S\n]*---[^\S\n]*$", re.MULTILINE)
+MD_ONLY = ("heading", "codeblock", "frontmatter")
+REPORT_FILES = {
+    "heading": "headings.txt",
+    "todo": "todos.txt",
+    "dup": "duplicates.txt",
+    "codeblock": "codeblocks.txt",
+}
 
 
 def ensure_dir(path: Path) -> None:
@@ -13,109 +44,159 @@ def iter_files(root: Path):
             yield Path(dirpath) / name
 
 
-def scan_directory(root: Path, reports_dir: Path) -> None:
-    ensure_dir(reports_dir)
-
-    headings_re = re.compile(r"^(#|##|###)")
-    todos_re = re.compile(r"(TODO|待办|占位|TBD|FIXME|完善|后续补充)", re.IGNORECASE)
-    dup_re = re.compile(r"(扩充版|增强版|重复内容|归档)", re.IGNORECASE)
-    codeblock_re = re.compile(r"```")
-    front_matter_re = re.compile(r"^\s*---\s*$")
-
-    headings_lines = []
-    todos_lines = []
-    dup_lines = []
-    codeblock_lines = []
-    with_frontmatter = []
-    missing_frontmatter = []
-
-    # per-file counters
-    todos_counts = {}
-    dup_counts = {}
-
-    for fp in iter_files(root):
-        rel = fp.relative_to(Path.cwd()) if fp.is_absolute() else fp
-        is_md = fp.suffix.lower() == ".md"
-        try:
-            with fp.open("r", encoding="utf-8", errors="ignore") as f:
-                lines = f.readlines()
-        except Exception:
-            # Skip unreadable files
+def scan_file(fp: Path) -> Optional[dict]:
+    """Hits of one file: {"rel", "is_md", "lines": {category: [report line, ...]}, "frontmatter"}."""
+    rel = fp.relative_to(Path.cwd()) if fp.is_absolute() else fp
+    is_md = fp.suffix.lower() == ".md"
+    try:
+        with fp.open("r", encoding="utf-8", errors="ignore") as f:
+            content = f.read()
+    except Exception:
+        # Skip unreadable files
+        return None
+
+    lines: Dict[str, List[str]] = {name: [] for name in REPORT_FILES}
+    seen = {name: 0 for name in REPORT_FILES}
+    frontmatter = is_md and FIRST_LINE_FRONT_MATTER_RE.match(content) is not None
+    # Line numbers are counted incrementally between hits
+    line_no, counted_to = 1, 0
+    for m in SCAN_RE.finditer(content):
+        kind = m.lastgroup
+        if kind in MD_ONLY and not is_md:
+            continue
+        if kind == "frontmatter":
+            frontmatter = True
             continue
+        start = m.start()
+        line_no += content.count("\n", counted_to, start)
+        counted_to = start
+        if seen[kind] == line_no:
+            continue
+        seen[kind] = line_no
+        line_start = content.rfind("\n", 0, start) + 1
+        line_end = content.find("\n", start)
+        text = content[line_start:line_end if line_end != -1 else len(content)].rstrip()
+        lines[kind].append(f"{rel}:{line_no}:{text}\n")
+    return {"rel": str(rel), "is_md": is_md, "lines": lines, "frontmatter": frontmatter}
+
 
-        # headings & codeblocks only for md
-        if is_md:
-            for idx, line in enumerate(lines, start=1):
-                if headings_re.search(line):
-                    headings_lines.append(f"{rel}:{idx}:{line.rstrip()}\n")
-                if codeblock_re.search(line):
-                    codeblock_lines.append(f"{rel}:{idx}:{line.rstrip()}\n")
-
-            # front matter presence: allow anywhere, strip BOM if present
-            if any(front_matter_re.search(l.lstrip('\ufeff')) for l in lines):
-                with_frontmatter.append(str(rel) + "\n")
-            else:
-                missing_frontmatter.append(str(rel) + "\n")
-
-        # todos and duplicates for all text files under root
-        for idx, line in enumerate(lines, start=1):
-            if todos_re.search(line):
-                todos_lines.append(f"{rel}:{idx}:{line.rstrip()}\n")
-                todos_counts[str(rel)] = todos_counts.get(str(rel), 0) + 1
-            if dup_re.search(line):
-                dup_lines.append(f"{rel}:{idx}:{line.rstrip()}\n")
-                dup_counts[str(rel)] = dup_counts.get(str(rel), 0) + 1
-
-    # Write reports
-    (reports_dir / "pg_headings.txt").write_text("".join(headings_lines), encoding="utf-8")
-    (reports_dir / "pg_todos.txt").write_text("".join(todos_lines), encoding="utf-8")
-    (reports_dir / "pg_duplicates.txt").write_text("".join(dup_lines), encoding="utf-8")
-    (reports_dir / "pg_codeblocks.txt").write_text("".join(codeblock_lines), encoding="utf-8")
-    (reports_dir / "pg_with_frontmatter.txt").write_text("".join(with_frontmatter), encoding="utf-8")
-    (reports_dir / "pg_missing_frontmatter.txt").write_text("".join(missing_frontmatter), encoding="utf-8")
+def scan_shard(paths: List[str]) -> List[dict]:
+    return [r for r in (scan_file(Path(p)) for p in paths) if r is not None]
+
+
+def plan_shards(files: List[Path], jobs: int, shards_per_job: int = 8) -> List[List[str]]:
+    """Contiguous shards of roughly equal byte size, so output keeps walk order."""
+    sizes = []
+    for fp in files:
+        try:
+            sizes.append(fp.stat().st_size)
+        except OSError:
+            sizes.append(0)
+    target = max(1, sum(sizes) // max(1, jobs * shards_per_job))
+    shards, current, current_size = [], [], 0
+    for fp, size in zip(files, sizes):
+        current.append(str(fp))
+        current_size += size
+        if current_size >= target:
+            shards.append(current)
+            current, current_size = [], 0
+    if current:
+        shards.append(current)
+    return shards
+
+
+def scan_roots(roots: Sequence[Path], reports_dir: Path, jobs: int = 1, prefix: str = "pg_") -> Dict[str, int]:
+    """Scan every file under ``roots`` and stream hits into ``reports_dir``; returns the summary counts."""
+    ensure_dir(reports_dir)
+    files = [fp for root in roots for fp in iter_files(root)]
+    shards = plan_shards(files, jobs)
+
+    outputs = {kind: (reports_dir / f"{prefix}{name}").open("w", encoding="utf-8")
+               for kind, name in REPORT_FILES.items()}
+    with_fm_out = (reports_dir / f"{prefix}with_frontmatter.txt").open("w", encoding="utf-8")
+    missing_fm_out = (reports_dir / f"{prefix}missing_frontmatter.txt").open("w", encoding="utf-8")
+    totals = {kind: 0 for kind in REPORT_FILES}
+    todos_counts: Dict[str, int] = {}
+    dup_counts: Dict[str, int] = {}
+    frontmatter: Dict[str, bool] = {}
+
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 and len(shards) > 1 else None
+    try:
+        # map() yields shards in submission order, so reports keep walk order
+        results = executor.map(scan_shard, shards) if executor else map(scan_shard, shards)
+        for shard_results in results:
+            for r in shard_results:
+                for kind, hits in r["lines"].items():
+                    if hits:
+                        outputs[kind].writelines(hits)
+                        totals[kind] += len(hits)
+                if r["lines"]["todo"]:
+                    todos_counts[r["rel"]] = len(r["lines"]["todo"])
+                if r["lines"]["dup"]:
+                    dup_counts[r["rel"]] = len(r["lines"]["dup"])
+                if r["is_md"]:
+                    frontmatter[r["rel"]] = r["frontmatter"]
+                    (with_fm_out if r["frontmatter"] else missing_fm_out).write(r["rel"] + "\n")
+    finally:
+        if executor:
+            executor.shutdown()
+        for f in list(outputs.values()) + [with_fm_out, missing_fm_out]:
+            f.close()
 
     # Top lists
     def write_top(counter: dict, out: Path, top_n: int = 50) -> None:
         items = sorted(counter.items(), key=lambda x: x[1], reverse=True)[:top_n]
         out.write_text("\n".join(f"{count} {path}" for path, count in items) + ("\n" if items else ""), encoding="utf-8")
 
-    write_top(todos_counts, reports_dir / "pg_top_todos.txt")
-    write_top(dup_counts, reports_dir / "pg_top_duplicates.txt")
+    write_top(todos_counts, reports_dir / f"{prefix}top_todos.txt")
+    write_top(dup_counts, reports_dir / f"{prefix}top_duplicates.txt")
 
     # Priority CSV: file,todo_count,dup_count,missing_frontmatter
-    all_files = set(todos_counts.keys()) | set(dup_counts.keys()) | set(with_frontmatter) | set(missing_frontmatter)
-    # normalize with_frontmatter/missing lists to paths only
-    with_fm_set = set(p.strip() for p in with_frontmatter)
-    missing_fm_set = set(p.strip() for p in missing_frontmatter)
+    all_files = set(todos_counts) | set(dup_counts) | set(frontmatter)
     rows = ["file,todo_count,dup_count,missing_frontmatter"]
     for path in sorted(all_files):
         todo_c = todos_counts.get(path, 0)
         dup_c = dup_counts.get(path, 0)
-        missing_flag = "yes" if path in missing_fm_set else ("no" if path in with_fm_set else "unknown")
+        missing_flag = "unknown" if path not in frontmatter else ("no" if frontmatter[path] else "yes")
         rows.append(f"{path},{todo_c},{dup_c},{missing_flag}")
     (reports_dir / "priority.csv").write_text("\n".join(rows) + "\n", encoding="utf-8")
 
     # Summary
-    def count_lines(p: Path) -> int:
-        try:
-            return sum(1 for _ in p.open("r", encoding="utf-8", errors="ignore"))
-        except FileNotFoundError:
-            return 0
-
-    summary = []
-    summary.append(f"headings_total_lines={count_lines(reports_dir / 'pg_headings.txt')}")
-    summary.append(f"todos_total_lines={count_lines(reports_dir / 'pg_todos.txt')}")
-    summary.append(f"duplicates_total_lines={count_lines(reports_dir / 'pg_duplicates.txt')}")
-    summary.append(f"codeblocks_total_lines={count_lines(reports_dir / 'pg_codeblocks.txt')}")
-    summary.append(f"with_frontmatter_files={count_lines(reports_dir / 'pg_with_frontmatter.txt')}")
-    summary.append(f"missing_frontmatter_files={count_lines(reports_dir / 'pg_missing_frontmatter.txt')}")
-    (reports_dir / "summary.txt").write_text("\n".join(summary) + "\n", encoding="utf-8")
+    summary = {
+        "headings_total_lines": totals["heading"],
+        "todos_total_lines": totals["todo"],
+        "duplicates_total_lines": totals["dup"],
+        "codeblocks_total_lines": totals["codeblock"],
+        "with_frontmatter_files": sum(1 for v in frontmatter.values() if v),
+        "missing_frontmatter_files": sum(1 for v in frontmatter.values() if not v),
+    }
+    (reports_dir / "summary.txt").write_text("\n".join(f"{k}={v}" for k, v in summary.items()) + "\n", encoding="utf-8")
+    return summary
+
+
+def scan_directory(root: Path, reports_dir: Path, jobs: int = 1) -> None:
+    scan_roots([root], reports_dir, jobs=jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan markdown trees for headings, TODOs, duplicate markers, "
+                                                 "code fences and front matter")
+    parser.add_argument("roots", nargs="*", help=f"directories to scan (default: {DEFAULT_ROOT})")
+    parser.add_argument("--all", action="store_true", help=f"scan {', '.join(ALL_ROOTS)}")
+    parser.add_argument("--reports", default=".reports", help="output directory")
+    parser.add_argument("--prefix", default="pg_", help="report file name prefix")
+    parser.add_argument("--jobs", type=int, default=0, help="worker processes (0 = all CPUs)")
+    args = parser.parse_args()
 
-
-if __name__ == "__main__":
     repo_root = Path.cwd()
-    target_root = repo_root / "Analysis/1-数据库系统/1.1-PostgreSQL"
-    reports = repo_root / ".reports"
-    scan_directory(target_root, reports)
+    if args.all:
+        roots = [repo_root / r for r in ALL_ROOTS if (repo_root / r).is_dir()]
+    else:
+        roots = [repo_root / r for r in (args.roots or [DEFAULT_ROOT])]
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    summary = scan_roots(roots, repo_root / args.reports, jobs=jobs, prefix=args.prefix)
+    print(" ".join(f"{k}={v}" for k, v in summary.items()))
 
 
+if __name__ == "__main__":
+    main()
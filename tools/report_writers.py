@@ -0,0 +1,264 @@
+"""Streaming report writers for the quality checkers.
+
+Writers receive one document at a time and write it out straight away, so
+memory stays flat however large the corpus is. Output is flushed as it goes,
+which keeps a report readable even if a long run is interrupted.
+
+- ``JsonlWriter``: one JSON object per document, plus a final ``{"summary": ...}`` line
+- ``ShardedHtmlWriter``: fixed-size HTML pages and an index page. The index is
+  rewritten after every finished page, with the summary so far and the
+  lowest-scoring documents.
+- ``TextSummaryWriter``: one line per document, then the totals
+
+``ScoreSketch`` summarises one score across all documents in constant memory:
+count, mean, standard deviation, min/max and quantiles.
+
+The checker-specific rendering (which fields, which wording) stays with each checker.
+"""
+
+import heapq
+import html
+import json
+import math
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class ReportStats:
+    """Running totals plus the ``keep`` lowest-scoring documents."""
+
+    def __init__(self, keep: int = 20):
+        self.keep = keep
+        self.documents = 0
+        self.score_sum = 0.0
+        self.issues = 0
+        self.severities: Counter = Counter()
+        self._lowest: List[Tuple[float, int, str, Optional[str]]] = []
+
+    def add(self, label: str, score: float, severities: Iterable[str], href: Optional[str] = None) -> None:
+        severities = list(severities)
+        self.documents += 1
+        self.score_sum += score
+        self.issues += len(severities)
+        self.severities.update(severities)
+        # Max-heap on score (negated) holding the lowest ``keep`` documents
+        item = (-score, self.documents, label, href)
+        if len(self._lowest) < self.keep:
+            heapq.heappush(self._lowest, item)
+        elif item > self._lowest[0]:
+            heapq.heapreplace(self._lowest, item)
+
+    @property
+    def average(self) -> float:
+        return self.score_sum / self.documents if self.documents else 0.0
+
+    def lowest(self) -> List[Tuple[float, str, Optional[str]]]:
+        """(score, label, href), lowest score first."""
+        return [(-s, label, href) for s, _, label, href in sorted(self._lowest, reverse=True)]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'documents': self.documents,
+            'average_score': self.average,
+            'total_issues': self.issues,
+            'issues_by_severity': dict(self.severities),
+            'lowest': [{'file_path': label, 'score': score} for score, label, _ in self.lowest()],
+        }
+
+
+class ScoreSketch:
+    """Running moments plus a fixed-width histogram of a score bounded to ``[lo, hi]``.
+
+    Quantiles are exact up to the bin width ((hi - lo) / bins). Scores outside the
+    range go into the first or last bin, but min/max keep the real values. Bin
+    edges fall on round scores (9.0, 8.0, ...) so ``count_between`` is exact for
+    the usual report ranges.
+    """
+
+    def __init__(self, lo: float = 0.0, hi: float = 10.0, bins: int = 1000):
+        self.lo = lo
+        self.hi = hi
+        self.bins = [0] * bins
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _bin(self, value: float) -> int:
+        n = len(self.bins)
+        return min(n - 1, max(0, int(n * (value - self.lo) / (self.hi - self.lo))))
+
+    def add(self, value: float) -> None:
+        self.bins[self._bin(value)] += 1
+        # Welford's update keeps the variance numerically stable over long runs
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Midpoint of the bin holding the q-quantile, clamped to the observed min/max."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        width = (self.hi - self.lo) / len(self.bins)
+        seen = 0
+        for i, n in enumerate(self.bins):
+            seen += n
+            if seen >= rank:
+                return min(self.max, max(self.min, self.lo + (i + 0.5) * width))
+        return self.max
+
+    def count_between(self, lo: float, hi: float = math.inf) -> int:
+        """Number of scores in ``[lo, hi)``."""
+        start = self._bin(lo) if lo > self.lo else 0
+        end = self._bin(hi) if hi <= self.hi else len(self.bins)
+        return sum(self.bins[start:end])
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'stdev': self.stdev,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'p10': self.quantile(0.1),
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+        }
+
+
+class JsonlWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, 'w', encoding='utf-8')
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._f.write(json.dumps(record, ensure_ascii=False))
+        self._f.write('\n')
+        self._f.flush()
+
+    def close(self, summary: Dict[str, Any]) -> None:
+        self.write({'summary': summary})
+        self._f.close()
+
+
+class ShardedHtmlWriter:
+    """``<output>`` is the index page; pages go to ``<output stem>_pages/page-NNNN.html``.
+
+    Pages left by an earlier run are deleted on open, so a partial or shorter
+    report never serves an older run's pages.
+    """
+
+    def __init__(self, path: str, title: str, style: str, stats: ReportStats, page_size: int = 200):
+        self.index_path = Path(path)
+        self.pages_dir = self.index_path.with_name(self.index_path.stem + '_pages')
+        self.pages_dir.mkdir(parents=True, exist_ok=True)
+        for stale in self.pages_dir.glob('page-*.html'):
+            stale.unlink()
+        self.title = title
+        self.style = style
+        self.stats = stats
+        self.page_size = page_size
+        self.pages: List[Tuple[str, int, str, str]] = []  # (file name, count, first label, last label)
+        self._page = None
+        self._page_count = 0
+        self._written = 0
+        self._first_label = ''
+        self._last_label = ''
+
+    def _head(self, title: str) -> str:
+        return (f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>{html.escape(title)}</title>\n'
+                f'<style>{self.style}</style>\n</head>\n<body>\n')
+
+    def write(self, fragment: str, label: str) -> str:
+        """Append one document's HTML; returns its link relative to the index page."""
+        # A full page is closed on the next write, once the caller has counted its last document
+        if self._page is not None and self._page_count >= self.page_size:
+            self._finish_page()
+        if self._page is None:
+            name = f'page-{len(self.pages) + 1:04d}.html'
+            self._page_name = name
+            self._page = open(self.pages_dir / name, 'w', encoding='utf-8')
+            self._page.write(self._head(f'{self.title} - {name}'))
+            self._page.write(f'<p><a href="../{html.escape(self.index_path.name)}">返回索引</a></p>\n')
+            self._page_count = 0
+            self._first_label = label
+        self._written += 1
+        anchor = f'doc-{self._written}'
+        self._page.write(f'<div id="{anchor}">\n{fragment}\n</div>\n')
+        self._page.flush()
+        self._page_count += 1
+        self._last_label = label
+        return f'{self.pages_dir.name}/{self._page_name}#{anchor}'
+
+    def _finish_page(self) -> None:
+        if self._page is None:
+            return
+        self._page.write('</body></html>\n')
+        self._page.close()
+        self._page = None
+        self.pages.append((self._page_name, self._page_count, self._first_label, self._last_label))
+        self._write_index(complete=False)
+
+    def _write_index(self, complete: bool, summary_html: str = '', extra_html: str = '') -> None:
+        parts = [self._head(self.title), f'<h1>{html.escape(self.title)}</h1>\n']
+        if not complete:
+            parts.append('<p><em>检查仍在进行中，以下为已完成部分</em></p>\n')
+        parts.append(summary_html or (
+            f'<p>检查文档数: {self.stats.documents}</p>\n<p>平均分数: {self.stats.average:.2f}</p>\n'
+            f'<p>总问题数: {self.stats.issues}</p>\n'))
+        lowest = self.stats.lowest()
+        if lowest:
+            parts.append('<h2>分数最低的文档</h2>\n<ol>\n')
+            for score, label, href in lowest:
+                parts.append(f'<li><a href="{html.escape(href or "")}">{html.escape(label)}</a> ({score:.2f})</li>\n')
+            parts.append('</ol>\n')
+        parts.append(extra_html)
+        parts.append('<h2>分页</h2>\n<ul>\n')
+        for name, count, first, last in self.pages:
+            parts.append(f'<li><a href="{self.pages_dir.name}/{name}">{name}</a> '
+                         f'({count} 篇: {html.escape(first)} … {html.escape(last)})</li>\n')
+        parts.append('</ul>\n</body></html>\n')
+        tmp = self.index_path.with_name(self.index_path.name + '.tmp')
+        tmp.write_text(''.join(parts), encoding='utf-8')
+        os.replace(tmp, self.index_path)
+
+    def close(self, summary_html: str = '', extra_html: str = '') -> None:
+        """``extra_html`` goes between the lowest-scoring list and the page list (e.g. timing tables)."""
+        self._finish_page()
+        self._write_index(complete=True, summary_html=summary_html, extra_html=extra_html)
+
+
+class TextSummaryWriter:
+    def __init__(self, path: str, title: str):
+        self._f = open(path, 'w', encoding='utf-8')
+        self._f.write(f'{title}\n\n分数     问题数  文件\n')
+
+    def write(self, score: float, issue_count: int, label: str) -> None:
+        self._f.write(f'{score:7.2f}  {issue_count:6d}  {label}\n')
+        self._f.flush()
+
+    def close(self, stats: ReportStats, extra: str = '') -> None:
+        self._f.write('\n总体统计:\n')
+        self._f.write(f'- 检查文档数: {stats.documents}\n')
+        self._f.write(f'- 平均质量分数: {stats.average:.2f}\n')
+        self._f.write(f'- 总问题数: {stats.issues}\n')
+        for severity, count in stats.severities.most_common():
+            self._f.write(f'  - {severity}: {count}\n')
+        lowest = stats.lowest()
+        if lowest:
+            self._f.write('\n分数最低的文档:\n')
+            for score, label, _ in lowest:
+                self._f.write(f'- {score:.2f}  {label}\n')
+        self._f.write(extra)
+        self._f.close()
@@ -0,0 +1,297 @@
+"""SQLite history of quality-checker runs: one row per run, file score and issue.
+
+Checkers append their results to ``.reports/quality_results.sqlite`` instead of
+dumping whole result sets to JSON, so questions such as "worst 50 files under
+Matter/" or "link issues over the last 30 runs" are index lookups:
+
+- ``runs``: one row per checker run (tool, checked path, start/finish time)
+- ``files``: every path seen, interned once (repo-relative posix paths)
+- ``scores``: (run, file, metric, value); ``overall`` is one of the metrics
+- ``issues``: (run, file, line, type, severity, description, suggestion)
+
+Rows are inserted in batches with ``executemany`` on a WAL database, and a run
+is only listed as finished once ``finish_run`` has committed its last batch.
+
+``python tools/results_db.py runs|worst|trend|file|issues`` queries the history.
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from parse_cache import REPO_ROOT
+
+
+RESULTS_DB_PATH = REPO_ROOT / ".reports" / "quality_results.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    tool TEXT NOT NULL,
+    base_path TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS scores (
+    run_id INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, file_id, metric)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS issues (
+    run_id INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    description TEXT NOT NULL,
+    suggestion TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_tool ON runs (tool, started);
+CREATE INDEX IF NOT EXISTS scores_rank ON scores (run_id, metric, value);
+CREATE INDEX IF NOT EXISTS scores_file ON scores (file_id, metric, run_id);
+CREATE INDEX IF NOT EXISTS issues_run ON issues (run_id, type, severity);
+CREATE INDEX IF NOT EXISTS issues_file ON issues (file_id, run_id);
+"""
+
+
+def _rel(path: str) -> str:
+    full = os.path.normpath(os.path.abspath(path))
+    root = str(REPO_ROOT)
+    if full.startswith(root + os.sep):
+        return full[len(root) + 1:].replace(os.sep, "/")
+    return full.replace(os.sep, "/")
+
+
+def _prefix_bounds(prefix: str) -> Tuple[str, str]:
+    # A range instead of LIKE, where _ and % in directory names would act as wildcards
+    prefix = prefix.replace(os.sep, "/")
+    return prefix, prefix + "\U0010ffff"
+
+
+class ResultsDB:
+    """Append-only run history; writes are batched and flushed every ``batch_size`` files."""
+
+    def __init__(self, path: Path = RESULTS_DB_PATH, batch_size: int = 500):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.batch_size = batch_size
+        self._file_ids: Dict[str, int] = {}
+        self._scores: List[tuple] = []
+        self._issues: List[tuple] = []
+        self._pending = 0
+
+    def __enter__(self) -> "ResultsDB":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # --- writing ------------------------------------------------------------
+
+    def start_run(self, tool: str, base_path) -> int:
+        cur = self.conn.execute("INSERT INTO runs (tool, base_path, started) VALUES (?, ?, ?)",
+                                (tool, _rel(str(base_path)), time.time()))
+        self.conn.commit()
+        return cur.lastrowid
+
+    def _file_id(self, path: str) -> int:
+        rel = _rel(path)
+        file_id = self._file_ids.get(rel)
+        if file_id is None:
+            self.conn.execute("INSERT OR IGNORE INTO files (path) VALUES (?)", (rel,))
+            file_id = self.conn.execute("SELECT id FROM files WHERE path = ?", (rel,)).fetchone()[0]
+            self._file_ids[rel] = file_id
+        return file_id
+
+    def add(self, run_id: int, file_path: str, scores: Mapping[str, float],
+            issues: Iterable[Mapping[str, Any]]) -> None:
+        """Queue one file's scores and issues (dicts with the checkers' QualityIssue fields)."""
+        file_id = self._file_id(file_path)
+        self._scores.extend((run_id, file_id, metric, float(value)) for metric, value in scores.items())
+        self._issues.extend(
+            (run_id, file_id, int(issue.get("line_number") or 0), issue.get("issue_type", ""),
+             issue.get("severity", ""), issue.get("description", ""), issue.get("suggestion") or "")
+            for issue in issues
+        )
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self.conn.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?)", self._scores)
+        self.conn.executemany("INSERT INTO issues VALUES (?, ?, ?, ?, ?, ?, ?)", self._issues)
+        self.conn.commit()
+        self._scores, self._issues, self._pending = [], [], 0
+
+    def finish_run(self, run_id: int) -> None:
+        self.flush()
+        self.conn.execute("UPDATE runs SET finished = ? WHERE id = ?", (time.time(), run_id))
+        self.conn.commit()
+
+    def delete_run(self, run_id: int) -> None:
+        for table, column in (("scores", "run_id"), ("issues", "run_id"), ("runs", "id")):
+            self.conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (run_id,))
+        self.conn.commit()
+
+    # --- queries ------------------------------------------------------------
+
+    def runs(self, tool: Optional[str] = None, limit: int = 30) -> List[Dict[str, Any]]:
+        """Finished runs, newest first."""
+        sql = "SELECT id, tool, base_path, started, finished FROM runs WHERE finished IS NOT NULL"
+        params: list = []
+        if tool:
+            sql += " AND tool = ?"
+            params.append(tool)
+        rows = self.conn.execute(sql + " ORDER BY started DESC LIMIT ?", params + [limit]).fetchall()
+        return [dict(zip(("id", "tool", "base_path", "started", "finished"), r)) for r in rows]
+
+    def latest_run(self, tool: Optional[str] = None) -> Optional[int]:
+        runs = self.runs(tool, limit=1)
+        return runs[0]["id"] if runs else None
+
+    def worst(self, run_id: int, prefix: str = "", metric: str = "overall",
+              limit: int = 50) -> List[Tuple[str, float, int]]:
+        """Lowest ``metric`` values of one run, optionally under a path prefix: (path, value, issues)."""
+        low, high = _prefix_bounds(prefix)
+        rows = self.conn.execute(
+            "SELECT f.path, s.value, (SELECT count(*) FROM issues i WHERE i.file_id = s.file_id AND i.run_id = s.run_id) "
+            "FROM scores s JOIN files f ON f.id = s.file_id "
+            "WHERE s.run_id = ? AND s.metric = ? AND f.path >= ? AND f.path < ? "
+            "ORDER BY s.value, f.path LIMIT ?",
+            (run_id, metric, low, high, limit),
+        )
+        return rows.fetchall()
+
+    def trend(self, tool: Optional[str] = None, type_like: str = "%link%",
+              severity: Optional[str] = None, last: int = 30) -> List[Tuple[int, float, int]]:
+        """Issue counts per run, oldest first: (run id, started, count)."""
+        result = []
+        for run in reversed(self.runs(tool, limit=last)):
+            sql = "SELECT count(*) FROM issues WHERE run_id = ? AND type LIKE ?"
+            params = [run["id"], type_like]
+            if severity:
+                sql += " AND severity = ?"
+                params.append(severity)
+            result.append((run["id"], run["started"], self.conn.execute(sql, params).fetchone()[0]))
+        return result
+
+    def file_history(self, path: str, metric: str = "overall", last: int = 30,
+                     tool: Optional[str] = None) -> List[Tuple[int, float, float]]:
+        """A file's ``metric`` across runs, newest first: (run id, started, value)."""
+        return self.conn.execute(
+            "SELECT r.id, r.started, s.value FROM files f "
+            "JOIN scores s ON s.file_id = f.id AND s.metric = ? "
+            "JOIN runs r ON r.id = s.run_id "
+            "WHERE f.path = ? AND (? IS NULL OR r.tool = ?) ORDER BY s.run_id DESC LIMIT ?",
+            (metric, _rel(path), tool, tool, last),
+        ).fetchall()
+
+    def file_issues(self, path: str, run_id: int) -> List[Tuple[int, str, str, str]]:
+        """Issues of one file in one run: (line, type, severity, description)."""
+        return self.conn.execute(
+            "SELECT i.line, i.type, i.severity, i.description FROM files f "
+            "JOIN issues i ON i.file_id = f.id AND i.run_id = ? "
+            "WHERE f.path = ? ORDER BY i.line",
+            (run_id, _rel(path)),
+        ).fetchall()
+
+    def close(self) -> None:
+        if self._pending:
+            self.flush()
+        self.conn.close()
+
+
+class RunRecorder:
+    """Records one checker run from ``dataclasses.asdict`` results; ``close`` marks it finished.
+
+    Numeric fields of a result become its metrics, with ``overall`` (the field
+    holding the checker's total score) stored as ``overall``; ``issues`` become
+    issue rows.
+    """
+
+    def __init__(self, tool: str, base_path, path: Path = RESULTS_DB_PATH, overall: str = "overall"):
+        self.db = ResultsDB(path)
+        self.run_id = self.db.start_run(tool, base_path)
+        self.overall = overall
+
+    def add(self, record: Mapping[str, Any]) -> None:
+        scores = {("overall" if key == self.overall else key): value for key, value in record.items()
+                  if isinstance(value, (int, float)) and not isinstance(value, bool)}
+        self.db.add(self.run_id, record["file_path"], scores, record.get("issues", ()))
+
+    def close(self, completed: bool = True) -> None:
+        """Finish the run, or drop it when the checker did not complete."""
+        if completed:
+            self.db.finish_run(self.run_id)
+        else:
+            self.db.flush()
+            self.db.delete_run(self.run_id)
+        self.db.close()
+
+
+def _when(ts: Optional[float]) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) if ts else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the quality-checker run history")
+    parser.add_argument("--db", default=str(RESULTS_DB_PATH), help="results database")
+    parser.add_argument("--tool", help="only runs of this checker")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rp = sub.add_parser("runs", help="list recent runs")
+    rp.add_argument("--last", type=int, default=30)
+    wp = sub.add_parser("worst", help="lowest scoring files of a run")
+    wp.add_argument("--prefix", default="", help="only paths starting with this (e.g. Matter/)")
+    wp.add_argument("--metric", default="overall")
+    wp.add_argument("--limit", type=int, default=50)
+    wp.add_argument("--run", type=int, help="run id (default: latest)")
+    tp = sub.add_parser("trend", help="issue counts over recent runs")
+    tp.add_argument("--type", default="%link%", help="issue type, SQL LIKE pattern (default: %%link%%)")
+    tp.add_argument("--severity")
+    tp.add_argument("--last", type=int, default=30)
+    fp = sub.add_parser("file", help="score history of one file")
+    fp.add_argument("path")
+    fp.add_argument("--metric", default="overall")
+    fp.add_argument("--last", type=int, default=30)
+    ip = sub.add_parser("issues", help="issues of one file in a run")
+    ip.add_argument("path")
+    ip.add_argument("--run", type=int, help="run id (default: latest)")
+    args = parser.parse_args()
+
+    db = ResultsDB(Path(args.db))
+    run_id = getattr(args, "run", None) or db.latest_run(args.tool)
+    if args.command == "runs":
+        for r in db.runs(args.tool, args.last):
+            print(f"{r['id']:5d}  {_when(r['started'])}  {r['finished'] - r['started']:7.1f}s  {r['tool']}  {r['base_path']}")
+    elif args.command == "trend":
+        for rid, started, count in db.trend(args.tool, args.type, args.severity, args.last):
+            print(f"{rid:5d}  {_when(started)}  {count}")
+    elif args.command == "file":
+        for rid, started, value in db.file_history(args.path, args.metric, args.last, args.tool):
+            print(f"{rid:5d}  {_when(started)}  {value:.2f}")
+    elif run_id is None:
+        print("no finished runs recorded")
+    elif args.command == "worst":
+        for path, value, issue_count in db.worst(run_id, args.prefix, args.metric, args.limit):
+            print(f"{value:8.2f}  {issue_count:5d}  {path}")
+    else:
+        for line, issue_type, severity, description in db.file_issues(args.path, run_id):
+            print(f"{line:6d}  {severity:8s}  {issue_type}: {description}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""Transactional, parallel batch rewrites for the structure/TOC fixers.
+
+A fixer is a picklable callable ``fixer(path, content) -> (new_content, info)``.
+``content`` is the decoded text (universal newlines, as ``open(path, 'r')``
+gives). Returning ``None`` or the unchanged text leaves the file alone. ``info``
+is passed back as is; the tools use it for their issue lists and messages.
+
+``rewrite_files`` runs a batch in three steps:
+
+1. Prepare (worker processes): each worker reads a file and runs the fixer.
+   A file is staged only when the encoded result hashes differently from the
+   bytes on disk. Staging writes the new bytes to a temp file next to the target
+   and puts the original into the content-addressed ``backup_store``.
+2. Commit (main process): the manifest is written first. Then each target is
+   checked to be unchanged since it was read, and each temp file is renamed over
+   its target. If any target changed in the meantime, or the commit is
+   interrupted, the targets already replaced are restored and the batch is rolled
+   back as a whole.
+3. The journal (``.reports/rewrite/<batch>/``) stays behind, and the batch is
+   recorded as a backup run, unless the caller passes ``keep_journal=False``.
+   ``rollback(batch)`` restores every file of the batch, but only if none of
+   them was edited after the batch.
+
+Fixer exceptions are reported per file and do not stop the batch. Staging
+errors abort it before any target is touched. ``recover()`` cleans up after a
+killed process: temp files of a batch that was still preparing are removed,
+and a batch killed mid-commit is rolled back.
+``python tools/rewrite_engine.py list|rollback|recover`` exposes the same
+operations from the command line.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+from backup_store import STORE_ROOT, BackupStore, RestoreConflict, file_digest, write_atomic
+from parse_cache import REPO_ROOT, content_hash, decode_text
+
+
+JOURNAL_ROOT = REPO_ROOT / ".reports" / "rewrite"
+
+Fixer = Callable[[str, str], Tuple[Optional[str], Any]]
+
+
+class RewriteConflict(RestoreConflict):
+    """A file of the batch changed on disk while the batch was being committed or rolled back."""
+
+
+class FileResult(NamedTuple):
+    path: str
+    changed: bool
+    info: Any
+    error: Optional[str]
+
+
+def _temp_path(path: str, batch_id: str) -> str:
+    head, name = os.path.split(path)
+    return os.path.join(head, f".{name}.{batch_id}.tmp")
+
+
+# Per-worker state set by _init_worker
+_fixer: Optional[Fixer] = None
+_store: Optional[BackupStore] = None
+_batch_id: Optional[str] = None
+_dry_run = False
+
+
+def _init_worker(fixer: Fixer, store_root: str, batch_id: str, dry_run: bool) -> None:
+    global _fixer, _store, _batch_id, _dry_run
+    _fixer, _store, _batch_id, _dry_run = fixer, BackupStore(Path(store_root)), batch_id, dry_run
+
+
+def _prepare(path: str) -> Tuple[FileResult, Optional[dict]]:
+    """Run the fixer on one file; stage the result if it changes the file's bytes."""
+    try:
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        content = decode_text(data)
+        new_content, info = _fixer(path, content)
+    except Exception as e:
+        return FileResult(path, False, None, str(e)), None
+    if new_content is None or new_content == content:
+        return FileResult(path, False, info, None), None
+    new_data = new_content.encode("utf-8")
+    old_digest, new_digest = content_hash(data), content_hash(new_data)
+    if new_digest == old_digest:
+        return FileResult(path, False, info, None), None
+    if _dry_run:
+        return FileResult(path, True, info, None), None
+    # Staging errors (disk full, permissions) propagate and abort the whole batch
+    _store.put(data, old_digest)
+    tmp = _temp_path(path, _batch_id)
+    with open(tmp, "wb") as f:
+        f.write(new_data)
+        f.flush()
+        os.fsync(f.fileno())
+    entry = {"path": path, "tmp": tmp, "old": old_digest, "new": new_digest,
+             "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    return FileResult(path, True, info, None), entry
+
+
+class Batch:
+    def __init__(self, batch_id: str, journal_dir: Path, results: List[FileResult], committed: bool):
+        self.id = batch_id
+        self.journal_dir = journal_dir
+        self.results = results
+        self.committed = committed
+
+    @property
+    def changed(self) -> List[FileResult]:
+        return [r for r in self.results if r.changed]
+
+    @property
+    def errors(self) -> List[FileResult]:
+        return [r for r in self.results if r.error]
+
+
+_batch_counter = itertools.count(1)
+
+
+def _new_batch_id(label: str) -> str:
+    # The counter keeps batches started within the same second apart
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_batch_counter)}-{label}"
+
+
+def _save_manifest(batch_dir: Path, manifest: dict) -> None:
+    tmp = batch_dir / "manifest.json.tmp"
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, batch_dir / "manifest.json")
+
+
+def _load_manifest(batch_dir: Path) -> dict:
+    return json.loads((batch_dir / "manifest.json").read_text(encoding="utf-8"))
+
+
+def rewrite_files(fixer: Fixer, files: Iterable, jobs: int = 0, label: str = "rewrite",
+                  dry_run: bool = False, keep_journal: bool = True,
+                  journal_root: Path = JOURNAL_ROOT, store_root: Path = STORE_ROOT) -> Batch:
+    """Apply ``fixer`` to ``files`` and commit every change as one batch.
+
+    Returns the per-file results in input order. With ``dry_run`` nothing is
+    written and ``changed`` says what would have been rewritten. Without
+    ``keep_journal`` the journal is dropped once the batch has committed, so the
+    batch cannot be rolled back later.
+    """
+    files = [os.path.abspath(str(p)) for p in files]
+    jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+    batch_id = _new_batch_id(label)
+    batch_dir = Path(journal_root) / batch_id
+    if not dry_run:
+        batch_dir.mkdir(parents=True, exist_ok=True)
+        # Lets recover() clean up temp files if the process dies while preparing
+        _save_manifest(batch_dir, {"id": batch_id, "label": label, "created": time.time(),
+                                   "state": "preparing", "candidates": files, "files": []})
+    initargs = (fixer, str(store_root), batch_id, dry_run)
+    store = BackupStore(store_root)
+    try:
+        entries: List[dict] = []
+        results: List[FileResult] = []
+        try:
+            if jobs > 1 and len(files) > 1:
+                chunksize = max(1, len(files) // (jobs * 8))
+                with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=initargs) as pool:
+                    prepared = list(pool.map(_prepare, files, chunksize=chunksize))
+            else:
+                _init_worker(*initargs)
+                try:
+                    prepared = [_prepare(p) for p in files]
+                finally:
+                    _store.close()
+            for result, entry in prepared:
+                results.append(result)
+                if entry is not None:
+                    entries.append(entry)
+        except BaseException:
+            _discard(batch_dir, batch_id, files)
+            raise
+
+        if dry_run:
+            return Batch(batch_id, batch_dir, results, committed=False)
+        if not entries:
+            _discard(batch_dir, batch_id, files)
+            return Batch(batch_id, batch_dir, results, committed=True)
+
+        manifest = {"id": batch_id, "label": label, "created": time.time(), "state": "committing",
+                    "files": entries}
+        _save_manifest(batch_dir, manifest)
+        replaced: List[dict] = []
+        try:
+            for entry in entries:
+                st = os.stat(entry["path"])
+                if (st.st_size, st.st_mtime_ns) != (entry["size"], entry["mtime_ns"]) \
+                        and file_digest(entry["path"]) != entry["old"]:
+                    raise RewriteConflict(f"{entry['path']} changed while the batch was prepared")
+            for entry in entries:
+                # The temp file was created with default permissions; keep the target's mode
+                shutil.copymode(entry["path"], entry["tmp"])
+                os.replace(entry["tmp"], entry["path"])
+                replaced.append(entry)
+        except BaseException:
+            # All or nothing: put back what was already replaced, drop the rest
+            for entry in reversed(replaced):
+                write_atomic(entry["path"], store.get(entry["old"]))
+            for entry in entries[len(replaced):]:
+                if os.path.exists(entry["tmp"]):
+                    os.remove(entry["tmp"])
+            manifest["state"] = "rolled_back"
+            _save_manifest(batch_dir, manifest)
+            raise
+        if not keep_journal:
+            _discard(batch_dir, batch_id, [])
+            return Batch(batch_id, batch_dir, results, committed=True)
+        manifest["state"] = "committed"
+        _save_manifest(batch_dir, manifest)
+        store.record_run(batch_id, label,
+                         [(e["path"], e["old"], e["size"], e["mtime_ns"], e["new"]) for e in entries])
+        return Batch(batch_id, batch_dir, results, committed=True)
+    finally:
+        store.close()
+
+
+def _discard(batch_dir: Path, batch_id: str, files: List[str]) -> None:
+    for path in files:
+        tmp = _temp_path(path, batch_id)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    if batch_dir.exists():
+        for p in sorted(batch_dir.rglob("*"), reverse=True):
+            p.rmdir() if p.is_dir() else p.unlink()
+        batch_dir.rmdir()
+
+
+def list_batches(journal_root: Path = JOURNAL_ROOT) -> List[dict]:
+    """Manifests of all journaled batches, oldest first."""
+    root = Path(journal_root)
+    if not root.exists():
+        return []
+    manifests = []
+    for batch_dir in sorted(root.iterdir()):
+        if (batch_dir / "manifest.json").exists():
+            manifests.append(_load_manifest(batch_dir))
+    return manifests
+
+
+def rollback(batch_id: Optional[str] = None, force: bool = False,
+             journal_root: Path = JOURNAL_ROOT, store_root: Path = STORE_ROOT) -> List[str]:
+    """Restore every file of a committed batch (default: the latest) to its original content.
+
+    Refuses with ``RewriteConflict`` if a file was edited after the batch, unless
+    ``force`` is set, in which case such files are restored as well.
+    """
+    committed = [m for m in list_batches(journal_root) if m["state"] == "committed"]
+    if batch_id is not None:
+        committed = [m for m in committed if m["id"] == batch_id]
+    if not committed:
+        raise SystemExit(f"no committed batch {batch_id}" if batch_id else "no committed batch")
+    manifest = committed[-1]
+    batch_dir = Path(journal_root) / manifest["id"]
+    conflicts = [e["path"] for e in manifest["files"] if file_digest(e["path"]) != e["new"]]
+    if conflicts and not force:
+        raise RewriteConflict("edited after the batch: " + ", ".join(conflicts))
+    store = BackupStore(store_root)
+    try:
+        for entry in manifest["files"]:
+            write_atomic(entry["path"], store.get(entry["old"]))
+    finally:
+        store.close()
+    manifest["state"] = "rolled_back"
+    _save_manifest(batch_dir, manifest)
+    return [e["path"] for e in manifest["files"]]
+
+
+def recover(journal_root: Path = JOURNAL_ROOT, store_root: Path = STORE_ROOT) -> List[str]:
+    """Clean up batches cut short by a killed process.
+
+    A batch killed while preparing never touched its targets; its temp files and
+    journal are removed. A batch killed mid-commit is rolled back.
+    """
+    restored = []
+    store = BackupStore(store_root)
+    try:
+        for manifest in list_batches(journal_root):
+            batch_dir = Path(journal_root) / manifest["id"]
+            if manifest["state"] == "preparing":
+                _discard(batch_dir, manifest["id"], manifest["candidates"])
+                continue
+            if manifest["state"] != "committing":
+                continue
+            for entry in manifest["files"]:
+                if file_digest(entry["path"]) == entry["new"]:
+                    write_atomic(entry["path"], store.get(entry["old"]))
+                    restored.append(entry["path"])
+                if os.path.exists(entry["tmp"]):
+                    os.remove(entry["tmp"])
+            manifest["state"] = "rolled_back"
+            _save_manifest(batch_dir, manifest)
+    finally:
+        store.close()
+    return restored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and undo batch rewrites")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="list journaled batches")
+    rb = sub.add_parser("rollback", help="restore the files of a batch (default: latest committed)")
+    rb.add_argument("batch", nargs="?")
+    rb.add_argument("--force", action="store_true", help="also restore files edited after the batch")
+    sub.add_parser("recover", help="roll back batches interrupted during commit")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for m in list_batches():
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(m["created"]))
+            print(f"{m['id']}  {m['state']:<11}  {len(m['files']):5d} files  {created}")
+    elif args.command == "rollback":
+        try:
+            paths = rollback(args.batch, force=args.force)
+        except RewriteConflict as e:
+            print(f"refusing to roll back: {e}", file=sys.stderr)
+            raise SystemExit(1)
+        print(f"restored {len(paths)} files")
+    else:
+        print(f"restored {len(recover())} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Deterministic synthetic markdown corpus for benchmarking the toolchain.
+
+Usage: python tools/synth_corpus.py DIR [--files N] [--seed S] [--median-kb K]
+                                   [--outliers R] [--cjk R] [--links R] [--jobs N]
+
+Every document is generated from ``(seed, index)`` alone, so the same
+parameters always give byte-identical files and any subset can be rebuilt
+independently. Documents look like the knowledge base. They have numbered
+``##``/``###`` sections, a table of contents, paragraphs that mix Chinese and
+English words (``--cjk`` is the Chinese share of the words), fenced
+python/sql/rust blocks drawn from a small pool (so code snippets repeat across
+documents the way copied examples do), inline and block math, and tables.
+
+Sizes follow a log-normal distribution around ``--median-kb``. A fraction
+``--outliers`` of the documents are 1-2 MB, like the largest files under
+Matter/. ``--links`` is the number of relative links per KB of text. Links point
+at other documents of the corpus, mostly to a ``#section`` anchor that exists,
+and about 3% are broken. No external URLs are generated, so benchmark runs never
+touch the network.
+
+A ``corpus.json`` manifest records the parameters. ``generate`` reuses a
+directory whose manifest matches instead of writing the files again.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+FILES_PER_DIR = 50
+DIRS_PER_GROUP = 50
+BROKEN_LINK_RATIO = 0.03
+
+EN_WORDS = (
+    "data query index transaction lock page buffer log replication partition optimizer plan "
+    "cost tuple snapshot vacuum checkpoint commit rollback isolation latency throughput cache "
+    "schema table column row join aggregate scan filter predicate cardinality histogram model "
+    "proof theorem lemma invariant type system memory ownership borrow trait async runtime"
+).split()
+CJK_WORDS = (
+    "数据 查询 索引 事务 锁 页面 缓冲区 日志 复制 分区 优化器 执行计划 代价 元组 快照 清理 检查点 "
+    "提交 回滚 隔离级别 延迟 吞吐量 缓存 模式 表 列 行 连接 聚合 扫描 过滤 谓词 基数 直方图 模型 "
+    "证明 定理 引理 不变式 类型系统 内存 所有权 借用 特征 异步 运行时 形式化 语义 一致性"
+).split()
+
+CODE_POOL = {
+    "python": [
+        "def scan(rows):\n    # 顺序扫描\n    return [r for r in rows if r.visible]\n",
+        "import heapq\n\n\ndef top_k(items, k):\n    return heapq.nsmallest(k, items)\n",
+        "class Page:\n    def __init__(self, size):\n        self.size = size\n        self.tuples = []\n",
+        "def broken(:\n    return 1\n",
+        "for i in range(10):\n    print(i * i)\n",
+    ],
+    "sql": [
+        "SELECT id, name FROM users WHERE age > 30;\n",
+        "CREATE INDEX idx_orders_user ON orders (user_id);\n",
+        "SELECT count(*);\n",
+        "EXPLAIN ANALYZE SELECT * FROM t JOIN s USING (id);\n",
+    ],
+    "rust": [
+        "fn main() {\n    let v: Vec<u32> = (0..10).collect();\n    println!(\"{:?}\", v);\n}\n",
+        "fn incomplete(x: u32) -> u32 {\n    x + 1\n",
+        "struct Buffer {\n    pages: Vec<[u8; 8192]>,\n}\n",
+    ],
+}
+
+
+def doc_path(index: int) -> str:
+    """Relative path of document ``index``: FILES_PER_DIR files per directory, two levels deep."""
+    leaf = index // FILES_PER_DIR
+    return f"g{leaf // DIRS_PER_GROUP:03d}/d{leaf % DIRS_PER_GROUP:02d}/doc-{index:06d}.md"
+
+
+def section_title(k: int) -> str:
+    return f"{k}. Section {k} 章节"
+
+
+def section_anchor(k: int) -> str:
+    # GitHub slug of section_title(k): lowercased, "." dropped, spaces to "-"
+    return f"{k}-section-{k}-章节"
+
+
+def target_size(rng: random.Random, median_kb: float, outliers: float) -> int:
+    if rng.random() < outliers:
+        return rng.randint(1_000_000, 2_000_000)
+    return max(600, int(rng.lognormvariate(math.log(median_kb * 1024), 0.9)))
+
+
+class _Doc:
+    def __init__(self, index: int, files: int, rng: random.Random, cjk: float, links: float):
+        self.index = index
+        self.files = files
+        self.rng = rng
+        self.cjk = cjk
+        self.links = links
+        self.parts: List[str] = []
+        self.size = 0
+
+    def add(self, text: str) -> None:
+        self.parts.append(text)
+        self.size += len(text.encode("utf-8"))
+
+    def word(self) -> str:
+        rng = self.rng
+        return rng.choice(CJK_WORDS) if rng.random() < self.cjk else rng.choice(EN_WORDS)
+
+    def link(self) -> str:
+        rng = self.rng
+        source_dir = os.path.dirname(doc_path(self.index))
+        target = rng.randrange(self.files)
+        if rng.random() < BROKEN_LINK_RATIO:
+            if rng.random() < 0.5:
+                return f"[missing](missing-{target:06d}.md)"
+            rel = os.path.relpath(doc_path(target), source_dir).replace(os.sep, "/")
+            return f"[stale]({rel}#no-such-section)"
+        rel = os.path.relpath(doc_path(target), source_dir).replace(os.sep, "/")
+        if rng.random() < 0.7:
+            return f"[{self.word()}]({rel}#{section_anchor(rng.randint(1, 3))})"
+        return f"[{self.word()}]({rel})"
+
+    def paragraph(self) -> str:
+        rng = self.rng
+        words = []
+        for _ in range(rng.randint(40, 120)):
+            if rng.random() < self.links / 150:
+                words.append(self.link())
+            elif rng.random() < 0.02:
+                words.append(f"${self.word()}_{{{rng.randint(1, 9)}}} = O(n \\log n)$")
+            elif rng.random() < 0.02:
+                words.append(f"**{self.word()}**")
+            else:
+                words.append(self.word())
+        sep = "" if self.cjk >= 0.5 else " "
+        return sep.join(words) + "\n\n"
+
+    def block(self) -> str:
+        rng = self.rng
+        roll = rng.random()
+        if roll < 0.5:
+            return self.paragraph()
+        if roll < 0.7:
+            language = rng.choice(sorted(CODE_POOL))
+            return f"```{language}\n{rng.choice(CODE_POOL[language])}```\n\n"
+        if roll < 0.8:
+            return f"$$\n\\sum_{{i=1}}^{{{rng.randint(2, 99)}}} x_i^2 \\le \\epsilon\n$$\n\n"
+        if roll < 0.9:
+            rows = "".join(f"| {self.word()} | {rng.randint(0, 999)} |\n" for _ in range(rng.randint(2, 6)))
+            return f"| 名称 | 值 |\n|------|-----|\n{rows}\n"
+        return f"- {self.word()}\n- {self.word()}\n- {self.link()}\n\n"
+
+
+def render(index: int, files: int, seed: int, median_kb: float = 8.0, outliers: float = 0.002,
+           cjk: float = 0.6, links: float = 1.0) -> str:
+    """Content of document ``index``; depends only on the arguments."""
+    rng = random.Random(f"{seed}:{index}")
+    size = target_size(rng, median_kb, outliers)
+    doc = _Doc(index, files, rng, cjk, links)
+    # Enough sections for roughly 2 KB each, and at least the three that links point to
+    sections = max(3, min(200, size // 2048))
+    doc.add(f"# 文档 {index} Document {index}\n\n")
+    doc.add("## 目录\n\n" + "".join(f"- [{section_title(k)}](#{section_anchor(k)})\n"
+                                   for k in range(1, sections + 1)) + "\n")
+    per_section = max(1, size // sections)
+    for k in range(1, sections + 1):
+        doc.add(f"## {section_title(k)}\n\n")
+        start = doc.size
+        sub = 0
+        while doc.size - start < per_section:
+            if rng.random() < 0.15:
+                sub += 1
+                doc.add(f"### {k}.{sub} {doc.word()}\n\n")
+            doc.add(doc.block())
+    return "".join(doc.parts)
+
+
+def manifest(files: int, seed: int, median_kb: float, outliers: float, cjk: float, links: float) -> Dict[str, Any]:
+    return {"files": files, "seed": seed, "median_kb": median_kb, "outliers": outliers,
+            "cjk": cjk, "links": links, "generator": 1}
+
+
+def _write(job: tuple) -> int:
+    root, index, params = job
+    path = os.path.join(root, doc_path(index))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = render(index, **params).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def generate(root, files: int = 1000, seed: int = 0, median_kb: float = 8.0, outliers: float = 0.002,
+             cjk: float = 0.6, links: float = 1.0, jobs: int = 0) -> Dict[str, Any]:
+    """Write the corpus under ``root`` (reused when its manifest matches); returns the manifest with totals."""
+    root = Path(root)
+    params = manifest(files, seed, median_kb, outliers, cjk, links)
+    manifest_path = root / "corpus.json"
+    if manifest_path.exists():
+        try:
+            existing = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            existing = {}
+        if {k: existing.get(k) for k in params} == params:
+            return existing
+    render_params = {"files": files, "seed": seed, "median_kb": median_kb, "outliers": outliers,
+                     "cjk": cjk, "links": links}
+    work = ((str(root), index, render_params) for index in range(files))
+    jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+    if jobs > 1 and files > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            sizes = list(pool.map(_write, work, chunksize=max(1, files // (jobs * 8))))
+    else:
+        sizes = [_write(job) for job in work]
+    result = dict(params, bytes=sum(sizes), largest=max(sizes, default=0))
+    manifest_path.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic markdown corpus")
+    parser.add_argument("root", help="output directory")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--median-kb", type=float, default=8.0, help="median document size (default 8)")
+    parser.add_argument("--outliers", type=float, default=0.002, help="share of 1-2 MB documents (default 0.002)")
+    parser.add_argument("--cjk", type=float, default=0.6, help="share of Chinese words (default 0.6)")
+    parser.add_argument("--links", type=float, default=1.0, help="relative links per KB (default 1)")
+    parser.add_argument("--jobs", type=int, default=0, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+    info = generate(args.root, args.files, args.seed, args.median_kb, args.outliers, args.cjk, args.links,
+                    args.jobs)
+    print(f"files={info['files']} bytes={info['bytes']} largest={info['largest']} root={args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+from anchor_index import AnchorIndex, document_anchors, github_slug
+from link_check import check_file
+
+
+def test_duplicate_headings_get_numbered_suffixes():
+    content = "# Intro\n\n## Setup\n\n## Setup\n\n### Setup\n"
+    assert document_anchors(content) == ["intro", "setup", "setup-1", "setup-2"]
+
+
+def test_suffix_does_not_collide_with_literal_heading():
+    # "Setup 1" already took setup-1, so the second "Setup" moves on to setup-2
+    content = "## Setup\n\n## Setup 1\n\n## Setup\n"
+    assert document_anchors(content) == ["setup", "setup-1", "setup-2"]
+
+
+def test_headings_in_code_and_indented_lines_are_skipped():
+    content = "## Real\n\n```\n## Fenced\n```\n\n    ## Indented\n"
+    assert document_anchors(content) == ["real"]
+
+
+def test_slug_drops_punctuation_and_keeps_cjk():
+    assert github_slug("1. Section 1 章节") == "1-section-1-章节"
+    assert github_slug("What's new? (v2)") == "whats-new-v2"
+
+
+def test_html_anchor_keeps_case_and_matches_exactly(tmp_path):
+    doc = tmp_path / "doc.md"
+    doc.write_text('<a id="MySection"></a>\n\n## Heading\n\n'
+                   "[a](#MySection) [b](#mysection) [c](#Heading) [d](#nope)\n", encoding="utf-8")
+    index = AnchorIndex(root=tmp_path, path=None)
+    status = {row.split(",")[2]: row.split(",")[3] for row in check_file(doc, index)}
+    assert status == {"MySection": "ok", "mysection": "missing_anchor",
+                      "Heading": "ok", "nope": "missing_anchor"}
@@ -0,0 +1,50 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from backup_store import BackupStore, RestoreConflict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "Analysis"))
+from restore_from_backup import import_legacy_backup
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BackupStore(tmp_path / "store")
+    yield store
+    store.close()
+
+
+def _legacy_tree(tmp_path):
+    backup = tmp_path / ".structure_backup"
+    (backup / "docs").mkdir(parents=True)
+    copy = backup / "docs" / "a.md"
+    copy.write_text("# old\n", encoding="utf-8")
+    os.utime(copy, (1_000_000, 1_000_000))
+    return backup
+
+
+def test_restore_refuses_files_edited_after_the_run(store, tmp_path):
+    doc = tmp_path / "a.md"
+    doc.write_text("after\n", encoding="utf-8")
+    digest = store.put(b"before\n")
+    store.record_run("run1", "fix", [(str(doc), digest, 7, 0, store.put(b"after\n"))])
+    doc.write_text("user edit\n", encoding="utf-8")
+    with pytest.raises(RestoreConflict, match="edited after the run"):
+        store.restore_run("run1")
+    assert doc.read_text(encoding="utf-8") == "user edit\n"
+    assert store.restore_run("run1", force=True) == [str(doc)]
+    assert doc.read_text(encoding="utf-8") == "before\n"
+
+
+def test_legacy_backup_is_imported_once_and_dated_by_its_copies(store, tmp_path):
+    backup = _legacy_tree(tmp_path)
+    store.record_run("newer-batch", "fix", [])
+    import_legacy_backup(store, backup, tmp_path)
+    import_legacy_backup(store, backup, tmp_path)
+    runs = store.runs()
+    assert [r["label"] for r in runs] == ["structure_backup", "fix"]
+    assert runs[0]["created"] == 1_000_000
+    assert store.run_entries(runs[0]["id"])[0][0] == str(tmp_path / "docs" / "a.md")
@@ -0,0 +1,50 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "Analysis"))
+from enhanced_quality_checker import EnhancedQualityChecker, StreamingReport, plan_chunks
+from external_links import ExternalLinkChecker
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    for i in range(40):
+        # Sizes vary so chunks finish out of order; one large file gets a chunk of its own
+        body = "Some text with a [link](missing.md).\n\n" * (i % 7 + 1) * (200 if i == 5 else 1)
+        (tmp_path / f"doc{i:02d}.md").write_text(f"# Doc {i}\n\n## Part\n\n{body}```python\nx = {i}\n```\n",
+                                                 encoding="utf-8")
+    return tmp_path
+
+
+def _jsonl(corpus, out, jobs):
+    checker = EnhancedQualityChecker(str(corpus), external=ExternalLinkChecker(cache_path=None))
+    stream = StreamingReport("jsonl", str(out), checker.timer)
+    order = []
+    try:
+        for index, result in checker.iter_documents(jobs=jobs):
+            order.append(index)
+            stream.write(result)
+    finally:
+        stream.close()
+        checker.checkers["links"].close()
+    # The last line holds the summary and timings
+    return order, out.read_text(encoding="utf-8").splitlines()[:-1]
+
+
+def test_parallel_output_matches_serial_output(corpus, tmp_path):
+    serial_order, serial = _jsonl(corpus, tmp_path / "serial.jsonl", jobs=1)
+    parallel_order, parallel = _jsonl(corpus, tmp_path / "parallel.jsonl", jobs=4)
+    assert serial_order == parallel_order == list(range(40))
+    assert [json.loads(line)["file_path"] for line in parallel] == \
+        [json.loads(line)["file_path"] for line in serial]
+    assert parallel == serial
+
+
+def test_chunks_keep_input_order_and_isolate_large_files(corpus):
+    files = sorted(str(p) for p in corpus.glob("*.md"))
+    chunks = plan_chunks(files, jobs=4)
+    assert [index for chunk in chunks for index, _ in chunk] == list(range(len(files)))
+    assert [(5, files[5])] in chunks
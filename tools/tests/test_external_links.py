@@ -0,0 +1,156 @@
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import external_links
+from external_links import ExternalLinkChecker
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """/ok 200; /nohead 405 on HEAD, 200 on GET; /missing 404; /flaky server.flaky_status;
+    /slow 200 after a short sleep, counting requests in flight."""
+
+    def _respond(self):
+        server = self.server
+        server.log.append((self.command, self.path))
+        path = self.path.split("?", 1)[0]
+        if path == "/slow":
+            with server.lock:
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            time.sleep(0.1)
+            with server.lock:
+                server.in_flight -= 1
+            status = 200
+        elif path == "/ok":
+            status = 200
+        elif path == "/nohead":
+            status = 405 if self.command == "HEAD" else 200
+        elif path == "/flaky":
+            status = server.flaky_status
+        else:
+            status = 404
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_HEAD = do_GET = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    for name in ("http_proxy", "HTTP_PROXY", "https_proxy", "HTTPS_PROXY", "all_proxy", "ALL_PROXY"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1,localhost")
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.log, httpd.lock = [], threading.Lock()
+    httpd.in_flight = httpd.max_in_flight = 0
+    httpd.flaky_status = 500
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces the clock LinkCache reads; advance with clock.now += seconds."""
+    fake = types.SimpleNamespace(now=1_000_000.0)
+    fake.time = lambda: fake.now
+    monkeypatch.setattr(external_links, "time", fake)
+    return fake
+
+
+def test_head_rejected_with_405_falls_back_to_get(server):
+    checker = ExternalLinkChecker(cache_path=None)
+    try:
+        assert checker.check(server.url + "/nohead") is True
+        assert checker.check(server.url + "/missing") is False
+    finally:
+        checker.close()
+    assert server.log == [("HEAD", "/nohead"), ("GET", "/nohead"), ("HEAD", "/missing"), ("GET", "/missing")]
+
+
+def test_head_success_does_not_issue_get(server):
+    checker = ExternalLinkChecker(cache_path=None)
+    try:
+        assert checker.check(server.url + "/ok") is True
+    finally:
+        checker.close()
+    assert server.log == [("HEAD", "/ok")]
+
+
+def test_reachable_results_expire_after_ttl(server, clock, tmp_path):
+    checker = ExternalLinkChecker(cache_path=tmp_path / "links.sqlite", ttl=100, negative_ttl=10)
+    url = server.url + "/ok"
+    try:
+        assert checker.check(url) is True
+        clock.now += 99
+        assert checker.check(url) is True
+        assert len(server.log) == 1
+        clock.now += 2
+        assert checker.check(url) is True
+        assert len(server.log) == 2
+    finally:
+        checker.close()
+
+
+def test_failures_expire_after_negative_ttl(server, clock, tmp_path):
+    checker = ExternalLinkChecker(cache_path=tmp_path / "links.sqlite", ttl=100, negative_ttl=10)
+    url = server.url + "/flaky"
+    try:
+        assert checker.check(url) is False
+        probes = len(server.log)
+        server.flaky_status = 200
+        clock.now += 9
+        assert checker.check(url) is False
+        assert len(server.log) == probes
+        clock.now += 2
+        assert checker.check(url) is True
+    finally:
+        checker.close()
+
+
+def test_cache_survives_a_new_checker(server, tmp_path):
+    path = tmp_path / "links.sqlite"
+    first = ExternalLinkChecker(cache_path=path)
+    try:
+        assert first.check(server.url + "/ok") is True
+    finally:
+        first.close()
+    second = ExternalLinkChecker(cache_path=path)
+    try:
+        assert second.check(server.url + "/ok") is True
+    finally:
+        second.close()
+    assert len(server.log) == 1
+
+
+def test_requests_per_host_are_limited(server):
+    checker = ExternalLinkChecker(cache_path=None, concurrency=16, per_host=2)
+    urls = [f"{server.url}/slow?{i}" for i in range(10)]
+    try:
+        assert all(checker.check_many(urls).values())
+    finally:
+        checker.close()
+    assert server.max_in_flight == 2
+
+
+def test_global_limit_applies_across_hosts(server):
+    # 127.0.0.1 and localhost are separate hosts for the per-host limit but hit the same server
+    port = server.server_address[1]
+    urls = [f"http://{host}:{port}/slow?{i}" for i in range(6) for host in ("127.0.0.1", "localhost")]
+    checker = ExternalLinkChecker(cache_path=None, concurrency=3, per_host=4)
+    try:
+        assert all(checker.check_many(urls).values())
+    finally:
+        checker.close()
+    assert server.max_in_flight == 3
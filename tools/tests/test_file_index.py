@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+import file_index
+from file_index import FileIndex
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "a.md").write_text("# A\n", encoding="utf-8")
+    (tmp_path / "docs" / "img.png").write_bytes(b"")
+    (tmp_path / "docs" / "__pycache__").mkdir()
+    return tmp_path
+
+
+def _load_without_build(tree, monkeypatch):
+    def build(self):
+        raise AssertionError("index was rebuilt")
+    monkeypatch.setattr(FileIndex, "build", build)
+    return FileIndex.load(tree, tree / ".reports" / "file_index.json")
+
+
+def test_saved_index_is_reused_on_an_untouched_tree(tree, monkeypatch):
+    index = FileIndex.load(tree, tree / ".reports" / "file_index.json")
+    index.save()
+    # Other tools keep writing their state next to the index
+    (tree / ".reports" / "parse_cache.sqlite-wal").write_bytes(b"x")
+    (tree / "docs" / "__pycache__" / "mod.pyc").write_bytes(b"x")
+    reloaded = _load_without_build(tree, monkeypatch)
+    assert reloaded.exists(tree / "docs" / "a.md")
+    assert reloaded.exists(tree / "docs" / "img.png")
+    assert reloaded.files_under(tree) == [str(tree / "docs" / "a.md")]
+
+
+def test_skipped_directories_fall_back_to_the_filesystem(tree):
+    index = FileIndex.load(tree, None)
+    (tree / ".reports").mkdir()
+    (tree / ".reports" / "links.csv").write_text("", encoding="utf-8")
+    assert ".reports" not in index.paths and "docs/__pycache__" not in index.paths
+    assert index.exists(tree / ".reports" / "links.csv")
+    assert not index.exists(tree / ".reports" / "missing.csv")
+
+
+def test_added_file_forces_a_rebuild(tree, monkeypatch):
+    FileIndex.load(tree, tree / ".reports" / "file_index.json").save()
+    (tree / "docs" / "b.md").write_text("# B\n", encoding="utf-8")
+    with pytest.raises(AssertionError, match="rebuilt"):
+        _load_without_build(tree, monkeypatch)
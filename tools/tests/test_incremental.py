@@ -0,0 +1,54 @@
+import subprocess
+
+import pytest
+
+from incremental import LinkGraph, ResultStore, git_changed_files, norm_path, select_since
+
+
+def _git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / "repo"
+    (repo / "img").mkdir(parents=True)
+    (repo / "uses_image.md").write_text("![logo](img/logo.png)\n", encoding="utf-8")
+    (repo / "uses_table.md").write_text("[data](data.csv)\n", encoding="utf-8")
+    (repo / "plain.md").write_text("# Plain\n", encoding="utf-8")
+    (repo / "data.csv").write_text("a,b\n", encoding="utf-8")
+    _git(repo, "init", "-q")
+    _git(repo, "add", ".")
+    _git(repo, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "base")
+    return repo
+
+
+def _select(repo, tmp_path):
+    files = sorted(str(p) for p in repo.glob("*.md"))
+    store = ResultStore("test", repo, state_dir=tmp_path / "state")
+    for path in files:
+        store.put(path, {})
+    store.save()
+    try:
+        return select_since("HEAD", files, store, LinkGraph(tmp_path / "graph.json"), repo_root=repo)
+    finally:
+        store.close()
+
+
+def test_non_markdown_changes_are_reported(repo):
+    (repo / "img" / "logo.png").write_bytes(b"")
+    (repo / "data.csv").unlink()
+    changed, deleted = git_changed_files("HEAD", repo)
+    assert changed == {norm_path(repo / "img" / "logo.png")}
+    assert deleted == {norm_path(repo / "data.csv")}
+
+
+def test_added_and_deleted_files_recheck_the_documents_linking_to_them(repo, tmp_path):
+    (repo / "img" / "logo.png").write_bytes(b"")
+    (repo / "data.csv").unlink()
+    assert _select(repo, tmp_path) == [str(repo / "uses_image.md"), str(repo / "uses_table.md")]
+
+
+def test_changed_markdown_is_checked_itself(repo, tmp_path):
+    (repo / "plain.md").write_text("# Plain, edited\n", encoding="utf-8")
+    assert _select(repo, tmp_path) == [str(repo / "plain.md")]
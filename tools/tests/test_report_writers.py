@@ -0,0 +1,29 @@
+from report_writers import ReportStats, ShardedHtmlWriter
+
+
+def _report(path, documents):
+    stats = ReportStats()
+    writer = ShardedHtmlWriter(str(path), "Report", "", stats, page_size=2)
+    for i in range(documents):
+        href = writer.write(f"<p>doc {i}</p>", f"doc{i}.md")
+        stats.add(f"doc{i}.md", 1.0, [], href)
+    return writer
+
+
+def test_shorter_rerun_removes_pages_of_the_previous_run(tmp_path):
+    _report(tmp_path / "report.html", 9).close()
+    assert len(list((tmp_path / "report_pages").glob("page-*.html"))) == 5
+    _report(tmp_path / "report.html", 3).close()
+    assert sorted(p.name for p in (tmp_path / "report_pages").glob("page-*.html")) == \
+        ["page-0001.html", "page-0002.html"]
+
+
+def test_interrupted_rerun_serves_no_older_pages(tmp_path):
+    _report(tmp_path / "report.html", 9).close()
+    writer = _report(tmp_path / "report.html", 3)
+    # Not closed: the second page is still open and the index says the check is in progress
+    assert sorted(p.name for p in (tmp_path / "report_pages").glob("page-*.html")) == \
+        ["page-0001.html", "page-0002.html"]
+    index = (tmp_path / "report.html").read_text(encoding="utf-8")
+    assert "page-0001.html" in index and "page-0003.html" not in index
+    writer.close()
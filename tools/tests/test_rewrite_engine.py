@@ -0,0 +1,161 @@
+import json
+import os
+
+import pytest
+
+import rewrite_engine
+from rewrite_engine import RewriteConflict, list_batches, recover, rewrite_files, rollback
+
+
+def _append(path, content):
+    return content + "fixed\n", None
+
+
+@pytest.fixture
+def roots(tmp_path):
+    return {"journal_root": tmp_path / "journal", "store_root": tmp_path / "store"}
+
+
+@pytest.fixture
+def docs(tmp_path):
+    paths = []
+    for name in ("a.md", "b.md"):
+        path = tmp_path / "docs" / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(f"# {name}\n", encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _set_state(roots, batch_id, state):
+    path = roots["journal_root"] / batch_id / "manifest.json"
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    manifest["state"] = state
+    path.write_text(json.dumps(manifest), encoding="utf-8")
+    return manifest
+
+
+def test_commit_and_rollback_keep_content_and_mode(docs, roots):
+    os.chmod(docs[0], 0o755)
+    batch = rewrite_files(_append, docs, jobs=1, **roots)
+    assert [r.changed for r in batch.results] == [True, True]
+    assert _read(docs[0]) == "# a.md\nfixed\n"
+    assert os.stat(docs[0]).st_mode & 0o777 == 0o755
+    assert sorted(rollback(**roots)) == sorted(docs)
+    assert _read(docs[0]) == "# a.md\n"
+    assert os.stat(docs[0]).st_mode & 0o777 == 0o755
+    assert list_batches(roots["journal_root"])[-1]["state"] == "rolled_back"
+
+
+def test_rollback_refuses_files_edited_after_the_batch(docs, roots):
+    rewrite_files(_append, docs, jobs=1, **roots)
+    with open(docs[0], "a", encoding="utf-8") as f:
+        f.write("user edit\n")
+    with pytest.raises(RewriteConflict, match="edited after the batch"):
+        rollback(**roots)
+    # Nothing was restored and the batch can still be rolled back
+    assert _read(docs[0]) == "# a.md\nfixed\nuser edit\n"
+    assert _read(docs[1]) == "# b.md\nfixed\n"
+    assert list_batches(roots["journal_root"])[-1]["state"] == "committed"
+    rollback(force=True, **roots)
+    assert _read(docs[0]) == "# a.md\n"
+
+
+def test_commit_aborts_when_a_file_changes_while_preparing(docs, roots):
+    def edit_first(path, content):
+        if path == docs[1]:
+            # The first file was already read and staged
+            with open(docs[0], "a", encoding="utf-8") as f:
+                f.write("concurrent edit\n")
+        return _append(path, content)
+
+    with pytest.raises(RewriteConflict, match="changed while the batch was prepared"):
+        rewrite_files(edit_first, docs, jobs=1, **roots)
+    assert _read(docs[0]) == "# a.md\nconcurrent edit\n"
+    assert _read(docs[1]) == "# b.md\n"
+    assert [p for p in os.listdir(os.path.dirname(docs[0])) if p.endswith(".tmp")] == []
+    assert list_batches(roots["journal_root"])[-1]["state"] == "rolled_back"
+
+
+def test_interrupted_commit_puts_back_replaced_files(docs, roots, monkeypatch):
+    real_replace = os.replace
+    calls = []
+
+    def replace(src, dst):
+        calls.append(dst)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        real_replace(src, dst)
+
+    monkeypatch.setattr(rewrite_engine.os, "replace", replace)
+    with pytest.raises(KeyboardInterrupt):
+        rewrite_files(_append, docs, jobs=1, **roots)
+    monkeypatch.setattr(rewrite_engine.os, "replace", real_replace)
+    assert _read(docs[0]) == "# a.md\n"
+    assert _read(docs[1]) == "# b.md\n"
+    assert [p for p in os.listdir(os.path.dirname(docs[0])) if p.endswith(".tmp")] == []
+
+
+def test_recover_rolls_back_a_batch_killed_mid_commit(docs, roots):
+    batch = rewrite_files(_append, docs, jobs=1, **roots)
+    # As if the process died after replacing the files but before marking the batch committed
+    manifest = _set_state(roots, batch.id, "committing")
+    with open(docs[1], "w", encoding="utf-8") as f:
+        f.write("edited after the crash\n")
+    stray = manifest["files"][1]["tmp"]
+    with open(stray, "w", encoding="utf-8") as f:
+        f.write("staged\n")
+    assert recover(**roots) == [docs[0]]
+    assert _read(docs[0]) == "# a.md\n"
+    # A file that no longer has the batch's content is left alone
+    assert _read(docs[1]) == "edited after the crash\n"
+    assert not os.path.exists(stray)
+    assert list_batches(roots["journal_root"])[-1]["state"] == "rolled_back"
+
+
+def test_recover_discards_a_batch_killed_while_preparing(docs, roots):
+    batch = rewrite_files(_append, docs, jobs=1, dry_run=True, **roots)
+    batch_dir = roots["journal_root"] / batch.id
+    batch_dir.mkdir(parents=True)
+    (batch_dir / "manifest.json").write_text(json.dumps(
+        {"id": batch.id, "label": "x", "created": 0, "state": "preparing", "candidates": docs, "files": []}),
+        encoding="utf-8")
+    stray = rewrite_engine._temp_path(docs[0], batch.id)
+    with open(stray, "w", encoding="utf-8") as f:
+        f.write("staged\n")
+    assert recover(**roots) == []
+    assert not os.path.exists(stray)
+    assert not batch_dir.exists()
+    assert _read(docs[0]) == "# a.md\n"
+
+
+@pytest.mark.parametrize("dry_run", [True, False])
+def test_backup_stores_are_closed_on_every_path(docs, roots, monkeypatch, dry_run):
+    opened, closed = [], []
+    store_class = rewrite_engine.BackupStore
+
+    class TrackedStore(store_class):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    monkeypatch.setattr(rewrite_engine, "BackupStore", TrackedStore)
+
+    def fail_second(path, content):
+        if path == docs[1]:
+            raise KeyboardInterrupt
+        return _append(path, content)
+
+    with pytest.raises(KeyboardInterrupt):
+        rewrite_files(fail_second, docs, jobs=1, dry_run=dry_run, **roots)
+    rewrite_files(_append, docs, jobs=1, dry_run=dry_run, keep_journal=False, **roots)
+    assert opened and all(store in closed for store in opened)
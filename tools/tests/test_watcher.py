@@ -0,0 +1,54 @@
+import errno
+import os
+import sys
+
+import pytest
+
+from watcher import InotifyWatcher
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    watcher = InotifyWatcher(str(tmp_path), suffixes=None, interval=0.05)
+    yield watcher
+    watcher.close()
+
+
+def test_new_directory_and_its_files_are_reported(watcher, tmp_path):
+    (tmp_path / "new").mkdir()
+    (tmp_path / "new" / "a.md").write_text("# A\n", encoding="utf-8")
+    changed = watcher.wait(2)
+    assert {str(tmp_path / "new"), str(tmp_path / "new" / "a.md")} <= changed
+
+
+def test_directory_gone_before_it_is_watched_is_skipped(watcher, tmp_path):
+    for i in range(20):
+        (tmp_path / f"tmp{i}").mkdir()
+        (tmp_path / f"tmp{i}").rmdir()
+    (tmp_path / "kept.md").write_text("", encoding="utf-8")
+    changed = set()
+    while str(tmp_path / "kept.md") not in changed:
+        more = watcher.wait(2)
+        assert more
+        changed |= more
+    assert watcher._add_tree(str(tmp_path / "missing")) == set()
+
+
+def test_directories_beyond_the_watch_limit_are_polled(watcher, tmp_path, monkeypatch, capsys):
+    def add(path):
+        raise OSError(errno.ENOSPC, "inotify_add_watch failed")
+
+    monkeypatch.setattr(watcher, "_add", add)
+    (tmp_path / "big" / "sub").mkdir(parents=True)
+    (tmp_path / "big" / "sub" / "a.md").write_text("", encoding="utf-8")
+    changed = watcher.wait(2)
+    assert str(tmp_path / "big" / "sub" / "a.md") in changed
+    assert [p.root for p in watcher._pollers] == [str(tmp_path / "big")]
+    assert "watch limit" in capsys.readouterr().err
+
+    (tmp_path / "big" / "sub" / "b.md").write_text("", encoding="utf-8")
+    assert str(tmp_path / "big" / "sub" / "b.md") in watcher.wait(2)
+    os.remove(tmp_path / "big" / "sub" / "a.md")
+    assert str(tmp_path / "big" / "sub" / "a.md") in watcher.wait(2)
@@ -0,0 +1,264 @@
+"""File change notification for the ``--watch`` modes.
+
+``watch_changes(root)`` returns an inotify watcher on Linux (through ctypes,
+no extra package) and a polling watcher everywhere else, or when inotify is
+unavailable, e.g. because the watch limit is exhausted (directories created
+after the limit runs out are polled instead). Both have the same
+interface: ``wait(timeout)`` blocks until something changed and returns the set
+of absolute paths created, modified, deleted or renamed.
+
+Bursts are coalesced. After the first event the watcher keeps collecting until
+``settle`` seconds pass without a new one, so an editor's save (temp file,
+rename, chmod) is reported once. Only paths ending in one of ``suffixes`` are
+reported; with ``suffixes=None`` every file is, and so are directories that
+appear or disappear (link targets can be any file or directory). Directories
+in ``SKIP_DIRS`` (``.git``, ``.reports`` and caches) are never watched.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+SKIP_DIRS = {".git", ".reports", "__pycache__", ".pytest_cache", "node_modules"}
+# File name endings to report; None reports every file and directory
+Suffixes = Optional[Tuple[str, ...]]
+
+# <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_ISDIR = 0x40000000
+IN_Q_OVERFLOW = 0x4000
+_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT = struct.Struct("iIII")
+
+
+def _wanted(path: str, suffixes: Suffixes) -> bool:
+    return suffixes is None or path.endswith(suffixes)
+
+
+def _walk_dirs(root: str) -> Iterable[str]:
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        yield path
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False) and entry.name not in SKIP_DIRS:
+                        stack.append(entry.path)
+        except OSError:
+            continue
+
+
+class PollingWatcher:
+    """Stat-based fallback: compares (size, mtime) snapshots every ``interval`` seconds."""
+
+    def __init__(self, root: str, suffixes: Suffixes = (".md",), interval: float = 1.0,
+                 settle: float = 0.2):
+        self.root = os.path.abspath(root)
+        self.suffixes = suffixes
+        self.interval = interval
+        self.settle = settle
+        self.snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        files = {}
+        for d in _walk_dirs(self.root):
+            if self.suffixes is None and d != self.root:
+                # Fixed signature: reported when the directory appears or disappears, not on writes inside it
+                files[d] = (-1, 0)
+            try:
+                with os.scandir(d) as it:
+                    for entry in it:
+                        if _wanted(entry.name, self.suffixes) and entry.is_file():
+                            st = entry.stat()
+                            files[entry.path] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                continue
+        return files
+
+    def _diff(self) -> Set[str]:
+        current = self._scan()
+        old, self.snapshot = self.snapshot, current
+        changed = {p for p, sig in current.items() if old.get(p) != sig}
+        changed.update(p for p in old if p not in current)
+        return changed
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = self._diff()
+            if changed:
+                # Let a burst of writes finish before reporting it
+                while True:
+                    time.sleep(self.settle)
+                    more = self._diff()
+                    if not more:
+                        return changed
+                    changed |= more
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval if deadline is None else
+                       max(0.0, min(self.interval, deadline - time.monotonic())))
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify on every directory of the tree; new directories are watched as they appear."""
+
+    def __init__(self, root: str, suffixes: Suffixes = (".md",), settle: float = 0.05,
+                 interval: float = 1.0):
+        self.root = os.path.abspath(root)
+        self.suffixes = suffixes
+        self.settle = settle
+        self.interval = interval
+        # Subtrees created after the watch limit ran out, polled instead
+        self._pollers: List[PollingWatcher] = []
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs: Dict[int, str] = {}
+        try:
+            for d in _walk_dirs(self.root):
+                self._add(d)
+        except OSError:
+            self.close()
+            raise
+
+    def _add(self, path: str) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):  # vanished before we got to it
+                return
+            raise OSError(err, f"inotify_add_watch failed for {path} (raise fs.inotify.max_user_watches?)")
+        self.dirs[wd] = path
+
+    def _read(self, timeout: Optional[float]) -> Tuple[Set[str], bool]:
+        """Changed paths from one read; the flag is True when the kernel queue overflowed."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set(), False
+        try:
+            buf = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return set(), False
+        changed, overflow, pos = set(), False, 0
+        while pos < len(buf):
+            wd, mask, _, length = _EVENT.unpack_from(buf, pos)
+            raw = buf[pos + _EVENT.size:pos + _EVENT.size + length].rstrip(b"\0")
+            pos += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            parent = self.dirs.get(wd)
+            if parent is None:
+                continue
+            if mask & IN_DELETE_SELF:
+                del self.dirs[wd]
+                continue
+            path = os.path.join(parent, os.fsdecode(raw))
+            if mask & IN_ISDIR:
+                if os.path.basename(path) in SKIP_DIRS:
+                    continue
+                if self.suffixes is None and mask & (IN_CREATE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM):
+                    changed.add(path)
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed |= self._add_tree(path)
+                continue
+            changed.add(path)
+        return {p for p in changed if _wanted(p, self.suffixes)}, overflow
+
+    def _add_tree(self, path: str) -> Set[str]:
+        """Watch a directory that just appeared; returns the files already in it.
+
+        Files created before the watch was added would be missed otherwise. A
+        directory that is gone again by now (editor or checkout temp dirs) is
+        skipped; once the watch limit is exhausted the rest of the subtree is polled.
+        """
+        changed: Set[str] = set()
+        polled = [p.root for p in self._pollers]
+        for d in _walk_dirs(path):
+            if any(d == p or d.startswith(p + os.sep) for p in polled):
+                continue
+            try:
+                self._add(d)
+                names = os.listdir(d)
+            except OSError as e:
+                if e.errno != errno.ENOSPC:
+                    continue
+                if not self._pollers:
+                    print(f"inotify watch limit reached, polling new directories such as {d} "
+                          "(raise fs.inotify.max_user_watches)", file=sys.stderr)
+                poller = PollingWatcher(d, self.suffixes, self.interval, self.settle)
+                self._pollers.append(poller)
+                polled.append(d)
+                changed.update(poller.snapshot)
+                continue
+            changed.update(os.path.join(d, f) for f in names)
+        return changed
+
+    def _poll(self) -> Set[str]:
+        changed: Set[str] = set()
+        for poller in list(self._pollers):
+            changed |= poller._diff()
+            if not os.path.isdir(poller.root):
+                self._pollers.remove(poller)
+        return changed
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            step = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if self._pollers:
+                step = self.interval if step is None else min(step, self.interval)
+            changed, overflow = self._read(step)
+            changed |= self._poll()
+            if changed or overflow or (deadline is not None and time.monotonic() >= deadline):
+                break
+        while changed or overflow:
+            more, more_overflow = self._read(self.settle)
+            more |= self._poll()
+            if not more and not more_overflow:
+                break
+            changed |= more
+            overflow |= more_overflow
+        if overflow:
+            # Events were lost: report every watched file so the caller rechecks conservatively
+            for d in list(self.dirs.values()):
+                try:
+                    changed.update(os.path.join(d, f) for f in os.listdir(d) if _wanted(f, self.suffixes))
+                except OSError:
+                    continue
+        return changed
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def watch_changes(root: str, suffixes: Suffixes = (".md",), interval: float = 1.0,
+                  polling: bool = False):
+    """Inotify watcher where available, otherwise the polling fallback."""
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, suffixes, interval=interval)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root, suffixes, interval)